@@ -9,6 +9,8 @@ from autogpt.logs import logger, print_assistant_thoughts
 from autogpt.speech import say_text
 from autogpt.spinner import Spinner
 from autogpt.utils import clean_input
+from lilith.agent.message_history import MessageHistory, new_history
+from lilith.config.config import Config as LilithConfig
 
 
 class Agent:
@@ -17,7 +19,8 @@ class Agent:
     Attributes:
         ai_name: The name of the agent.
         memory: The memory object to use.
-        full_message_history: The full message history.
+        full_message_history: The full message history, a MessageHistory (a plain
+          list of messages is converted to one).
         next_action_count: The number of actions to execute.
         system_prompt: The system prompt is the initial prompt that defines everything
           the AI needs to know to achieve its task successfully.
@@ -52,6 +55,8 @@ class Agent:
     ):
         self.ai_name = ai_name
         self.memory = memory
+        if not isinstance(full_message_history, MessageHistory):
+            full_message_history = self._new_message_history(full_message_history)
         self.full_message_history = full_message_history
         self.next_action_count = next_action_count
         self.command_registry = command_registry
@@ -59,6 +64,10 @@ class Agent:
         self.system_prompt = system_prompt
         self.triggering_prompt = triggering_prompt
 
+    def _new_message_history(self, messages) -> MessageHistory:
+        # the history settings are in the lilith Config, not the autogpt one
+        return new_history(LilithConfig(), self.ai_name, messages)
+
     def start_interaction_loop(self):
         # Interaction Loop
         cfg = Config()
@@ -86,7 +95,7 @@ class Agent:
                     self,
                     self.system_prompt,
                     self.triggering_prompt,
-                    self.full_message_history,
+                    self.full_message_history.context(cfg.fast_token_limit),
                     self.memory,
                     cfg.fast_token_limit,
                 )  # TODO: This hardcodes the model to use GPT3.5. Make this an argument
@@ -1,23 +1,41 @@
 """Agent manager for managing AI agents"""
 from __future__ import annotations
 
-from typing import List, Union
+import asyncio
+from typing import Dict, List, Union
 
+from lilith.agent.scheduler import AgentScheduler, AgentState, TokenBudgetExceeded
 from lilith.config.config import Config, Singleton
-from lilith.llm_utils import create_chat_completion
 from lilith.types.openai import Message
 
 
 class AgentManager(metaclass=Singleton):
-    """Agent manager for managing AI agents"""
+    """Agent manager for managing AI agents
 
-    def __init__(self):
-        self.next_key = 0
-        self.agents = {}  # key, (task, full_message_history, model)
+    The completions of the agents go through an AgentScheduler, so that
+    several agents can be created or messaged at once (create_agents,
+    message_agents) while the scheduler enforces the rate limit and the
+    per-agent token budgets.
+    """
+
+    def __init__(self, scheduler: AgentScheduler | None = None):
         self.cfg = Config()
+        self.scheduler = scheduler or AgentScheduler(
+            requests_per_minute=self.cfg.agent_requests_per_minute,
+            max_concurrent=self.cfg.agent_max_concurrent,
+            token_budget=self.cfg.agent_token_budget or None,
+            request_timeout=self.cfg.agent_request_timeout or None,
+            state_dir=self.cfg.agent_state_dir or None,
+        )
+        # Keys of agents restored from the state directory stay taken
+        self.next_key = max(self.scheduler.keys(), default=-1) + 1
+
+    @property
+    def agents(self) -> Dict[int, AgentState]:
+        """The agents held in memory (evicted agents are not included)"""
+        return self.scheduler.agents
 
     # Create new AI agent
-    # TODO: Centralise use of create_chat_completion() to globally enforce token limit
 
     def create_agent(self, task: str, prompt: str, model: str) -> tuple[int, str]:
         """Create a new agent and return its key
@@ -30,6 +48,26 @@ class AgentManager(metaclass=Singleton):
         Returns:
             The key of the new agent
         """
+        return self.scheduler.run(self.acreate_agent(task, prompt, model))
+
+    def create_agents(self, specs: List[tuple[str, str, str]]) -> List[tuple[int, str]]:
+        """Create several agents concurrently
+
+        Args:
+            specs: The (task, prompt, model) of each agent
+
+        Returns:
+            The (key, reply) of each agent
+        """
+
+        async def create_all():
+            return await asyncio.gather(
+                *(self.acreate_agent(*spec) for spec in specs)
+            )
+
+        return self.scheduler.run(create_all())
+
+    async def acreate_agent(self, task: str, prompt: str, model: str) -> tuple[int, str]:
         messages: List[Message] = [
             {"role": "user", "content": prompt},
         ]
@@ -38,11 +76,20 @@ class AgentManager(metaclass=Singleton):
                 continue
             if plugin_messages := plugin.pre_instruction(messages):
                 messages.extend(iter(plugin_messages))
+
+        key = self.next_key
+        # This is done instead of len(agents) to make keys unique even if agents
+        # are deleted
+        self.next_key += 1
+        state = AgentState(key=key, task=task, model=model, messages=messages)
+        self.scheduler.add(state)
+
         # Start AI instance
-        agent_reply = create_chat_completion(
-            model=model,
-            messages=messages,
-        )
+        try:
+            agent_reply = await self.scheduler.complete(state, messages)
+        except BaseException:
+            self.scheduler.remove(key)
+            raise
 
         messages.append({"role": "assistant", "content": agent_reply})
 
@@ -56,12 +103,6 @@ class AgentManager(metaclass=Singleton):
 
         if plugins_reply and plugins_reply != "":
             messages.append({"role": "assistant", "content": plugins_reply})
-        key = self.next_key
-        # This is done instead of len(agents) to make keys unique even if agents
-        # are deleted
-        self.next_key += 1
-
-        self.agents[key] = (task, messages, model)
 
         for plugin in self.cfg.plugins:
             if not plugin.can_handle_post_instruction():
@@ -80,7 +121,31 @@ class AgentManager(metaclass=Singleton):
         Returns:
             The agent's response
         """
-        task, messages, model = self.agents[int(key)]
+        return self.scheduler.run(self.amessage_agent(key, message))
+
+    def message_agents(self, messages: Dict[Union[str, int], str]) -> Dict[int, str]:
+        """Send messages to several agents concurrently
+
+        Args:
+            messages: The message to send to each agent, by key
+
+        Returns:
+            The response of each agent, by key
+        """
+
+        async def message_all():
+            keys = [int(key) for key in messages]
+            replies = await asyncio.gather(
+                *(self.amessage_agent(key, message) for key, message in messages.items())
+            )
+            return dict(zip(keys, replies))
+
+        return self.scheduler.run(message_all())
+
+    async def amessage_agent(self, key: str | int, message: str) -> str:
+        state = self.scheduler.get(int(key))
+        messages = state.messages
+        sent = len(messages)
 
         # Add user message to message history before sending to agent
         messages.append({"role": "user", "content": message})
@@ -92,11 +157,21 @@ class AgentManager(metaclass=Singleton):
                 for plugin_message in plugin_messages:
                     messages.append(plugin_message)
 
-        # Start AI instance
-        agent_reply = create_chat_completion(
-            model=model,
-            messages=messages,
-        )
+        # Start AI instance; without a reply, the history is left as it was
+        try:
+            agent_reply = await self.scheduler.complete(state, messages)
+        except TokenBudgetExceeded as e:
+            del messages[sent:]
+            return f"Error: {e}"
+        except asyncio.TimeoutError:
+            del messages[sent:]
+            return f"Error: Agent {state.key} timed out"
+        except asyncio.CancelledError:
+            del messages[sent:]
+            return f"Error: Agent {state.key} was cancelled"
+        except BaseException:
+            del messages[sent:]
+            raise
 
         messages.append({"role": "assistant", "content": agent_reply})
 
@@ -126,7 +201,7 @@ class AgentManager(metaclass=Singleton):
         """
 
         # Return a list of agent keys and their tasks
-        return [(key, task) for key, (task, _, _) in self.agents.items()]
+        return [(key, self.scheduler.peek(key).task) for key in self.scheduler.keys()]
 
     def delete_agent(self, key: str | int) -> bool:
         """Delete an agent from the agent manager
@@ -138,8 +213,27 @@ class AgentManager(metaclass=Singleton):
             True if successful, False otherwise
         """
 
-        try:
-            del self.agents[int(key)]
-            return True
-        except KeyError:
-            return False
+        return self.scheduler.remove(int(key))
+
+    def evict_idle_agents(self, max_idle: float) -> list[int]:
+        """Move the agents not messaged for max_idle seconds out of memory
+
+        Args:
+            max_idle: Seconds of inactivity
+
+        Returns:
+            The keys of the evicted agents
+        """
+        return self.scheduler.evict_idle(max_idle)
+
+    def cancel_stale_agents(self, max_idle: float) -> list[int]:
+        """Delete the agents not messaged for max_idle seconds, cancelling
+        their requests
+
+        Args:
+            max_idle: Seconds of inactivity
+
+        Returns:
+            The keys of the deleted agents
+        """
+        return self.scheduler.cancel_stale(max_idle)
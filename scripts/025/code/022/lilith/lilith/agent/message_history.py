@@ -0,0 +1,223 @@
+"""Token-budgeted message history of an agent"""
+from __future__ import annotations
+
+import json
+import os
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Callable, Iterator, List, Optional
+
+from lilith.llm_cache import create_chat_completion
+from lilith.token_counter import count_message_tokens
+from lilith.types.openai import Message
+
+Summarizer = Callable[[Optional[str], List[Message]], str]
+
+
+class HistoryContext(list):
+    """The messages sent to the model for one turn.
+
+    Messages appended to it (the user input and the reply of the turn) are
+    also appended to the history it was taken from.
+    """
+
+    def __init__(self, history: MessageHistory, messages: List[Message]):
+        super().__init__(messages)
+        self.history = history
+
+    def append(self, message: Message) -> None:
+        super().append(message)
+        self.history.append(message)
+
+
+class MessageHistory:
+    """
+    Full message history of an agent, with the token count of every message
+    computed once, when it is appended.
+
+    The most recent messages, up to window_tokens, are kept in memory with a
+    running total of their tokens.  Older messages are moved out of the
+    window as new ones come in: to spill_path (one JSON line each) if it is
+    set, else to a list in memory.  With a summarizer, the messages leaving
+    the window are also folded, segment_tokens at a time, into a running
+    summary of the conversation so far.
+
+    The history behaves as the list of all its messages (older ones are read
+    back from the spill file on access), and context() assembles the
+    messages of a turn from the window alone, so that the cost of a turn
+    does not grow with the length of the run.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        messages: List[Message] = (),
+        window_tokens: int = 8000,
+        spill_path: Optional[str | Path] = None,
+        summarizer: Optional[Summarizer] = None,
+        segment_tokens: int = 1000,
+        token_counter: Callable[[List[Message], str], int] = count_message_tokens,
+    ):
+        self.model = model
+        self.window_tokens = window_tokens
+        self.summarizer = summarizer
+        self.segment_tokens = segment_tokens
+        self.token_counter = token_counter
+        self.summary: Optional[str] = None
+        self.summary_tokens = 0
+        self.total_tokens = 0  # of every message ever appended
+        self._window: deque[tuple[Message, int]] = deque()
+        self._window_total = 0
+        self._segment: List[Message] = []
+        self._segment_total = 0
+        self._old: List[Message] = []  # messages out of the window, without spill_path
+        self._offsets: List[int] = []  # offsets in the spill file, with spill_path
+        self._spill = None
+        if spill_path is not None:
+            Path(spill_path).parent.mkdir(parents=True, exist_ok=True)
+            self._spill = open(spill_path, "a+b")
+        for message in messages:
+            self.append(message)
+
+    def append(self, message: Message) -> None:
+        """Add a message at the end of the history"""
+        tokens = self.token_counter([message], self.model)
+        self._window.append((message, tokens))
+        self._window_total += tokens
+        self.total_tokens += tokens
+        while self._window_total > self.window_tokens and len(self._window) > 1:
+            old_message, old_tokens = self._window.popleft()
+            self._window_total -= old_tokens
+            self._evict(old_message, old_tokens)
+
+    def extend(self, messages: List[Message]) -> None:
+        for message in messages:
+            self.append(message)
+
+    def _evict(self, message: Message, tokens: int) -> None:
+        if self._spill is None:
+            self._old.append(message)
+        else:
+            self._spill.seek(0, 2)
+            self._offsets.append(self._spill.tell())
+            self._spill.write(json.dumps(message).encode("utf-8") + b"\n")
+            self._spill.flush()
+        if self.summarizer is None:
+            return
+        self._segment.append(message)
+        self._segment_total += tokens
+        if self._segment_total >= self.segment_tokens:
+            self.summary = self.summarizer(self.summary, self._segment)
+            self.summary_tokens = self.token_counter(
+                [self._summary_message()], self.model
+            )
+            self._segment, self._segment_total = [], 0
+
+    def _summary_message(self) -> Message:
+        return {
+            "role": "system",
+            "content": f"Summary of the earlier conversation: {self.summary}",
+        }
+
+    def context(self, token_limit: int) -> HistoryContext:
+        """The most recent messages that fit in token_limit tokens, preceded by
+        the summary of the older ones if it fits too
+
+        Args:
+            token_limit (int): The maximum number of tokens of the messages
+
+        Returns:
+            HistoryContext: The messages, oldest first
+        """
+        messages = []
+        used = 0
+        for message, tokens in reversed(self._window):
+            if used + tokens > token_limit:
+                break
+            messages.append(message)
+            used += tokens
+        if self.summary is not None and used + self.summary_tokens <= token_limit:
+            messages.append(self._summary_message())
+        messages.reverse()
+        return HistoryContext(self, messages)
+
+    @property
+    def spilled(self) -> int:
+        """Number of messages out of the in-memory window"""
+        return len(self._offsets) if self._spill is not None else len(self._old)
+
+    def _read_old(self, index: int) -> Message:
+        if self._spill is None:
+            return self._old[index]
+        self._spill.seek(self._offsets[index])
+        return json.loads(self._spill.readline())
+
+    def __len__(self) -> int:
+        return self.spilled + len(self._window)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("message history index out of range")
+        spilled = self.spilled
+        if index >= spilled:
+            return self._window[index - spilled][0]
+        return self._read_old(index)
+
+    def __iter__(self) -> Iterator[Message]:
+        for index in range(self.spilled):
+            yield self._read_old(index)
+        for message, _ in list(self._window):
+            yield message
+
+    def close(self) -> None:
+        if self._spill is not None:
+            self._spill.close()
+
+
+def llm_summarizer(model: str) -> Summarizer:
+    """A summarizer asking model to fold messages into the running summary"""
+
+    def summarize(summary: Optional[str], messages: List[Message]) -> str:
+        events = "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+        prompt = (
+            "Update the summary of an AI agent's work with the new events below."
+            " Keep the goals, decisions, results and open problems; drop"
+            " details that no longer matter.\n\n"
+            f"Current summary:\n{summary or '(none yet)'}\n\nNew events:\n{events}"
+        )
+        return create_chat_completion(
+            model=model, messages=[{"role": "user", "content": prompt}]
+        )
+
+    return summarize
+
+
+def new_history(
+    cfg: Any, name: str, messages: List[Message] = (), **kwargs
+) -> MessageHistory:
+    """The message history of a new run of agent name, set up from a lilith
+    Config: its window is fast_token_limit tokens, older messages are spilled
+    to a new file of history_spill_dir (kept in memory if it is empty), and
+    summarized by fast_llm_model if summarize_history is set.  kwargs are
+    passed on to MessageHistory."""
+    spill_path = None
+    if cfg.history_spill_dir:
+        run = time.strftime("%Y%m%d-%H%M%S")
+        spill_path = os.path.join(
+            cfg.history_spill_dir, f"{name}-{run}-{os.getpid()}.jsonl"
+        )
+    return MessageHistory(
+        cfg.fast_llm_model,
+        messages,
+        window_tokens=cfg.fast_token_limit,
+        spill_path=spill_path,
+        summarizer=llm_summarizer(cfg.fast_llm_model)
+        if cfg.summarize_history
+        else None,
+        **kwargs,
+    )
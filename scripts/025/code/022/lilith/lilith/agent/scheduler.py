@@ -0,0 +1,292 @@
+"""Concurrent scheduling of the completions of many sub-agents"""
+from __future__ import annotations
+
+import asyncio
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from lilith.llm_cache import create_chat_completion
+from lilith.token_counter import count_message_tokens
+from lilith.types.openai import Message
+
+
+class TokenBudgetExceeded(Exception):
+    """Raised when a completion would take an agent over its token budget"""
+
+
+@dataclass
+class AgentState:
+    """Everything needed to resume an agent, as saved when it is evicted"""
+
+    key: int
+    task: str
+    model: str
+    messages: List[Message] = field(default_factory=list)
+    tokens_used: int = 0
+    token_budget: Optional[int] = None
+    last_active: float = field(default_factory=time.time)
+
+
+class RateLimiter:
+    """
+    At most max_concurrent requests at a time, and at most
+    requests_per_minute started in any 60 second window.
+    """
+
+    def __init__(self, requests_per_minute: int = 60, max_concurrent: int = 8):
+        self.requests_per_minute = requests_per_minute
+        self.max_concurrent = max_concurrent
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self._started: deque[float] = deque()
+        self._lock = asyncio.Lock()
+
+    async def __aenter__(self) -> None:
+        await self._slots.acquire()
+        try:
+            async with self._lock:
+                while len(self._started) >= self.requests_per_minute:
+                    wait = self._started[0] + 60 - time.monotonic()
+                    if wait <= 0:
+                        self._started.popleft()
+                    else:
+                        await asyncio.sleep(wait)
+                self._started.append(time.monotonic())
+        except BaseException:
+            self._slots.release()
+            raise
+
+    async def __aexit__(self, *exc_info) -> None:
+        self._slots.release()
+
+
+class AgentScheduler:
+    """
+    Runs the completions of many agents concurrently on one event loop.
+
+    The loop runs in a background thread, so synchronous code submits work
+    with run() and any number of agents wait on the model at once, within
+    the limits of the RateLimiter.  `completion(model, messages)` returns the
+    reply; it may be a coroutine function, else it runs in a thread pool.
+    The default calls create_chat_completion through the completion cache,
+    so pointing the OpenAI API base at a local server mocks the model for
+    the whole scheduler.
+
+    Each agent has a token budget (the prompt and reply tokens of all its
+    completions).  With a state_dir, idle agents can be evicted from memory:
+    their state is saved to a JSON file and loaded back when they are used.
+    """
+
+    def __init__(
+        self,
+        completion: Optional[Callable[[str, List[Message]], Any]] = None,
+        requests_per_minute: int = 60,
+        max_concurrent: int = 8,
+        token_budget: Optional[int] = None,
+        request_timeout: Optional[float] = None,
+        state_dir: Optional[str | Path] = None,
+        token_counter: Callable[[List[Message], str], int] = count_message_tokens,
+    ):
+        self.completion = completion or _default_completion
+        self.token_budget = token_budget
+        self.request_timeout = request_timeout
+        self.state_dir = Path(state_dir) if state_dir else None
+        self.token_counter = token_counter
+        self.agents: Dict[int, AgentState] = {}
+        self._evicted: set[int] = set()
+        self._requests: Dict[int, asyncio.Task] = {}
+        self._locks: Dict[int, asyncio.Lock] = {}
+        self._executor = ThreadPoolExecutor(max_concurrent, "lilith-agent")
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="lilith-agent-scheduler", daemon=True
+        )
+        self._thread.start()
+        self._limiter = self.run(_make_limiter(requests_per_minute, max_concurrent))
+        if self.state_dir is not None:
+            self.state_dir.mkdir(parents=True, exist_ok=True)
+            for path in self.state_dir.glob("agent-*.json"):
+                self._evicted.add(int(path.stem.split("-", 1)[1]))
+
+    def submit(self, coroutine) -> Future:
+        """Schedule a coroutine on the scheduler's loop"""
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop)
+
+    def run(self, coroutine) -> Any:
+        """Run a coroutine on the scheduler's loop and wait for its result"""
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            raise RuntimeError("run() called from the scheduler's own loop")
+        return self.submit(coroutine).result()
+
+    def close(self) -> None:
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._executor.shutdown(wait=False)
+
+    # Agent state
+
+    def add(self, state: AgentState) -> None:
+        if state.token_budget is None:
+            state.token_budget = self.token_budget
+        self.agents[state.key] = state
+
+    def get(self, key: int) -> AgentState:
+        """Return the state of an agent, loading it back if it was evicted
+
+        Raises:
+            KeyError: If there is no such agent
+        """
+        state = self.peek(key)
+        self._evicted.discard(key)
+        self.agents[key] = state
+        return state
+
+    def peek(self, key: int) -> AgentState:
+        """Return the state of an agent without loading it back into memory
+
+        Raises:
+            KeyError: If there is no such agent
+        """
+        state = self.agents.get(key)
+        if state is not None:
+            return state
+        if key not in self._evicted:
+            raise KeyError(key)
+        with open(self._state_path(key), "r", encoding="utf-8") as f:
+            return AgentState(**json.load(f))
+
+    def keys(self) -> List[int]:
+        return sorted(set(self.agents) | self._evicted)
+
+    def remove(self, key: int) -> bool:
+        """Forget an agent, cancelling its request; False if there is none"""
+        found = self.agents.pop(key, None) is not None
+        if key in self._evicted:
+            self._evicted.discard(key)
+            self._state_path(key).unlink(missing_ok=True)
+            found = True
+        self.cancel(key)
+        self._locks.pop(key, None)
+        return found
+
+    def _state_path(self, key: int) -> Path:
+        return self.state_dir / f"agent-{key}.json"
+
+    def _busy(self, key: int) -> bool:
+        """Whether an agent is being messaged (its lock is held)"""
+        lock = self._locks.get(key)
+        return key in self._requests or (lock is not None and lock.locked())
+
+    def evict_idle(self, max_idle: float) -> List[int]:
+        """Save the agents unused for max_idle seconds to disk and drop them
+        from memory, skipping those being messaged; returns their keys"""
+        return self.run(self._evict_idle(max_idle))
+
+    async def _evict_idle(self, max_idle: float) -> List[int]:
+        # on the loop, so that no completion starts or ends meanwhile
+        if self.state_dir is None:
+            return []
+        now = time.time()
+        evicted = []
+        for key, state in list(self.agents.items()):
+            if now - state.last_active < max_idle or self._busy(key):
+                continue
+            tmp_path = self._state_path(key).with_suffix(".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(asdict(state), f)
+            os.replace(tmp_path, self._state_path(key))
+            del self.agents[key]
+            self._evicted.add(key)
+            evicted.append(key)
+        return evicted
+
+    def cancel(self, key: int) -> bool:
+        """Cancel the request in flight of an agent, if any"""
+        task = self._requests.get(key)
+        if task is None:
+            return False
+        self._loop.call_soon_threadsafe(task.cancel)
+        return True
+
+    def cancel_stale(self, max_idle: float) -> List[int]:
+        """Remove the agents in memory unused for max_idle seconds, skipping
+        those being messaged (evicted agents are kept); returns their keys"""
+        return self.run(self._cancel_stale(max_idle))
+
+    async def _cancel_stale(self, max_idle: float) -> List[int]:
+        now = time.time()
+        stale = [
+            key
+            for key, state in list(self.agents.items())
+            if now - state.last_active >= max_idle and not self._busy(key)
+        ]
+        for key in stale:
+            self.remove(key)
+        return stale
+
+    # Completions
+
+    async def complete(self, state: AgentState, messages: List[Message]) -> str:
+        """Get the model's reply to messages on behalf of an agent
+
+        The agent's requests are made one at a time, in order; requests of
+        different agents run concurrently under the rate limiter.
+
+        Raises:
+            TokenBudgetExceeded: If the prompt would exceed the agent's budget
+            asyncio.CancelledError: If the request was cancelled
+            asyncio.TimeoutError: If the request took more than request_timeout
+        """
+        lock = self._locks.setdefault(state.key, asyncio.Lock())
+        async with lock:
+            prompt_tokens = self.token_counter(messages, state.model)
+            if (
+                state.token_budget is not None
+                and state.tokens_used + prompt_tokens > state.token_budget
+            ):
+                raise TokenBudgetExceeded(
+                    f"Agent {state.key} has used {state.tokens_used} of its"
+                    f" {state.token_budget} tokens; this request needs {prompt_tokens}"
+                )
+            state.last_active = time.time()
+            task = asyncio.ensure_future(self._request(state.model, messages))
+            self._requests[state.key] = task
+            try:
+                reply = await asyncio.wait_for(task, self.request_timeout)
+            finally:
+                self._requests.pop(state.key, None)
+            reply_tokens = self.token_counter(
+                [{"role": "assistant", "content": reply}], state.model
+            )
+            state.tokens_used += prompt_tokens + reply_tokens
+            state.last_active = time.time()
+            return reply
+
+    async def _request(self, model: str, messages: List[Message]) -> str:
+        async with self._limiter:
+            if inspect.iscoroutinefunction(self.completion):
+                return await self.completion(model, messages)
+            return await self._loop.run_in_executor(
+                self._executor, functools.partial(self.completion, model, messages)
+            )
+
+
+async def _make_limiter(requests_per_minute: int, max_concurrent: int) -> RateLimiter:
+    # created on the scheduler's loop, which its primitives then belong to
+    return RateLimiter(requests_per_minute, max_concurrent)
+
+
+def _default_completion(model: str, messages: List[Message]) -> str:
+    return create_chat_completion(model=model, messages=messages)
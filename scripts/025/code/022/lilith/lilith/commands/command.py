@@ -1,10 +1,20 @@
+import hashlib
 import importlib
+import importlib.util
 import inspect
-from typing import Any, Callable, Optional
+import json
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional
 
 # Unique identifier for auto-gpt commands
 LILITH_COMMAND_IDENTIFIER = "lilith_command"
 
+MANIFEST_VERSION = 2
+DEFAULT_MANIFEST_PATH = os.path.join(
+    os.path.expanduser("~"), ".cache", "lilith", "command_manifest.json"
+)
+
 
 class Command:
     """A class representing a command.
@@ -40,16 +50,89 @@ class Command:
         return f"{self.name}: {self.description}, args: {self.signature}"
 
 
+class LazyCommand(Command):
+    """A command known from the manifest, whose module is not imported yet.
+
+    Calling it imports the module, which replaces it in the registry with
+    the real command, and runs that.
+    """
+
+    def __init__(
+        self,
+        registry: "CommandRegistry",
+        module_name: str,
+        name: str,
+        description: str,
+        signature: str,
+        enabled: bool = True,
+        disabled_reason: Optional[str] = None,
+    ):
+        super().__init__(
+            name, description, self._call, signature, enabled, disabled_reason
+        )
+        self.registry = registry
+        self.module_name = module_name
+
+    def load(self) -> Command:
+        """Import the module of the command and return the real command"""
+        self.registry.load_module(self.module_name)
+        command = self.registry.commands.get(self.name, self)
+        if command is self:
+            raise KeyError(
+                f"Command '{self.name}' not found in module '{self.module_name}'."
+            )
+        return command
+
+    def _call(self, *args, **kwargs) -> Any:
+        return self.load()(*args, **kwargs)
+
+
 class CommandRegistry:
     """
     The CommandRegistry class is a manager for a collection of Command objects.
     It allows the registration, modification, and retrieval of Command objects,
     as well as the scanning and loading of command plugins from a specified
     directory.
+
+    The commands found in each module are recorded in a manifest (a JSON file
+    at manifest_path, None to disable it) with the name, description and
+    signature of each command.  While a module and the environment are
+    unchanged, import_commands registers its commands from the manifest as
+    LazyCommand objects without importing it; the module is imported the
+    first time one of its commands is called.  Modules with a command that
+    is not unconditionally enabled are always imported, so that the state
+    of such commands comes from the current config and is never written
+    to the manifest.  The time taken by every
+    import is recorded, see import_report().
     """
 
-    def __init__(self):
+    def __init__(self, manifest_path: Optional[str] = DEFAULT_MANIFEST_PATH):
         self.commands = {}
+        self.manifest_path = manifest_path
+        self.import_times: Dict[str, float] = {}  # module name -> seconds
+        self._manifest = self._load_manifest()
+        self._environment = _environment_fingerprint()
+
+    def _load_manifest(self) -> Dict[str, Any]:
+        if not self.manifest_path or not os.path.exists(self.manifest_path):
+            return {}
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if manifest.get("version") != MANIFEST_VERSION:
+            return {}
+        return manifest.get("modules", {})
+
+    def _save_manifest(self) -> None:
+        if not self.manifest_path:
+            return
+        os.makedirs(os.path.dirname(self.manifest_path) or ".", exist_ok=True)
+        tmp_path = f"{self.manifest_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": MANIFEST_VERSION, "modules": self._manifest}, f)
+        os.replace(tmp_path, self.manifest_path)
 
     def _import_module(self, module_name: str) -> Any:
         return importlib.import_module(module_name)
@@ -106,21 +189,119 @@ class CommandRegistry:
             module_name (str): The name of the module to import for command plugins.
         """
 
+        stamp = self._module_stamp(module_name)
+        entry = self._manifest.get(module_name)
+        if entry is not None and stamp is not None and entry["stamp"] == stamp:
+            for spec in entry["commands"]:
+                self.register(LazyCommand(self, module_name, **spec))
+            return
+
+        commands = self.load_module(module_name)
+        if stamp is None:
+            return
+        if any(cmd.enabled is not True for cmd in commands):
+            # enabled is an expression over the config (which may hold
+            # secrets, and change at runtime): evaluate it on every start
+            if self._manifest.pop(module_name, None) is not None:
+                self._save_manifest()
+            return
+        self._manifest[module_name] = {
+            "stamp": stamp,
+            "commands": [
+                {
+                    "name": cmd.name,
+                    "description": cmd.description,
+                    "signature": cmd.signature,
+                }
+                for cmd in commands
+            ],
+        }
+        self._save_manifest()
+
+    def load_module(self, module_name: str) -> List[Command]:
+        """Import a module and register the commands it defines
+
+        Args:
+            module_name (str): The name of the module to import for command plugins.
+
+        Returns:
+            List[Command]: The commands registered from the module
+        """
+        start = time.perf_counter()
         module = importlib.import_module(module_name)
+        self.import_times[module_name] = time.perf_counter() - start
 
+        commands = []
         for attr_name in dir(module):
             attr = getattr(module, attr_name)
             # Register decorated functions
             if hasattr(attr, LILITH_COMMAND_IDENTIFIER) and getattr(
                 attr, LILITH_COMMAND_IDENTIFIER
             ):
-                self.register(attr.command)
+                commands.append(attr.command)
             # Register command classes
             elif (
-                inspect.isclass(attr) and issubclass(attr, Command) and attr != Command
+                inspect.isclass(attr)
+                and issubclass(attr, Command)
+                and attr not in (Command, LazyCommand)
             ):
-                cmd_instance = attr()
-                self.register(cmd_instance)
+                commands.append(attr())
+        for cmd in commands:
+            self.register(cmd)
+        return commands
+
+    def _module_stamp(self, module_name: str) -> Optional[str]:
+        """Fingerprint of the source of a module and of the environment
+        (descriptions may depend on environment variables), None if the
+        module has no source file"""
+        try:
+            spec = importlib.util.find_spec(module_name)
+        except (ImportError, ValueError):
+            return None
+        if spec is None or not spec.origin or not os.path.exists(spec.origin):
+            return None
+        stat = os.stat(spec.origin)
+        return f"{stat.st_mtime_ns}:{stat.st_size}:{self._environment}"
+
+    def import_report(self) -> str:
+        """
+        Returns the modules imported so far with the time their import took,
+        slowest first; modules served from the manifest are not imported at
+        startup, and appear here only once one of their commands is used
+        """
+        lines = [
+            f"{seconds * 1000:9.1f} ms  {module_name}"
+            for module_name, seconds in sorted(
+                self.import_times.items(), key=lambda item: -item[1]
+            )
+        ]
+        lazy = sorted(
+            {
+                cmd.module_name
+                for cmd in self.commands.values()
+                if isinstance(cmd, LazyCommand)
+            }
+        )
+        if lazy:
+            lines.append(f"not imported yet: {', '.join(lazy)}")
+        return "\n".join(lines)
+
+
+# Variables that change from one shell to the next without affecting commands
+_VOLATILE_VARIABLES = {
+    "_", "PWD", "OLDPWD", "SHLVL", "COLUMNS", "LINES", "PS1", "GPG_TTY",
+    "SSH_AUTH_SOCK", "SSH_CLIENT", "SSH_CONNECTION", "SSH_TTY",
+    "TERM_SESSION_ID", "WINDOWID", "XDG_SESSION_ID", "TMUX", "TMUX_PANE", "STY",
+}
+
+
+def _environment_fingerprint() -> str:
+    digest = hashlib.sha256()
+    for key, value in sorted(os.environ.items()):
+        if key in _VOLATILE_VARIABLES:
+            continue
+        digest.update(f"{key}={value}\0".encode("utf-8", "surrogateescape"))
+    return digest.hexdigest()[:16]
 
 
 def command(
@@ -1,16 +1,56 @@
 """Execute code in a Docker container"""
+import atexit
 import os
 import subprocess
+import sys
+import threading
+from typing import List
 
 import docker
 from docker.errors import ImageNotFound
+from requests.exceptions import ConnectionError, ReadTimeout
 
 from lilith.commands.command import command
-from lilith.config import Config
+from lilith.commands.process_runner import (
+    BoundedOutput,
+    ProcessResult,
+    PythonWorkerPool,
+    run_many,
+    run_process,
+)
+from lilith.config.config import Config
 from lilith.workspace import WORKSPACE_PATH, path_in_workspace
 
 CFG = Config()
 
+_python_workers = None
+
+
+def _limits() -> dict:
+    """Time limits and output bounds of code execution, from the config"""
+    return {
+        "timeout": CFG.execute_timeout or None,
+        "cpu_time_limit": CFG.execute_cpu_time_limit or None,
+        "head_bytes": CFG.execute_output_head_bytes,
+        "tail_bytes": CFG.execute_output_tail_bytes,
+    }
+
+
+def _python_worker_pool() -> PythonWorkerPool:
+    global _python_workers
+    if _python_workers is None:
+        _python_workers = PythonWorkerPool(CFG.python_worker_pool_size)
+        atexit.register(_python_workers.close)
+    return _python_workers
+
+
+def _python_file_output(result: ProcessResult) -> str:
+    if result.timed_out:
+        return f"Error: Execution timed out after {result.elapsed:.0f} seconds"
+    if result.returncode == 0:
+        return result.stdout
+    return f"Error: {result.stderr}"
+
 
 @command("execute_python_file", "Execute Python File", '"filename": "<filename>"')
 def execute_python_file(filename: str) -> str:
@@ -34,13 +74,15 @@ def execute_python_file(filename: str) -> str:
         return f"Error: File '{file}' does not exist."
 
     if we_are_running_in_a_docker_container():
-        result = subprocess.run(
-            f"python {file_path}", capture_output=True, encoding="utf8", shell=True
-        )
-        if result.returncode == 0:
-            return result.stdout
+        if CFG.python_worker_pool_size > 0:
+            result = _python_worker_pool().run_file(
+                file_path, cwd=WORKSPACE_PATH, **_limits()
+            )
         else:
-            return f"Error: {result.stderr}"
+            result = run_process(
+                [sys.executable, str(file_path)], cwd=WORKSPACE_PATH, **_limits()
+            )
+        return _python_file_output(result)
 
     try:
         client = docker.from_env()
@@ -80,14 +122,28 @@ def execute_python_file(filename: str) -> str:
             detach=True,
         )
 
-        container.wait()
-        logs = container.logs().decode("utf-8")
-        container.remove()
+        # Read the logs as they are produced, keeping only their head and tail
+        logs = BoundedOutput(
+            CFG.execute_output_head_bytes, CFG.execute_output_tail_bytes
+        )
 
-        # print(f"Execution complete. Output: {output}")
-        # print(f"Logs: {logs}")
+        def read_logs():
+            for chunk in container.logs(stream=True, follow=True):
+                logs.write(chunk)
 
-        return logs
+        reader = threading.Thread(target=read_logs, daemon=True)
+        reader.start()
+        try:
+            container.wait(timeout=CFG.execute_timeout or None)
+        except (ReadTimeout, ConnectionError):
+            container.kill()
+            reader.join(1)
+            container.remove(force=True)
+            return f"Error: Execution timed out after {CFG.execute_timeout:.0f} seconds"
+        reader.join()
+        container.remove()
+
+        return logs.getvalue()
 
     except docker.errors.DockerException as e:
         print(
@@ -124,19 +180,46 @@ def execute_shell(command_line: str) -> str:
             " shell commands, EXECUTE_LOCAL_COMMANDS must be set to 'True' "
             "in your config. Do not attempt to bypass the restriction."
         )
-    current_dir = os.getcwd()
-    # Change dir into workspace if necessary
-    if str(WORKSPACE_PATH) not in current_dir:
-        os.chdir(WORKSPACE_PATH)
+    print(f"Executing command '{command_line}' in working directory '{WORKSPACE_PATH}'")
 
-    print(f"Executing command '{command_line}' in working directory '{os.getcwd()}'")
+    result = run_process(command_line, shell=True, cwd=WORKSPACE_PATH, **_limits())
+    return str(result)
 
-    result = subprocess.run(command_line, capture_output=True, shell=True)
-    output = f"STDOUT:\n{result.stdout}\nSTDERR:\n{result.stderr}"
 
-    # Change back to whatever the prior working dir was
+@command(
+    "execute_shell_commands",
+    "Execute Shell Commands in parallel, non-interactive commands only",
+    '"command_lines": "<list_of_command_lines>"',
+    CFG.execute_local_commands,
+    "You are not allowed to run local shell commands. To execute"
+    " shell commands, EXECUTE_LOCAL_COMMANDS must be set to 'True' "
+    "in your config. Do not attempt to bypass the restriction.",
+)
+def execute_shell_commands(command_lines: List[str]) -> str:
+    """Execute several independent shell commands in parallel
 
-    os.chdir(current_dir)
+    Args:
+        command_lines (List[str]): The command lines to execute
+
+    Returns:
+        str: The output of each command, in order
+    """
+    if not CFG.execute_local_commands:
+        return (
+            "You are not allowed to run local shell commands. To execute"
+            " shell commands, EXECUTE_LOCAL_COMMANDS must be set to 'True' "
+            "in your config. Do not attempt to bypass the restriction."
+        )
+    if isinstance(command_lines, str):
+        command_lines = [command_lines]
+
+    print(f"Executing {len(command_lines)} commands in '{WORKSPACE_PATH}'")
+
+    results = run_many(command_lines, shell=True, cwd=WORKSPACE_PATH, **_limits())
+    return "\n\n".join(
+        f"$ {command_line}\n{result}"
+        for command_line, result in zip(command_lines, results)
+    )
 
 
 @command(
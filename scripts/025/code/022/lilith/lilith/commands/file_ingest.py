@@ -0,0 +1,286 @@
+"""Streaming ingestion of files and directory trees into memory"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Any, Dict, Generator, Iterable, List, Optional, TextIO
+
+SENTENCE_ENDS = (". ", "! ", "? ", ".\n", "!\n", "?\n", "\n\n")
+
+
+def _find_cut(text: str, low: int, high: int) -> int:
+    """Index in (low, high] to end a chunk at: after the last sentence end,
+    else after the last whitespace, else high"""
+    best = -1
+    for end in SENTENCE_ENDS:
+        i = text.rfind(end, low, high)
+        if i >= 0:
+            best = max(best, i + len(end))
+    if best > low:
+        return best
+    for i in range(high - 1, low, -1):
+        if text[i].isspace():
+            return i + 1
+    return high
+
+
+def _find_start(text: str, low: int, high: int) -> int:
+    """Index in [low, high) to start an overlap at: the first word start"""
+    for i in range(low, high):
+        if text[i].isspace():
+            return i + 1 if i + 1 < high else low
+    return low
+
+
+def split_stream(
+    stream: TextIO, max_length: int = 4000, overlap: int = 0, read_size: int = 1 << 16
+) -> Generator[str, None, None]:
+    """
+    Split a text stream into chunks of at most max_length characters, ending
+    each chunk at a sentence end or word boundary where there is one in its
+    second half, and repeating about `overlap` characters (from a word start)
+    at the beginning of the next chunk.
+
+    At most max_length + read_size characters of the stream are held at a time.
+
+    :param stream: The text stream to read, e.g. a file opened in text mode
+    :param max_length: The maximum length of each chunk
+    :param overlap: The number of characters repeated between chunks
+    :param read_size: The number of characters read from the stream at a time
+    :return: A generator yielding chunks of text
+    """
+    if not 0 <= overlap < max_length // 2:
+        raise ValueError("overlap must be non-negative and less than max_length / 2")
+    buffer = ""
+    carried = 0  # characters at the start of buffer already yielded
+    eof = False
+    while True:
+        while not eof and len(buffer) <= max_length:
+            data = stream.read(read_size)
+            if data:
+                buffer += data
+            else:
+                eof = True
+        if len(buffer) <= carried:
+            return
+        if eof and len(buffer) <= max_length:
+            yield buffer
+            return
+        cut = _find_cut(buffer, max(max_length // 2, carried), max_length)
+        yield buffer[:cut]
+        start = _find_start(buffer, cut - overlap, cut) if overlap else cut
+        buffer = buffer[start:]
+        carried = cut - start
+
+
+def add_batch(memory: Any, texts: List[str]) -> None:
+    """Add texts to memory with its bulk API (add_batch) if it has one
+
+    Args:
+        memory (Any): An object with an add() method and optionally add_batch()
+        texts (List[str]): The texts to add
+    """
+    bulk = getattr(memory, "add_batch", None)
+    if bulk is not None:
+        bulk(texts)
+    else:
+        for text in texts:
+            memory.add(text)
+
+
+def _batches(items: Iterable[str], size: int) -> Generator[List[str], None, None]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class IngestProgress:
+    """
+    Number of chunks of each file already added to memory, saved to a JSON
+    file at most every save_interval seconds and by save(), so that an
+    interrupted ingestion can resume.  Chunks added after the last save are
+    added again when resuming.
+
+    A file's progress is kept only while its size and mtime, and the
+    max_length and overlap it is split with, are unchanged.
+    """
+
+    def __init__(
+        self, path: Optional[str | Path] = None, save_interval: float = 5.0
+    ) -> None:
+        self.path = Path(path) if path else None
+        self.save_interval = save_interval
+        self._lock = threading.Lock()
+        self._files: Dict[str, Dict[str, Any]] = {}
+        self._dirty = False
+        self._saved = time.monotonic()
+        if self.path and self.path.exists():
+            with open(self.path, "r", encoding="utf-8") as f:
+                self._files = json.load(f)
+
+    @staticmethod
+    def _stamp(filepath: str | Path, max_length: int, overlap: int) -> List[float]:
+        stat = os.stat(filepath)
+        return [stat.st_size, stat.st_mtime, max_length, overlap]
+
+    def done(
+        self, filepath: str | Path, max_length: int, overlap: int
+    ) -> tuple[int, bool]:
+        """Return (chunks already added, whether the file is complete)"""
+        with self._lock:
+            entry = self._files.get(str(filepath))
+            if entry is None or entry["stamp"] != self._stamp(
+                filepath, max_length, overlap
+            ):
+                return 0, False
+            return entry["chunks"], entry["complete"]
+
+    def update(
+        self,
+        filepath: str | Path,
+        chunks: int,
+        max_length: int,
+        overlap: int,
+        complete: bool = False,
+    ) -> None:
+        with self._lock:
+            self._files[str(filepath)] = {
+                "stamp": self._stamp(filepath, max_length, overlap),
+                "chunks": chunks,
+                "complete": complete,
+            }
+            self._dirty = True
+            if time.monotonic() - self._saved >= self.save_interval:
+                self._save()
+
+    def save(self) -> None:
+        """Write the progress recorded since the last save"""
+        with self._lock:
+            self._save()
+
+    def _save(self) -> None:
+        self._saved = time.monotonic()
+        if self.path is None or not self._dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps(self._files))  # dumps, unlike dump, uses the C encoder
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+
+
+def ingest_path(
+    filepath: str | Path,
+    memory: Any,
+    label: Optional[str] = None,
+    max_length: int = 4000,
+    overlap: int = 200,
+    batch_size: int = 32,
+    progress: Optional[IngestProgress] = None,
+    lock: Optional[threading.Lock] = None,
+) -> int:
+    """
+    Stream one file into memory, batch_size chunks at a time.
+
+    :param filepath: The path of the file to ingest
+    :param memory: An object with an add() method, and optionally add_batch()
+    :param label: The filename recorded with each chunk, default is filepath
+    :param max_length: The maximum length of each chunk
+    :param overlap: The number of overlapping characters between chunks
+    :param batch_size: The number of chunks handed to memory at a time
+    :param progress: Where to record and resume the chunks already added;
+        the caller saves it with progress.save()
+    :param lock: Held while adding to memory, when memory is shared by threads
+    :return: The number of chunks of the file in memory
+    """
+    label = label or str(filepath)
+    skip, complete = (
+        progress.done(filepath, max_length, overlap) if progress else (0, False)
+    )
+    if complete:
+        return skip
+    count = 0
+    with open(filepath, "r", encoding="utf-8", errors="replace") as f:
+        chunks = split_stream(f, max_length=max_length, overlap=overlap)
+        for batch in _batches(chunks, batch_size):
+            start = count
+            count += len(batch)
+            if count <= skip:
+                continue  # added before the interruption
+            texts = [
+                f"Filename: {label}\nContent part#{start + i + 1}: {chunk}"
+                for i, chunk in enumerate(batch)
+                if start + i >= skip
+            ]
+            with lock or nullcontext():
+                add_batch(memory, texts)
+            if progress:
+                progress.update(filepath, count, max_length, overlap)
+    if progress:
+        progress.update(filepath, count, max_length, overlap, complete=True)
+    return count
+
+
+def ingest_directory(
+    directory: str | Path,
+    memory: Any,
+    max_length: int = 4000,
+    overlap: int = 200,
+    batch_size: int = 32,
+    workers: int = 4,
+    progress_file: Optional[str | Path] = None,
+    exclude: Iterable[str | Path] = (),
+) -> Dict[str, int]:
+    """
+    Ingest every file under directory, `workers` files at a time.
+
+    Each worker streams its own file, so at most about
+    workers * batch_size * max_length characters are in flight; the
+    batches are added to memory one at a time.  With a
+    progress_file, files (and chunks) already ingested are skipped when the
+    ingestion is run again.
+
+    :param directory: The root of the tree to ingest; hidden files are skipped
+    :param memory: An object with an add() method, and optionally add_batch()
+    :param workers: The number of files ingested in parallel
+    :param progress_file: The JSON file recording the progress
+    :param exclude: Files not to ingest
+    :return: The number of chunks of each file, by path relative to directory
+    """
+    progress = IngestProgress(progress_file)
+    excluded = {os.path.realpath(path) for path in exclude}
+    if progress_file:
+        excluded.add(os.path.realpath(progress_file))
+    paths = []
+    for root, dirs, files in os.walk(directory):
+        dirs[:] = [d for d in dirs if not d.startswith(".")]
+        paths.extend(
+            path
+            for path in (os.path.join(root, f) for f in files if not f.startswith("."))
+            if os.path.realpath(path) not in excluded
+        )
+
+    memory_lock = threading.Lock()
+
+    def ingest(path):
+        label = os.path.relpath(path, directory)
+        return label, ingest_path(
+            path, memory, label, max_length, overlap, batch_size, progress, memory_lock
+        )
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return dict(executor.map(ingest, sorted(paths)))
+    finally:
+        progress.save()
@@ -0,0 +1,275 @@
+"""Append-only journal of the file operations performed by lilith"""
+from __future__ import annotations
+
+import atexit
+import hashlib
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Set, Tuple
+
+JOURNAL_HEADER = "File Operation Logger "
+OPERATIONS = ("write", "append", "delete")
+CHECKSUM_LENGTH = 32  # hex digits of a 16 byte blake2b digest
+
+
+def text_checksum(text: str) -> str:
+    """Return the checksum of text as it is written to a file
+
+    Args:
+        text (str): The text to hash
+
+    Returns:
+        str: The hex digest of the UTF-8 encoding of text
+    """
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def file_checksum(path: str | Path, chunk_size: int = 1 << 16) -> str:
+    """Return the checksum of the contents of a file
+
+    Args:
+        path (str | Path): The file to hash
+        chunk_size (int): The number of bytes read at a time
+
+    Returns:
+        str: The hex digest of the contents of the file
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def format_entry(operation: str, filename: str, checksum: Optional[str] = None) -> str:
+    """Format one journal line: "operation: filename" with an optional " #checksum" """
+    entry = f"{operation}: {filename}"
+    if checksum:
+        entry += f" #{checksum}"
+    return entry + "\n"
+
+
+def parse_entry(line: str) -> Optional[Tuple[str, str, Optional[str]]]:
+    """Parse one journal line
+
+    Lines written before checksums were recorded ("operation: filename") are
+    accepted with a checksum of None.
+
+    Args:
+        line (str): The line, without its trailing newline
+
+    Returns:
+        Optional[Tuple[str, str, Optional[str]]]: (operation, filename, checksum),
+            or None if the line is not an entry
+    """
+    if line.startswith(JOURNAL_HEADER):
+        line = line[len(JOURNAL_HEADER) :]
+    operation, sep, filename = line.partition(": ")
+    if not sep or operation not in OPERATIONS or not filename:
+        return None
+    checksum = None
+    head, sep, tail = filename.rpartition(" #")
+    if sep and len(tail) == CHECKSUM_LENGTH and all(c in "0123456789abcdef" for c in tail):
+        filename, checksum = head, tail
+    return operation, filename, checksum
+
+
+class FileJournal:
+    """
+    Append-only log of file operations with an in-memory index.
+
+    The log file is read once, on first use, into a map from each file to the
+    checksum of its last known contents (None if it was written before
+    checksums were recorded) and the set of files deleted since they were
+    last written.  Every operation after that updates the index and appends
+    one line, so checking for a duplicate operation does not touch the disk.
+
+    Appended lines are flushed to the OS at once, and fsynced to the disk
+    every `sync_every` entries or `sync_interval` seconds (and on close): a
+    crash can lose at most that window, and a line torn by a crash is
+    skipped when the log is loaded.  Once the log holds `compact_ratio`
+    times more entries than there are files (and at least
+    `compact_min_entries`), it is rewritten with one entry per file.
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        sync_every: int = 32,
+        sync_interval: float = 1.0,
+        compact_ratio: int = 4,
+        compact_min_entries: int = 1024,
+    ) -> None:
+        self.path = Path(path)
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.compact_ratio = compact_ratio
+        self.compact_min_entries = compact_min_entries
+        self._files: Optional[Dict[str, Optional[str]]] = None
+        self._deleted: Set[str] = set()
+        self._entries = 0
+        self._handle = None
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._lock = threading.RLock()
+        atexit.register(self.close)
+
+    def _load(self) -> Dict[str, Optional[str]]:
+        if self._files is not None:
+            return self._files
+        files: Dict[str, Optional[str]] = {}
+        deleted: Set[str] = set()
+        entries = 0
+        needs_newline = False
+        if self.path.exists():
+            with open(self.path, "r", encoding="utf-8", errors="replace") as f:
+                for line in f:
+                    if not line.endswith("\n"):
+                        # header-only log or a line torn by a crash: not an entry,
+                        # and the next append has to start on a fresh line
+                        needs_newline = True
+                        if not line.startswith(JOURNAL_HEADER):
+                            break
+                    entry = parse_entry(line.rstrip("\n"))
+                    if entry is None:
+                        continue
+                    entries += 1
+                    self._apply(files, deleted, *entry)
+        self._open(needs_newline)
+        self._files, self._deleted, self._entries = files, deleted, entries
+        return files
+
+    @staticmethod
+    def _apply(files, deleted, operation, filename, checksum) -> None:
+        if operation == "delete":
+            files.pop(filename, None)
+            deleted.add(filename)
+        else:
+            files[filename] = checksum
+            deleted.discard(filename)
+
+    def _open(self, needs_newline: bool = False) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        new = not self.path.exists()
+        self._handle = open(self.path, "a", encoding="utf-8")
+        if new:
+            self._handle.write(JOURNAL_HEADER + "\n")
+        elif needs_newline:
+            self._handle.write("\n")
+        self._handle.flush()
+
+    @property
+    def files(self) -> Dict[str, Optional[str]]:
+        """Map of every file the journal knows of to the checksum of its contents"""
+        with self._lock:
+            return dict(self._load())
+
+    def checksum(self, filename: str) -> Optional[str]:
+        """Return the last recorded checksum of filename, None if unknown"""
+        with self._lock:
+            return self._load().get(filename)
+
+    def is_duplicate(
+        self, operation: str, filename: str, checksum: Optional[str] = None
+    ) -> bool:
+        """Check if the operation would not change the state of the file
+
+        Args:
+            operation (str): The operation to check for
+            filename (str): The name of the file to check for
+            checksum (Optional[str]): The checksum of the contents to be written
+
+        Returns:
+            bool: True for a delete of a file already deleted, and for a write
+                of the contents the file already has
+        """
+        with self._lock:
+            files = self._load()
+            if operation == "delete":
+                return filename in self._deleted
+            if operation == "write":
+                return checksum is not None and files.get(filename) == checksum
+            return False
+
+    def record(
+        self, operation: str, filename: str, checksum: Optional[str] = None
+    ) -> None:
+        """Append an operation to the journal and update the index
+
+        Args:
+            operation (str): One of "write", "append" and "delete"
+            filename (str): The name of the file the operation was performed on
+            checksum (Optional[str]): The checksum of the file after the operation
+        """
+        if operation not in OPERATIONS:
+            raise ValueError(f"Unknown file operation '{operation}'")
+        with self._lock:
+            files = self._load()
+            self._apply(files, self._deleted, operation, filename, checksum)
+            self._handle.write(format_entry(operation, filename, checksum))
+            self._handle.flush()
+            self._entries += 1
+            self._unsynced += 1
+            if (
+                self._unsynced >= self.sync_every
+                or time.monotonic() - self._last_sync >= self.sync_interval
+            ):
+                self.sync()
+            if self._entries >= max(
+                self.compact_min_entries,
+                self.compact_ratio * (len(files) + len(self._deleted)),
+            ):
+                self.compact()
+
+    def sync(self) -> None:
+        """Force the appended entries to the disk"""
+        with self._lock:
+            if self._handle is None:
+                return
+            self._handle.flush()
+            os.fsync(self._handle.fileno())
+            self._unsynced = 0
+            self._last_sync = time.monotonic()
+
+    def compact(self) -> None:
+        """Rewrite the log with one entry per file
+
+        The new log is written and fsynced next to the old one, then renamed
+        over it, so a crash leaves either the old or the new log complete.
+        """
+        with self._lock:
+            files = self._load()
+            tmp_path = self.path.with_name(self.path.name + ".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(JOURNAL_HEADER + "\n")
+                for filename, checksum in files.items():
+                    f.write(format_entry("write", filename, checksum))
+                for filename in self._deleted:
+                    f.write(format_entry("delete", filename))
+                f.flush()
+                os.fsync(f.fileno())
+            self._handle.close()
+            os.replace(tmp_path, self.path)
+            if hasattr(os, "O_DIRECTORY"):
+                dir_fd = os.open(self.path.parent, os.O_RDONLY | os.O_DIRECTORY)
+                try:
+                    os.fsync(dir_fd)
+                finally:
+                    os.close(dir_fd)
+            self._handle = open(self.path, "a", encoding="utf-8")
+            self._entries = len(files) + len(self._deleted)
+            self._unsynced = 0
+            self._last_sync = time.monotonic()
+
+    def close(self) -> None:
+        """Sync and close the log; the next operation reopens it"""
+        with self._lock:
+            if self._handle is None:
+                return
+            self.sync()
+            self._handle.close()
+            self._handle = None
+            self._files = None
+            self._deleted = set()
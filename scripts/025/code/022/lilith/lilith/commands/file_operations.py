@@ -1,8 +1,10 @@
 """File operations for lilith"""
 from __future__ import annotations
 
+import hashlib
 import os
 import os.path
+from pathlib import Path
 from typing import Generator
 
 import requests
@@ -10,7 +12,10 @@ from colorama import Back, Fore
 from requests.adapters import HTTPAdapter, Retry
 
 from lilith.commands.command import command
-from lilith.config import Config
+from lilith.commands import file_ingest
+from lilith.commands.file_journal import FileJournal, text_checksum
+from lilith.commands.workspace_index import WorkspaceIndex
+from lilith.config.config import Config
 from lilith.spinner import Spinner
 from lilith.utils import readable_file_size
 from lilith.workspace import WORKSPACE_PATH, path_in_workspace
@@ -18,38 +23,47 @@ from lilith.workspace import WORKSPACE_PATH, path_in_workspace
 CFG = Config()
 LOG_FILE = "file_logger.txt"
 LOG_FILE_PATH = WORKSPACE_PATH / LOG_FILE
+JOURNAL = FileJournal(LOG_FILE_PATH)
+# Kept outside the workspace, one per workspace: writing them there would
+# change the mtime of the root directory, and so make every search rescan it,
+# and ingest_directory would ingest its own progress
+_WORKSPACE_ID = hashlib.sha256(
+    str(Path(WORKSPACE_PATH).resolve()).encode()
+).hexdigest()[:16]
+WORKSPACE_INDEX_FILE = (
+    Path(CFG.workspace_index_dir) / f"workspace_index-{_WORKSPACE_ID}.json"
+)
+INGEST_PROGRESS_FILE = (
+    Path(CFG.ingest_progress_dir) / f"ingest_progress-{_WORKSPACE_ID}.json"
+)
+WORKSPACE_INDEX = WorkspaceIndex(WORKSPACE_PATH, WORKSPACE_INDEX_FILE)
 
 
-def check_duplicate_operation(operation: str, filename: str) -> bool:
+def check_duplicate_operation(
+    operation: str, filename: str, checksum: str | None = None
+) -> bool:
     """Check if the operation has already been performed on the given file
 
     Args:
         operation (str): The operation to check for
         filename (str): The name of the file to check for
+        checksum (str | None): The checksum of the contents to be written
 
     Returns:
         bool: True if the operation has already been performed on the file
     """
-    log_content = read_file(LOG_FILE)
-    log_entry = f"{operation}: {filename}\n"
-    return log_entry in log_content
+    return JOURNAL.is_duplicate(operation, filename, checksum)
 
 
-def log_operation(operation: str, filename: str) -> None:
+def log_operation(operation: str, filename: str, checksum: str | None = None) -> None:
     """Log the file operation to the file_logger.txt
 
     Args:
         operation (str): The operation to log
         filename (str): The name of the file the operation was performed on
+        checksum (str | None): The checksum of the file after the operation
     """
-    log_entry = f"{operation}: {filename}\n"
-
-    # Create the log file if it doesn't exist
-    if not os.path.exists(LOG_FILE_PATH):
-        with open(LOG_FILE_PATH, "w", encoding="utf-8") as f:
-            f.write("File Operation Logger ")
-
-    append_to_file(LOG_FILE, log_entry, shouldLog=False)
+    JOURNAL.record(operation, filename, checksum)
 
 
 def split_file(
@@ -104,39 +118,77 @@ def read_file(filename: str) -> str:
 
 
 def ingest_file(
-    filename: str, memory, max_length: int = 4000, overlap: int = 200
+    filename: str,
+    memory,
+    max_length: int = 4000,
+    overlap: int = 200,
+    batch_size: int = 32,
 ) -> None:
     """
-    Ingest a file by reading its content, splitting it into chunks with a specified
-    maximum length and overlap, and adding the chunks to the memory storage.
+    Ingest a file by streaming its content, splitting it into chunks with a
+    specified maximum length and overlap at sentence or word boundaries, and
+    adding the chunks to the memory storage batch_size at a time.
 
     :param filename: The name of the file to ingest
-    :param memory: An object with an add() method to store the chunks in memory
+    :param memory: An object with an add() method to store the chunks in memory,
+        and optionally an add_batch() method taking a list of chunks
     :param max_length: The maximum length of each chunk, default is 4000
     :param overlap: The number of overlapping characters between chunks, default is 200
+    :param batch_size: The number of chunks handed to memory at a time, default is 32
     """
     try:
         print(f"Working with file {filename}")
-        content = read_file(filename)
-        content_length = len(content)
-        print(f"File length: {content_length} characters")
-
-        chunks = list(split_file(content, max_length=max_length, overlap=overlap))
-
-        num_chunks = len(chunks)
-        for i, chunk in enumerate(chunks):
-            print(f"Ingesting chunk {i + 1} / {num_chunks} into memory")
-            memory_to_add = (
-                f"Filename: {filename}\n" f"Content part#{i + 1}/{num_chunks}: {chunk}"
-            )
+        filepath = path_in_workspace(filename)
+        print(f"File size: {readable_file_size(os.path.getsize(filepath))}")
 
-            memory.add(memory_to_add)
+        num_chunks = file_ingest.ingest_path(
+            filepath, memory, filename, max_length, overlap, batch_size
+        )
 
         print(f"Done ingesting {num_chunks} chunks from {filename}.")
     except Exception as e:
         print(f"Error while ingesting file '{filename}': {str(e)}")
 
 
+def ingest_directory(
+    directory: str,
+    memory,
+    max_length: int = 4000,
+    overlap: int = 200,
+    batch_size: int = 32,
+    workers: int = 4,
+) -> None:
+    """
+    Ingest every file under a workspace directory, several files in parallel,
+    except the journal of file operations.  Progress is recorded in
+    INGEST_PROGRESS_FILE, so running it again after an interruption resumes
+    where it stopped.
+
+    :param directory: The workspace directory to ingest
+    :param memory: An object with an add() method to store the chunks in memory
+    :param workers: The number of files ingested at a time, default is 4
+    """
+    try:
+        print(f"Working with directory {directory}")
+        search_directory = path_in_workspace(directory)
+        counts = file_ingest.ingest_directory(
+            search_directory,
+            memory,
+            max_length,
+            overlap,
+            batch_size,
+            workers,
+            INGEST_PROGRESS_FILE,
+            exclude=[LOG_FILE_PATH],
+        )
+        print(
+            f"Done ingesting {sum(counts.values())} chunks from "
+            f"{len(counts)} files in {directory}."
+        )
+    except Exception as e:
+        print(f"Error while ingesting directory '{directory}': {str(e)}")
+
+
 @command("write_to_file", "Write to file", '"filename": "<filename>", "text": "<text>"')
 def write_to_file(filename: str, text: str) -> str:
     """Write text to a file
@@ -148,7 +200,8 @@ def write_to_file(filename: str, text: str) -> str:
     Returns:
         str: A message indicating success or failure
     """
-    if check_duplicate_operation("write", filename):
+    checksum = text_checksum(text)
+    if check_duplicate_operation("write", filename, checksum):
         return "Error: File has already been updated."
     try:
         filepath = path_in_workspace(filename)
@@ -157,7 +210,7 @@ def write_to_file(filename: str, text: str) -> str:
             os.makedirs(directory)
         with open(filepath, "w", encoding="utf-8") as f:
             f.write(text)
-        log_operation("write", filename)
+        log_operation("write", filename, checksum)
         return "File written to successfully."
     except Exception as e:
         return f"Error: {str(e)}"
@@ -182,6 +235,9 @@ def append_to_file(filename: str, text: str, shouldLog: bool = True) -> str:
             f.write(text)
 
         if shouldLog:
+            # No checksum: hashing the whole file on every append would make a
+            # series of appends quadratic.  The contents are then unknown to
+            # the journal, so the next write is never taken for a duplicate.
             log_operation("append", filename)
 
         return "Text appended successfully."
@@ -210,31 +266,49 @@ def delete_file(filename: str) -> str:
         return f"Error: {str(e)}"
 
 
-@command("search_files", "Search Files", '"directory": "<directory>"')
-def search_files(directory: str) -> list[str]:
+@command(
+    "search_files",
+    "Search Files",
+    '"directory": "<directory>", "pattern": "<optional glob or name fragment>"',
+)
+def search_files(
+    directory: str,
+    pattern: str | None = None,
+    min_size: int | None = None,
+    max_size: int | None = None,
+    modified_after: float | None = None,
+    modified_before: float | None = None,
+) -> list[str]:
     """Search for files in a directory
 
     Args:
         directory (str): The directory to search in
+        pattern (str | None): A glob, or a fragment of the path to look for
+        min_size (int | None): Minimum file size in bytes
+        max_size (int | None): Maximum file size in bytes
+        modified_after (float | None): Minimum modification time (Unix timestamp)
+        modified_before (float | None): Maximum modification time (Unix timestamp)
 
     Returns:
         list[str]: A list of files found in the directory
     """
-    found_files = []
-
+    filters = dict(
+        min_size=min_size,
+        max_size=max_size,
+        modified_after=modified_after,
+        modified_before=modified_before,
+    )
     if directory in {"", "/"}:
-        search_directory = WORKSPACE_PATH
-    else:
-        search_directory = path_in_workspace(directory)
+        return WORKSPACE_INDEX.search("", pattern, **filters)
 
-    for root, _, files in os.walk(search_directory):
-        for file in files:
-            if file.startswith("."):
-                continue
-            relative_path = os.path.relpath(os.path.join(root, file), WORKSPACE_PATH)
-            found_files.append(relative_path)
+    search_directory = path_in_workspace(directory)
+    relative_directory = os.path.relpath(search_directory, WORKSPACE_PATH)
+    if relative_directory.split(os.sep)[0] != os.pardir:
+        return WORKSPACE_INDEX.search(relative_directory, pattern, **filters)
 
-    return found_files
+    # Outside the workspace (restrict_to_workspace is off): not worth indexing
+    found_files = WorkspaceIndex(search_directory).search("", pattern, **filters)
+    return [os.path.join(relative_directory, file) for file in found_files]
 
 
 @command(
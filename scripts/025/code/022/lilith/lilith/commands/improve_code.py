@@ -3,7 +3,7 @@ from __future__ import annotations
 import json
 
 from lilith.commands.command import command
-from lilith.llm_utils import call_ai_function
+from lilith.llm_cache import call_ai_function
 
 
 @command(
@@ -0,0 +1,353 @@
+"""Run processes with bounded output capture and time limits"""
+from __future__ import annotations
+
+import json
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import IO, Dict, List, Optional, Sequence
+
+READ_SIZE = 1 << 16
+
+
+class BoundedOutput:
+    """
+    Keeps the first head_bytes and the last tail_bytes of a byte stream,
+    whatever its length; the middle is counted and dropped.
+    """
+
+    def __init__(self, head_bytes: int = 4000, tail_bytes: int = 4000):
+        self.head_bytes = head_bytes
+        self.tail_bytes = tail_bytes
+        self.head = bytearray()
+        self._tail: deque[bytes] = deque()
+        self._tail_size = 0
+        self.total = 0
+
+    def write(self, data: bytes) -> None:
+        self.total += len(data)
+        room = self.head_bytes - len(self.head)
+        if room > 0:
+            self.head += data[:room]
+            data = data[room:]
+        if not data or self.tail_bytes <= 0:
+            return
+        if len(data) >= self.tail_bytes:
+            self._tail.clear()
+            data = data[-self.tail_bytes :]
+            self._tail_size = 0
+        self._tail.append(data)
+        self._tail_size += len(data)
+        while self._tail_size - len(self._tail[0]) >= self.tail_bytes:
+            self._tail_size -= len(self._tail.popleft())
+
+    @property
+    def dropped(self) -> int:
+        """Number of bytes neither in the head nor in the tail"""
+        return self.total - len(self.head) - min(self._tail_size, self.tail_bytes)
+
+    def getvalue(self, encoding: str = "utf-8") -> str:
+        tail = b"".join(self._tail)[-self.tail_bytes :] if self._tail else b""
+        head = self.head.decode(encoding, errors="replace")
+        if not tail:
+            return head
+        tail = tail.decode(encoding, errors="replace")
+        if self.dropped:
+            return f"{head}\n... [{self.dropped} bytes truncated] ...\n{tail}"
+        return head + tail
+
+
+@dataclass
+class ProcessResult:
+    """Outcome of a process run with run_process"""
+
+    returncode: Optional[int]
+    stdout: str
+    stderr: str
+    elapsed: float
+    timed_out: bool = False
+    truncated: bool = False
+
+    def __str__(self) -> str:
+        output = f"STDOUT:\n{self.stdout}\nSTDERR:\n{self.stderr}"
+        if self.timed_out:
+            output += f"\nProcess killed after {self.elapsed:.0f} seconds"
+        return output
+
+
+def _limit_cpu(args: str | Sequence[str], shell: bool, seconds: int) -> List[str]:
+    """args run by a shell that first sets the CPU time limit, so that the
+    command and every process it starts inherit it (unlike a preexec_fn,
+    this is safe when processes are started from several threads)"""
+    # SIGXCPU at the soft limit, SIGKILL a second later at the hard one
+    limit = f"ulimit -St {int(seconds)} && ulimit -Ht {int(seconds) + 1} && exec"
+    if isinstance(args, (str, bytes, os.PathLike)):
+        args = [args]
+    if shell:
+        return ["/bin/sh", "-c", f'{limit} /bin/sh -c "$0" "$@"', *args]
+    return ["/bin/sh", "-c", f'{limit} "$0" "$@"', *args]
+
+
+def _pump(stream: IO[bytes], output: BoundedOutput) -> None:
+    with stream:
+        for chunk in iter(lambda: stream.read1(READ_SIZE), b""):
+            output.write(chunk)
+
+
+def _kill(process: subprocess.Popen) -> None:
+    try:
+        if os.name == "posix":
+            os.killpg(process.pid, signal.SIGKILL)  # the shell and its children
+        else:
+            process.kill()
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def run_process(
+    args: str | Sequence[str],
+    shell: bool = False,
+    cwd: Optional[str | os.PathLike] = None,
+    env: Optional[Dict[str, str]] = None,
+    timeout: Optional[float] = None,
+    cpu_time_limit: Optional[int] = None,
+    head_bytes: int = 4000,
+    tail_bytes: int = 4000,
+) -> ProcessResult:
+    """Run a process, reading its stdout and stderr as they are produced
+
+    Only the first head_bytes and last tail_bytes of each stream are kept,
+    so the output may be arbitrarily large.
+
+    Args:
+        args (str | Sequence[str]): The command, as for subprocess.Popen
+        shell (bool): Whether to run args through the shell
+        cwd (Optional[str | os.PathLike]): The working directory
+        env (Optional[Dict[str, str]]): The environment, default is inherited
+        timeout (Optional[float]): Wall-clock seconds before the process
+            (and the processes it started) is killed
+        cpu_time_limit (Optional[int]): CPU seconds before the process is
+            killed by the system (POSIX only)
+        head_bytes (int): Bytes kept from the start of each stream
+        tail_bytes (int): Bytes kept from the end of each stream
+
+    Returns:
+        ProcessResult: The exit code (None if killed on timeout) and output
+    """
+    kwargs = {}
+    if os.name == "posix":
+        kwargs["start_new_session"] = True
+        if cpu_time_limit:
+            args, shell = _limit_cpu(args, shell, cpu_time_limit), False
+    start = time.monotonic()
+    process = subprocess.Popen(
+        args,
+        shell=shell,
+        cwd=cwd,
+        env=env,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        **kwargs,
+    )
+    stdout = BoundedOutput(head_bytes, tail_bytes)
+    stderr = BoundedOutput(head_bytes, tail_bytes)
+    readers = [
+        threading.Thread(target=_pump, args=(process.stdout, stdout), daemon=True),
+        threading.Thread(target=_pump, args=(process.stderr, stderr), daemon=True),
+    ]
+    for reader in readers:
+        reader.start()
+    timed_out = False
+    try:
+        process.wait(timeout)
+    except subprocess.TimeoutExpired:
+        timed_out = True
+        _kill(process)
+        process.wait()
+    for reader in readers:
+        # a killed shell's orphaned children may still hold the pipes open
+        reader.join(None if not timed_out else 1)
+    return ProcessResult(
+        returncode=None if timed_out else process.returncode,
+        stdout=stdout.getvalue(),
+        stderr=stderr.getvalue(),
+        elapsed=time.monotonic() - start,
+        timed_out=timed_out,
+        truncated=bool(stdout.dropped or stderr.dropped),
+    )
+
+
+def run_many(
+    commands: List[str | Sequence[str]], max_parallel: int = 4, **kwargs
+) -> List[ProcessResult]:
+    """Run several commands with run_process, max_parallel at a time
+
+    Returns:
+        List[ProcessResult]: The result of each command, in order
+    """
+    with ThreadPoolExecutor(max_workers=max_parallel) as executor:
+        return list(executor.map(lambda args: run_process(args, **kwargs), commands))
+
+
+# Source of a warm interpreter: reads one JSON job per line on stdin, runs the
+# file as __main__ with sys.stdout and sys.stderr kept to their head and tail
+# (in characters), and answers one JSON line on a copy of the original stdout.
+_WORKER_SOURCE = r"""
+import io, json, os, runpy, sys, traceback
+try:
+    import resource
+except ImportError:
+    resource = None
+
+class Bounded(io.TextIOBase):
+    def __init__(self, head, tail):
+        self.head_size, self.tail_size = head, tail
+        self.head, self.tail, self.total = [], "", 0
+        self.head_len = 0
+    def writable(self):
+        return True
+    def write(self, s):
+        self.total += len(s)
+        room = self.head_size - self.head_len
+        if room > 0:
+            self.head.append(s[:room]); self.head_len += len(s[:room]); s = s[room:]
+        if s and self.tail_size > 0:
+            self.tail = (self.tail + s)[-self.tail_size:]
+        return len(s)
+    def dropped(self):
+        return self.total - self.head_len - len(self.tail)
+    def getvalue(self):
+        head = "".join(self.head)
+        dropped = self.dropped()
+        if dropped > 0:
+            return f"{head}\n... [{dropped} characters truncated] ...\n{self.tail}"
+        return head + self.tail
+
+channel = os.fdopen(os.dup(1), "w")
+os.dup2(os.open(os.devnull, os.O_WRONLY), 1)  # stray writes to fd 1 must not reach the channel
+for line in sys.stdin:
+    job = json.loads(line)
+    out, err = Bounded(job["head"], job["tail"]), Bounded(job["head"], job["tail"])
+    sys.stdout, sys.stderr = out, err
+    cwd, argv = os.getcwd(), sys.argv
+    code = 0
+    try:
+        if job["cpu"] and resource is not None:
+            used = resource.getrusage(resource.RUSAGE_SELF)
+            spent = int(used.ru_utime + used.ru_stime) + 1
+            resource.setrlimit(resource.RLIMIT_CPU, (spent + job["cpu"], resource.RLIM_INFINITY))
+        os.chdir(job["cwd"])
+        sys.argv = [job["path"]]
+        runpy.run_path(job["path"], run_name="__main__")
+    except SystemExit as e:
+        code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        if not isinstance(e.code, int) and e.code is not None:
+            print(e.code, file=err)
+    except BaseException:
+        traceback.print_exc(file=err)
+        code = 1
+    finally:
+        os.chdir(cwd)
+        sys.argv = argv
+        sys.stdout, sys.stderr = sys.__stdout__, sys.__stderr__
+    channel.write(json.dumps({"returncode": code, "stdout": out.getvalue(), "stderr": err.getvalue(),
+                              "truncated": out.dropped() > 0 or err.dropped() > 0}) + "\n")
+    channel.flush()
+"""
+
+
+class PythonWorkerPool:
+    """
+    Warm Python interpreters that run files as __main__ one after another.
+
+    Running a file in a worker saves the interpreter start-up and the
+    imports already done by earlier files.  Each file gets a fresh __main__
+    namespace, but modules it imports or patches stay loaded in the worker;
+    a worker that times out (wall-clock or CPU) is killed and replaced.
+    """
+
+    def __init__(self, size: int = 2, python: str = sys.executable):
+        self.python = python
+        self._idle: deque[subprocess.Popen] = deque()
+        self._slots = threading.Semaphore(size)
+        self._lock = threading.Lock()
+
+    def _spawn(self) -> subprocess.Popen:
+        return subprocess.Popen(
+            [self.python, "-u", "-c", _WORKER_SOURCE],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            **({"start_new_session": True} if os.name == "posix" else {}),
+        )
+
+    def run_file(
+        self,
+        path: str | os.PathLike,
+        cwd: Optional[str | os.PathLike] = None,
+        timeout: Optional[float] = None,
+        cpu_time_limit: Optional[int] = None,
+        head_bytes: int = 4000,
+        tail_bytes: int = 4000,
+    ) -> ProcessResult:
+        """Run a Python file in a warm worker, see run_process for the arguments"""
+        job = {
+            "path": os.path.abspath(path),
+            "cwd": os.path.abspath(cwd or os.getcwd()),
+            "cpu": cpu_time_limit or 0,
+            "head": head_bytes,
+            "tail": tail_bytes,
+        }
+        start = time.monotonic()
+        with self._slots:
+            with self._lock:
+                worker = self._idle.popleft() if self._idle else None
+            if worker is None or worker.poll() is not None:
+                worker = self._spawn()
+            reply: List[str] = []
+
+            def exchange():
+                worker.stdin.write(json.dumps(job) + "\n")
+                worker.stdin.flush()
+                reply.append(worker.stdout.readline())
+
+            exchanger = threading.Thread(target=exchange, daemon=True)
+            exchanger.start()
+            exchanger.join(timeout)
+            if exchanger.is_alive() or not reply or not reply[0]:
+                # timed out, or the worker died (e.g. killed at its CPU limit)
+                timed_out = exchanger.is_alive()
+                _kill(worker)
+                worker.wait()
+                return ProcessResult(
+                    returncode=None if timed_out else worker.returncode,
+                    stdout="",
+                    stderr="" if timed_out else "Worker process died",
+                    elapsed=time.monotonic() - start,
+                    timed_out=timed_out,
+                )
+            with self._lock:
+                self._idle.append(worker)
+        result = json.loads(reply[0])
+        return ProcessResult(
+            returncode=result["returncode"],
+            stdout=result["stdout"],
+            stderr=result["stderr"],
+            elapsed=time.monotonic() - start,
+            truncated=result["truncated"],
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            while self._idle:
+                worker = self._idle.popleft()
+                worker.stdin.close()
+                worker.wait()
@@ -0,0 +1,329 @@
+"""Concurrent HTTP fetching with an on-disk cache"""
+from __future__ import annotations
+
+import asyncio
+import functools
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlparse
+
+import requests
+from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+
+try:
+    import lxml  # noqa: F401
+
+    HTML_PARSER = "lxml"
+except ImportError:
+    HTML_PARSER = "html.parser"
+
+_MAX_AGE = re.compile(r"(?:^|,)\s*(?:s-)?max-age\s*=\s*\"?(\d+)", re.IGNORECASE)
+
+
+def make_soup(html: str) -> BeautifulSoup:
+    """Parse html with lxml when it is installed, else with html.parser"""
+    if HTML_PARSER != "html.parser":
+        try:
+            return BeautifulSoup(html, HTML_PARSER)
+        except Exception:
+            pass
+    return BeautifulSoup(html, "html.parser")
+
+
+@dataclass
+class FetchResult:
+    """A fetched (or cached) HTTP response"""
+
+    url: str
+    status_code: int
+    headers: Dict[str, str]
+    content: bytes
+    encoding: Optional[str] = None
+    from_cache: bool = False
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding or "utf-8", errors="replace")
+
+
+@dataclass
+class CacheEntry:
+    """Cached response metadata; the body is stored next to it"""
+
+    url: str
+    status_code: int
+    headers: Dict[str, str]
+    encoding: Optional[str]
+    expires: float
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    stored: float = field(default_factory=time.time)
+
+
+def _header(headers, name: str) -> Optional[str]:
+    for key, value in headers.items():
+        if key.lower() == name:
+            return value
+    return None
+
+
+def expiry(headers, now: float, default_ttl: float) -> Optional[float]:
+    """Time until which a response may be served from the cache without
+    revalidation, or None if it must not be stored
+
+    Args:
+        headers: The response headers
+        now (float): The time the response was received
+        default_ttl (float): Seconds of freshness when the headers give none
+
+    Returns:
+        Optional[float]: A Unix timestamp, or None for Cache-Control: no-store
+    """
+    cache_control = (_header(headers, "cache-control") or "").lower()
+    if "no-store" in cache_control:
+        return None
+    if "no-cache" in cache_control:
+        return now
+    match = _MAX_AGE.search(cache_control)
+    if match:
+        return now + int(match.group(1))
+    expires = _header(headers, "expires")
+    if expires:
+        try:
+            return parsedate_to_datetime(expires).timestamp()
+        except (TypeError, ValueError):
+            return now  # invalid Expires means already expired
+    return now + default_ttl
+
+
+class HttpCache:
+    """
+    On-disk cache of successful GET responses, keyed by URL.
+
+    Each response is two files named after the SHA-256 of its URL: the body
+    and a JSON entry with the headers, the freshness deadline (from
+    Cache-Control max-age, Expires, or default_ttl) and the validators
+    (ETag, Last-Modified) used to revalidate it once it is stale.
+    """
+
+    def __init__(self, directory: str | Path, default_ttl: float = 3600) -> None:
+        self.directory = Path(directory)
+        self.default_ttl = default_ttl
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _paths(self, url: str) -> tuple[Path, Path]:
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return self.directory / f"{key}.json", self.directory / f"{key}.body"
+
+    def get(self, url: str) -> Optional[tuple[CacheEntry, bytes]]:
+        """Return the cached entry and body of url, fresh or not"""
+        meta_path, body_path = self._paths(url)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                entry = CacheEntry(**json.load(f))
+            body = body_path.read_bytes()
+        except (OSError, ValueError, TypeError):
+            return None
+        if entry.url != url:
+            return None
+        return entry, body
+
+    def put(self, result: FetchResult, now: Optional[float] = None) -> None:
+        """Store a response, unless its headers forbid it"""
+        now = time.time() if now is None else now
+        expires = expiry(result.headers, now, self.default_ttl)
+        if expires is None or result.status_code != 200:
+            return
+        entry = CacheEntry(
+            url=result.url,
+            status_code=result.status_code,
+            headers=dict(result.headers),
+            encoding=result.encoding,
+            expires=expires,
+            etag=_header(result.headers, "etag"),
+            last_modified=_header(result.headers, "last-modified"),
+            stored=now,
+        )
+        meta_path, body_path = self._paths(result.url)
+        self._write(body_path, result.content)
+        self._write(meta_path, json.dumps(entry.__dict__).encode("utf-8"))
+
+    def refresh(self, entry: CacheEntry, headers, now: Optional[float] = None) -> None:
+        """Extend a revalidated entry (the server answered 304 Not Modified)"""
+        now = time.time() if now is None else now
+        for name, value in headers.items():
+            for old_name in [k for k in entry.headers if k.lower() == name.lower()]:
+                del entry.headers[old_name]
+            entry.headers[name] = value
+        entry.expires = expiry(entry.headers, now, self.default_ttl) or now
+        entry.etag = _header(entry.headers, "etag")
+        entry.last_modified = _header(entry.headers, "last-modified")
+        meta_path, _ = self._paths(entry.url)
+        self._write(meta_path, json.dumps(entry.__dict__).encode("utf-8"))
+
+    @staticmethod
+    def _write(path: Path, data: bytes) -> None:
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+
+
+class FetchEngine:
+    """
+    Fetches URLs concurrently with asyncio.
+
+    The blocking requests calls run in worker threads, at most
+    max_connections at a time and max_per_host per host.  Concurrent fetches
+    of the same URL share one request.  With a cache, fresh responses are
+    served from it and stale ones are revalidated with If-None-Match /
+    If-Modified-Since.
+    """
+
+    def __init__(
+        self,
+        session: Optional[requests.Session] = None,
+        cache: Optional[HttpCache] = None,
+        max_connections: int = 16,
+        max_per_host: int = 4,
+        timeout: float = 10,
+    ) -> None:
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_maxsize=max_per_host)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+        self.session = session
+        self.cache = cache
+        self.max_connections = max_connections
+        self.max_per_host = max_per_host
+        self.timeout = timeout
+        # the default executor of asyncio has too few threads for I/O bound work
+        self._executor = ThreadPoolExecutor(max_connections, "lilith-fetch")
+        # asyncio primitives belong to one event loop (and every asyncio.run
+        # makes a new one): loop -> (connection slots, per-host slots, in-flight fetches)
+        self._loop_state = weakref.WeakKeyDictionary()
+
+    def _state(self):
+        loop = asyncio.get_running_loop()
+        state = self._loop_state.get(loop)
+        if state is None:
+            state = (asyncio.Semaphore(self.max_connections), {}, {})
+            self._loop_state[loop] = state
+        return state
+
+    async def fetch(self, url: str, timeout: Optional[float] = None) -> FetchResult:
+        """Fetch url, sharing the request with concurrent fetches of the same url
+
+        Raises:
+            requests.exceptions.RequestException: If the HTTP request fails
+        """
+        _, _, inflight = self._state()
+        future = inflight.get(url)
+        if future is None:
+            future = asyncio.ensure_future(self._fetch(url, timeout or self.timeout))
+            inflight[url] = future
+            future.add_done_callback(lambda _: inflight.pop(url, None))
+        return await asyncio.shield(future)
+
+    async def fetch_many(
+        self, urls: List[str], timeout: Optional[float] = None
+    ) -> List[FetchResult | BaseException]:
+        """Fetch all urls concurrently; failures are returned as exceptions"""
+        return await asyncio.gather(
+            *(self.fetch(url, timeout) for url in urls), return_exceptions=True
+        )
+
+    async def _fetch(self, url: str, timeout: float) -> FetchResult:
+        cached = self.cache.get(url) if self.cache else None
+        headers = {}
+        if cached:
+            entry, body = cached
+            if time.time() < entry.expires:
+                return self._from_cache(entry, body)
+            if entry.etag:
+                headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                headers["If-Modified-Since"] = entry.last_modified
+
+        connections, hosts, _ = self._state()
+        host = urlparse(url).netloc
+        if host not in hosts:
+            hosts[host] = asyncio.Semaphore(self.max_per_host)
+        async with connections, hosts[host]:
+            response = await asyncio.get_running_loop().run_in_executor(
+                self._executor,
+                functools.partial(
+                    self.session.get, url, headers=headers, timeout=timeout
+                ),
+            )
+
+        if cached and response.status_code == 304:
+            entry, body = cached
+            self.cache.refresh(entry, response.headers)
+            return self._from_cache(entry, body)
+
+        result = FetchResult(
+            url=url,
+            status_code=response.status_code,
+            headers=dict(response.headers),
+            content=response.content,
+            encoding=response.encoding,
+        )
+        if self.cache:
+            self.cache.put(result)
+        return result
+
+    @staticmethod
+    def _from_cache(entry: CacheEntry, body: bytes) -> FetchResult:
+        return FetchResult(
+            url=entry.url,
+            status_code=entry.status_code,
+            headers=entry.headers,
+            content=body,
+            encoding=entry.encoding,
+            from_cache=True,
+        )
+
+    def get(self, url: str, timeout: Optional[float] = None) -> FetchResult:
+        """Blocking fetch of one url"""
+        return run_sync(self.fetch(url, timeout))
+
+    def get_many(
+        self, urls: List[str], timeout: Optional[float] = None
+    ) -> List[FetchResult | BaseException]:
+        """Blocking concurrent fetch of several urls"""
+        return run_sync(self.fetch_many(urls, timeout))
+
+
+def run_sync(coroutine) -> Any:
+    """Run a coroutine to completion from synchronous code, even when called
+    from a thread that is already running an event loop"""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+    result = {}
+
+    def target():
+        try:
+            result["value"] = asyncio.run(coroutine)
+        except BaseException as e:
+            result["error"] = e
+
+    thread = threading.Thread(target=target)
+    thread.start()
+    thread.join()
+    if "error" in result:
+        raise result["error"]
+    return result["value"]
@@ -4,11 +4,12 @@ from __future__ import annotations
 from urllib.parse import urljoin, urlparse
 
 import requests
-from bs4 import BeautifulSoup
-from requests import Response
+from requests.adapters import HTTPAdapter
 from requests.compat import urljoin
 
-from lilith.config import Config
+from lilith.commands.command import command
+from lilith.commands.web_fetch import FetchEngine, FetchResult, HttpCache, make_soup
+from lilith.config.config import Config
 from lilith.memory import get_memory
 from lilith.processing.html import extract_hyperlinks, format_hyperlinks
 
@@ -17,6 +18,14 @@ memory = get_memory(CFG)
 
 session = requests.Session()
 session.headers.update({"User-Agent": CFG.user_agent})
+session.mount("http://", HTTPAdapter(pool_maxsize=CFG.web_max_connections_per_host))
+session.mount("https://", HTTPAdapter(pool_maxsize=CFG.web_max_connections_per_host))
+engine = FetchEngine(
+    session,
+    HttpCache(CFG.web_cache_dir, CFG.web_cache_ttl),
+    max_connections=CFG.web_max_connections,
+    max_per_host=CFG.web_max_connections_per_host,
+)
 
 
 def is_valid_url(url: str) -> bool:
@@ -84,48 +93,104 @@ def check_local_file_access(url: str) -> bool:
     return any(url.startswith(prefix) for prefix in local_prefixes)
 
 
+def check_url(url: str) -> str:
+    """Check that the URL may be fetched
+
+    Args:
+        url (str): The URL to check
+
+    Returns:
+        str: The sanitized URL
+
+    Raises:
+        ValueError: If the URL is invalid or points to the local machine
+    """
+    # Restrict access to local files
+    if check_local_file_access(url):
+        raise ValueError("Access to local files is restricted")
+
+    # Most basic check if the URL is valid:
+    if not url.startswith("http://") and not url.startswith("https://"):
+        raise ValueError("Invalid URL format")
+
+    return sanitize_url(url)
+
+
+def _checked_response(
+    response: FetchResult | BaseException,
+) -> tuple[None, str] | tuple[FetchResult, None]:
+    if isinstance(response, ValueError):
+        # Handle invalid URL format
+        return None, f"Error: {str(response)}"
+    if isinstance(response, requests.exceptions.RequestException):
+        # Handle exceptions related to the HTTP request
+        #  (e.g., connection errors, timeouts, etc.)
+        return None, f"Error: {str(response)}"
+    if isinstance(response, BaseException):
+        raise response
+
+    # Check if the response contains an HTTP error
+    if response.status_code >= 400:
+        return None, f"Error: HTTP {str(response.status_code)} error"
+
+    return response, None
+
+
 def get_response(
     url: str, timeout: int = 10
-) -> tuple[None, str] | tuple[Response, None]:
-    """Get the response from a URL
+) -> tuple[None, str] | tuple[FetchResult, None]:
+    """Get the response from a URL, from the HTTP cache if it is fresh there
 
     Args:
         url (str): The URL to get the response from
         timeout (int): The timeout for the HTTP request
 
     Returns:
-        tuple[None, str] | tuple[Response, None]: The response and error message
-
-    Raises:
-        ValueError: If the URL is invalid
-        requests.exceptions.RequestException: If the HTTP request fails
+        tuple[None, str] | tuple[FetchResult, None]: The response and error message
     """
     try:
-        # Restrict access to local files
-        if check_local_file_access(url):
-            raise ValueError("Access to local files is restricted")
+        response = engine.get(check_url(url), timeout)
+    except (ValueError, requests.exceptions.RequestException) as e:
+        response = e
+    return _checked_response(response)
 
-        # Most basic check if the URL is valid:
-        if not url.startswith("http://") and not url.startswith("https://"):
-            raise ValueError("Invalid URL format")
 
-        sanitized_url = sanitize_url(url)
+def get_responses(
+    urls: list[str], timeout: int = 10
+) -> list[tuple[None, str] | tuple[FetchResult, None]]:
+    """Get the responses from several URLs, fetched concurrently
 
-        response = session.get(sanitized_url, timeout=timeout)
+    Args:
+        urls (list[str]): The URLs to get the responses from
+        timeout (int): The timeout for each HTTP request
 
-        # Check if the response contains an HTTP error
-        if response.status_code >= 400:
-            return None, f"Error: HTTP {str(response.status_code)} error"
+    Returns:
+        list[tuple[None, str] | tuple[FetchResult, None]]: The response and
+            error message of each URL
+    """
+    checked = []
+    for url in urls:
+        try:
+            checked.append(check_url(url))
+        except ValueError as e:
+            checked.append(e)
+    fetched = iter(engine.get_many([u for u in checked if isinstance(u, str)], timeout))
+    return [
+        _checked_response(u if isinstance(u, ValueError) else next(fetched))
+        for u in checked
+    ]
 
-        return response, None
-    except ValueError as ve:
-        # Handle invalid URL format
-        return None, f"Error: {str(ve)}"
 
-    except requests.exceptions.RequestException as re:
-        # Handle exceptions related to the HTTP request
-        #  (e.g., connection errors, timeouts, etc.)
-        return None, f"Error: {str(re)}"
+def _page_text(response: FetchResult) -> str:
+    soup = make_soup(response.text)
+
+    for script in soup(["script", "style"]):
+        script.extract()
+
+    text = soup.get_text()
+    lines = (line.strip() for line in text.splitlines())
+    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+    return "\n".join(chunk for chunk in chunks if chunk)
 
 
 def scrape_text(url: str) -> str:
@@ -143,17 +208,7 @@ def scrape_text(url: str) -> str:
     if not response:
         return "Error: Could not get response"
 
-    soup = BeautifulSoup(response.text, "html.parser")
-
-    for script in soup(["script", "style"]):
-        script.extract()
-
-    text = soup.get_text()
-    lines = (line.strip() for line in text.splitlines())
-    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-    text = "\n".join(chunk for chunk in chunks if chunk)
-
-    return text
+    return _page_text(response)
 
 
 def scrape_links(url: str) -> str | list[str]:
@@ -170,7 +225,7 @@ def scrape_links(url: str) -> str | list[str]:
         return error_message
     if not response:
         return "Error: Could not get response"
-    soup = BeautifulSoup(response.text, "html.parser")
+    soup = make_soup(response.text)
 
     for script in soup(["script", "style"]):
         script.extract()
@@ -180,6 +235,34 @@ def scrape_links(url: str) -> str | list[str]:
     return format_hyperlinks(hyperlinks)
 
 
+@command(
+    "scrape_many",
+    "Scrape text from several webpages at once",
+    '"urls": "<list of urls>"',
+)
+def scrape_many(urls: list[str]) -> str:
+    """Scrape text from several webpages, fetched concurrently
+
+    Args:
+        urls (list[str]): The URLs to scrape text from
+
+    Returns:
+        str: The scraped text (or error message) of each URL, under its URL
+    """
+    if isinstance(urls, str):
+        urls = [urls]
+    sections = []
+    for url, (response, error_message) in zip(urls, get_responses(urls)):
+        if error_message:
+            text = error_message
+        elif not response:
+            text = "Error: Could not get response"
+        else:
+            text = _page_text(response)
+        sections.append(f"URL: {url}\n{text}")
+    return "\n\n".join(sections)
+
+
 def create_message(chunk, question):
     """Create a message for the user to summarize a chunk of text"""
     return {
@@ -0,0 +1,238 @@
+"""Incremental index of the files in the workspace"""
+from __future__ import annotations
+
+import fnmatch
+import json
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+INDEX_VERSION = 1
+# A directory modified this close to its scan may change again within the same
+# mtime tick without its mtime changing, so it is rescanned on the next refresh
+RACY_WINDOW_NS = 2_000_000_000
+
+
+def _join(reldir: str, name: str) -> str:
+    return os.path.join(reldir, name) if reldir else name
+
+
+class WorkspaceIndex:
+    """
+    Table of the files under a root directory, with their size and mtime.
+
+    The first refresh scans the whole tree with os.scandir.  Later refreshes
+    stat every known directory and rescan only those whose mtime changed
+    (an entry was added, removed or renamed in them); unchanged directories
+    cost one stat and their files are not listed again.  A file modified in
+    place does not change its directory's mtime, so queries filtering on size
+    or mtime stat the files that pass the other filters.
+
+    With an index_file, the table is loaded from it on first use and saved
+    back after each refresh that changed it, so a new process starts from
+    the saved table and only rescans what changed since.
+    """
+
+    def __init__(self, root: str | Path, index_file: Optional[str | Path] = None):
+        self.root = Path(root)
+        self.index_file = Path(index_file) if index_file else None
+        self._dirs: Dict[str, Optional[int]] = {}  # reldir -> mtime_ns at scan
+        self._subdirs: Dict[str, List[str]] = {}  # reldir -> names of subdirectories
+        self._files: Dict[str, Dict[str, Tuple[int, float]]] = {}  # reldir -> name -> (size, mtime)
+        self._paths: Dict[str, List[str]] = {}  # reldir -> paths of its visible files
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(files) for files in self._files.values())
+
+    def _load(self) -> None:
+        self._loaded = True
+        if self.index_file is None or not self.index_file.exists():
+            return
+        try:
+            with open(self.index_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return  # unreadable index: rebuilt by the refresh
+        if data.get("version") != INDEX_VERSION or data.get("root") != str(self.root):
+            return
+        self._dirs = data["dirs"]
+        self._subdirs = data["subdirs"]
+        self._files = {
+            reldir: {name: tuple(meta) for name, meta in files.items()}
+            for reldir, files in data["files"].items()
+        }
+        for reldir, files in self._files.items():
+            self._paths[reldir] = _visible_paths(reldir, files)
+
+    def save(self) -> None:
+        """Write the table to index_file"""
+        if self.index_file is None:
+            return
+        data = {
+            "version": INDEX_VERSION,
+            "root": str(self.root),
+            "dirs": self._dirs,
+            "subdirs": self._subdirs,
+            "files": self._files,
+        }
+        self.index_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.index_file.with_name(self.index_file.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps(data))  # dumps, unlike dump, uses the C encoder
+        os.replace(tmp_path, self.index_file)
+
+    def _forget(self, reldir: str) -> None:
+        for name in self._subdirs.pop(reldir, ()):
+            self._forget(_join(reldir, name))
+        self._dirs.pop(reldir, None)
+        self._files.pop(reldir, None)
+        self._paths.pop(reldir, None)
+
+    def _scan(self, reldir: str, mtime_ns: int) -> bool:
+        """Rescan a directory; returns whether its entries changed"""
+        files = {}
+        subdirs = []
+        with os.scandir(self.root / reldir) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir():
+                        # like os.walk: symlinks to directories are not descended
+                        if not entry.is_symlink():
+                            subdirs.append(entry.name)
+                    else:
+                        stat = entry.stat()
+                        files[entry.name] = (stat.st_size, stat.st_mtime)
+                except OSError:
+                    continue  # removed while scanning
+        for name in set(self._subdirs.get(reldir, ())) - set(subdirs):
+            self._forget(_join(reldir, name))
+        changed = (
+            self._files.get(reldir) != files
+            or set(self._subdirs.get(reldir, ())) != set(subdirs)
+        )
+        if changed:
+            self._files[reldir] = files
+            self._paths[reldir] = _visible_paths(reldir, files)
+            self._subdirs[reldir] = subdirs
+        racy = time.time_ns() - mtime_ns < RACY_WINDOW_NS
+        stamp = None if racy else mtime_ns
+        # a directory leaving the racy window must be saved with its mtime
+        changed = changed or self._dirs.get(reldir, -1) != stamp
+        self._dirs[reldir] = stamp
+        return changed
+
+    def _refresh(self) -> bool:
+        if not self._loaded:
+            self._load()
+        changed = False
+        stack = [""]
+        while stack:
+            reldir = stack.pop()
+            try:
+                mtime_ns = os.stat(self.root / reldir).st_mtime_ns
+            except OSError:
+                if reldir in self._dirs:
+                    self._forget(reldir)
+                    changed = True
+                continue
+            if self._dirs.get(reldir, -1) != mtime_ns:
+                changed = self._scan(reldir, mtime_ns) or changed
+            stack.extend(_join(reldir, name) for name in self._subdirs[reldir])
+        return changed
+
+    def refresh(self) -> None:
+        """Bring the table up to date with the directory tree"""
+        with self._lock:
+            if self._refresh():
+                self.save()
+
+    def search(
+        self,
+        directory: str = "",
+        pattern: Optional[str] = None,
+        min_size: Optional[int] = None,
+        max_size: Optional[int] = None,
+        modified_after: Optional[float] = None,
+        modified_before: Optional[float] = None,
+    ) -> List[str]:
+        """Find files in the index; files whose name starts with "." are skipped
+
+        Args:
+            directory (str): Only files under this directory (relative to root)
+            pattern (Optional[str]): A glob matched against the end of the path
+                (whole path components) if it has wildcards, else a
+                case-insensitive substring of the path
+            min_size (Optional[int]): Minimum size in bytes
+            max_size (Optional[int]): Maximum size in bytes
+            modified_after (Optional[float]): Minimum mtime as a Unix timestamp
+            modified_before (Optional[float]): Maximum mtime as a Unix timestamp
+
+        Returns:
+            List[str]: The sorted paths, relative to root, of the matching files
+        """
+        directory = os.path.normpath(directory) if directory not in {"", "/"} else ""
+        if directory == os.curdir:
+            directory = ""
+        prefix = directory + os.sep
+        match = _matcher(pattern)
+        filter_meta = any(
+            f is not None for f in (min_size, max_size, modified_after, modified_before)
+        )
+
+        with self._lock:
+            if self._refresh():
+                self.save()
+            found = []
+            for reldir, paths in self._paths.items():
+                if directory and reldir != directory and not reldir.startswith(prefix):
+                    continue
+                if match is None:
+                    found.extend(paths)
+                else:
+                    found.extend(filter(match, paths))
+            if filter_meta:
+                found = [
+                    path
+                    for path in found
+                    if self._meta_in_range(
+                        path, min_size, max_size, modified_after, modified_before
+                    )
+                ]
+        found.sort()
+        return found
+
+    def _meta_in_range(self, path, min_size, max_size, after, before) -> bool:
+        try:
+            stat = os.stat(self.root / path)
+        except OSError:
+            return False
+        reldir, name = os.path.split(path)
+        self._files[reldir][name] = (stat.st_size, stat.st_mtime)
+        return _in_range(stat.st_size, min_size, max_size) and _in_range(
+            stat.st_mtime, after, before
+        )
+
+
+def _visible_paths(reldir: str, files: Dict[str, Tuple[int, float]]) -> List[str]:
+    return [_join(reldir, name) for name in files if not name.startswith(".")]
+
+
+def _matcher(pattern: Optional[str]):
+    """The function telling if a path matches pattern (None for no pattern)"""
+    if not pattern:
+        return None
+    if any(c in pattern for c in "*?["):
+        # the glob may match the whole path or its last components
+        suffix = r"(?s:.*" + re.escape(os.sep) + ")?"
+        return re.compile(suffix + fnmatch.translate(pattern)).match
+    return re.compile(re.escape(pattern), re.IGNORECASE).search
+
+
+def _in_range(value, low, high) -> bool:
+    return (low is None or value >= low) and (high is None or value <= high)
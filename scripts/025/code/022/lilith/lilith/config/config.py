@@ -114,6 +114,70 @@ class Config(metaclass=Singleton):
             " (KHTML, like Gecko) Chrome/83.0.4103.97 Safari/537.36",
         )
 
+        # Concurrent fetching and on-disk HTTP cache of the web_requests commands
+        self.web_cache_dir = os.getenv(
+            "WEB_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "lilith")
+        )
+        self.web_cache_ttl = float(os.getenv("WEB_CACHE_TTL", 3600))
+        self.web_max_connections = int(os.getenv("WEB_MAX_CONNECTIONS", 16))
+        self.web_max_connections_per_host = int(
+            os.getenv("WEB_MAX_CONNECTIONS_PER_HOST", 4)
+        )
+
+        # Where the index of the workspace files used by search_files is kept
+        self.workspace_index_dir = os.getenv(
+            "WORKSPACE_INDEX_DIR",
+            os.path.join(os.path.expanduser("~"), ".cache", "lilith"),
+        )
+
+        # Where the progress of ingest_directory is kept
+        self.ingest_progress_dir = os.getenv(
+            "INGEST_PROGRESS_DIR",
+            os.path.join(os.path.expanduser("~"), ".cache", "lilith"),
+        )
+
+        # Agent message history: older messages are spilled to this directory
+        # (kept in memory if empty) and optionally summarized by the fast model
+        self.history_spill_dir = os.getenv(
+            "HISTORY_SPILL_DIR",
+            os.path.join(os.path.expanduser("~"), ".cache", "lilith", "history"),
+        )
+        self.summarize_history = os.getenv("SUMMARIZE_HISTORY", "False") == "True"
+
+        # Sub-agents of the AgentManager: completion rate limit, token budget per
+        # agent (0 for none) and where idle agents are saved when evicted
+        self.agent_requests_per_minute = int(os.getenv("AGENT_REQUESTS_PER_MINUTE", 60))
+        self.agent_max_concurrent = int(os.getenv("AGENT_MAX_CONCURRENT", 8))
+        self.agent_token_budget = int(os.getenv("AGENT_TOKEN_BUDGET", 0))
+        self.agent_request_timeout = float(os.getenv("AGENT_REQUEST_TIMEOUT", 0))
+        self.agent_state_dir = os.getenv("AGENT_STATE_DIR", "")
+
+        # Code execution: wall-clock and CPU seconds (0 for no limit), bytes of
+        # output kept from the start and the end of each stream, and the number
+        # of warm Python interpreters for execute_python_file (0 to disable)
+        self.execute_timeout = float(os.getenv("EXECUTE_TIMEOUT", 600))
+        self.execute_cpu_time_limit = int(os.getenv("EXECUTE_CPU_TIME_LIMIT", 0))
+        self.execute_output_head_bytes = int(
+            os.getenv("EXECUTE_OUTPUT_HEAD_BYTES", 4000)
+        )
+        self.execute_output_tail_bytes = int(
+            os.getenv("EXECUTE_OUTPUT_TAIL_BYTES", 4000)
+        )
+        self.python_worker_pool_size = int(os.getenv("PYTHON_WORKER_POOL_SIZE", 0))
+
+        # Completion cache (disabled if the path is empty): entries expire after
+        # LLM_CACHE_TTL seconds (0 for never) and, in deterministic mode, only
+        # the completions at temperature 0 are cached
+        self.llm_cache_path = os.getenv(
+            "LLM_CACHE_PATH",
+            os.path.join(os.path.expanduser("~"), ".cache", "lilith", "completions.db"),
+        )
+        self.llm_cache_ttl = float(os.getenv("LLM_CACHE_TTL", 0))
+        self.llm_cache_max_entries = int(os.getenv("LLM_CACHE_MAX_ENTRIES", 10000))
+        self.llm_cache_deterministic = (
+            os.getenv("LLM_CACHE_DETERMINISTIC", "True") == "True"
+        )
+
         self.redis_host = os.getenv("REDIS_HOST", "localhost")
         self.redis_port = os.getenv("REDIS_PORT", "6379")
         self.redis_password = os.getenv("REDIS_PASSWORD", "")
@@ -0,0 +1,241 @@
+"""Persistent cache of model completions"""
+from __future__ import annotations
+
+import hashlib
+import inspect
+import json
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from lilith import llm_utils
+from lilith.config.config import Config
+
+CFG = Config()
+
+
+@dataclass
+class CacheStats:
+    """Counters of a CompletionCache since it was opened"""
+
+    hits: int = 0
+    misses: int = 0
+    bypassed: int = 0  # calls not cacheable (temperature above 0)
+    shared: int = 0  # calls that waited for an identical call in flight
+    evictions: int = 0
+    expired: int = 0
+    seconds_saved: float = 0.0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.shared + self.misses
+        return (self.hits + self.shared) / lookups if lookups else 0.0
+
+
+class CompletionCache:
+    """
+    Completions stored in SQLite, keyed by the SHA-256 of the called function
+    and its arguments (model, parameters and messages).
+
+    With deterministic set, only the calls at temperature 0 are cached: the
+    others are expected to give a different answer each time.  Entries older
+    than ttl seconds are ignored, and beyond max_entries the least recently
+    used ones are removed.  Identical calls made at the same time, from
+    several threads, share one call to the model.
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        ttl: Optional[float] = None,
+        max_entries: int = 10000,
+        deterministic: bool = True,
+    ):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.deterministic = deterministic
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, Future] = {}
+        if str(path) != ":memory:":
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS completions ("
+            " key TEXT PRIMARY KEY, response TEXT NOT NULL, created REAL NOT NULL,"
+            " last_used REAL NOT NULL, elapsed REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS completions_last_used"
+            " ON completions (last_used)"
+        )
+        self._db.commit()
+
+    @staticmethod
+    def key(function: str, arguments: Dict[str, Any]) -> str:
+        """Content address of a call: the same function, model, parameters
+        and messages always give the same key"""
+        payload = json.dumps(
+            {"function": function, "arguments": arguments},
+            sort_keys=True,
+            ensure_ascii=False,
+            default=repr,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """The cached response for key, or None if missing or expired"""
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT response, created, elapsed FROM completions WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                return None
+            response, created, elapsed = row
+            if self.ttl is not None and now - created > self.ttl:
+                self._db.execute("DELETE FROM completions WHERE key = ?", (key,))
+                self._db.commit()
+                self.stats.expired += 1
+                return None
+            self._db.execute(
+                "UPDATE completions SET last_used = ? WHERE key = ?", (now, key)
+            )
+            self._db.commit()
+            self.stats.seconds_saved += elapsed
+        return response
+
+    def put(self, key: str, response: str, elapsed: float = 0.0) -> None:
+        """Store a response, evicting the least recently used entries if the
+        cache is full"""
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO completions VALUES (?, ?, ?, ?, ?)",
+                (key, response, now, now, elapsed),
+            )
+            (count,) = self._db.execute("SELECT COUNT(*) FROM completions").fetchone()
+            if count > self.max_entries:
+                excess = count - self.max_entries
+                self._db.execute(
+                    "DELETE FROM completions WHERE key IN (SELECT key FROM"
+                    " completions ORDER BY last_used LIMIT ?)",
+                    (excess,),
+                )
+                self.stats.evictions += excess
+            self._db.commit()
+
+    def call(self, function: Callable[..., str], *args, **kwargs) -> str:
+        """Call function(*args, **kwargs), or answer from the cache
+
+        The key is made of the function's name and its arguments bound to
+        its signature, defaults included, so that a call with an explicit
+        default and one without share their entry.
+        """
+        arguments = _bind(function, args, kwargs)
+        temperature = arguments.get("temperature")
+        if self.deterministic and temperature:
+            with self._lock:
+                self.stats.bypassed += 1
+            return function(*args, **kwargs)
+
+        key = self.key(f"{function.__module__}.{function.__qualname__}", arguments)
+        response = self.get(key)
+        if response is not None:
+            with self._lock:
+                self.stats.hits += 1
+            return response
+
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+                self.stats.misses += 1
+            else:
+                self.stats.shared += 1
+        if not owner:
+            return future.result()
+
+        try:
+            start = time.monotonic()
+            response = function(*args, **kwargs)
+            self.put(key, response, time.monotonic() - start)
+            future.set_result(response)
+            return response
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM completions")
+            self._db.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM completions").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+def _bind(function: Callable, args: tuple, kwargs: dict) -> Dict[str, Any]:
+    try:
+        bound = inspect.signature(function).bind(*args, **kwargs)
+    except (TypeError, ValueError):  # no signature, or called wrongly
+        return {"args": list(args), "kwargs": kwargs}
+    bound.apply_defaults()
+    return dict(bound.arguments)
+
+
+_cache: Optional[CompletionCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> Optional[CompletionCache]:
+    """The completion cache configured by LLM_CACHE_PATH, None if disabled"""
+    global _cache
+    if not CFG.llm_cache_path:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = CompletionCache(
+                CFG.llm_cache_path,
+                ttl=CFG.llm_cache_ttl or None,
+                max_entries=CFG.llm_cache_max_entries,
+                deterministic=CFG.llm_cache_deterministic,
+            )
+        return _cache
+
+
+def create_chat_completion(*args, **kwargs) -> str:
+    """llm_utils.create_chat_completion, answered from the cache when possible"""
+    cache = get_cache()
+    if cache is None:
+        return llm_utils.create_chat_completion(*args, **kwargs)
+    return cache.call(llm_utils.create_chat_completion, *args, **kwargs)
+
+
+def call_ai_function(
+    function: str, args: list, description: str, model: Optional[str] = None
+) -> str:
+    """llm_utils.call_ai_function, answered from the cache when possible"""
+    # resolve the default model here, so that it is part of the key
+    model = model or CFG.smart_llm_model
+    cache = get_cache()
+    if cache is None:
+        return llm_utils.call_ai_function(function, args, description, model)
+    return cache.call(llm_utils.call_ai_function, function, args, description, model)
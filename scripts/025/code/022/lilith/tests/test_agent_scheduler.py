@@ -0,0 +1,162 @@
+import asyncio
+import time
+
+import pytest
+
+from lilith.agent.agent_manager import AgentManager
+from lilith.agent.scheduler import AgentScheduler, AgentState, TokenBudgetExceeded
+
+
+def count_words(messages, model):
+    return sum(len(m["content"].split()) for m in messages)
+
+
+class MockModel:
+    """Stands in for the model server: complete() answers "ok" after delay
+    seconds, or waits for release when the message says so"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.active = 0
+        self.peak = 0
+        self.release = None
+
+    async def complete(self, model, messages):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            if messages[-1]["content"] == "wait":
+                self.release = asyncio.Event()
+                await self.release.wait()
+            else:
+                await asyncio.sleep(self.delay)
+            return "ok"
+        finally:
+            self.active -= 1
+
+
+@pytest.fixture
+def make_scheduler():
+    schedulers = []
+
+    def make(model, **kwargs):
+        kwargs.setdefault("token_counter", count_words)
+        scheduler = AgentScheduler(model.complete, **kwargs)
+        schedulers.append(scheduler)
+        return scheduler
+
+    yield make
+    for scheduler in schedulers:
+        scheduler.close()
+
+
+@pytest.fixture
+def make_manager():
+    # AgentManager is a singleton: each test gets its own
+    instances = type(AgentManager)._instances
+    instances.pop(AgentManager, None)
+    yield AgentManager
+    instances.pop(AgentManager, None)
+
+
+def test_concurrency_is_bounded(make_scheduler, make_manager):
+    model = MockModel(delay=0.05)
+    manager = make_manager(make_scheduler(model, max_concurrent=3))
+
+    start = time.monotonic()
+    created = manager.create_agents([("task", "hello", "model")] * 9)
+    elapsed = time.monotonic() - start
+
+    assert [reply for _, reply in created] == ["ok"] * 9
+    assert len({key for key, _ in created}) == 9
+    assert model.peak == 3
+    assert elapsed < 9 * 0.05  # about 3 rounds of 3 requests
+
+
+def test_token_budget_rolls_back_history(make_scheduler, make_manager):
+    scheduler = make_scheduler(MockModel(), token_budget=6)
+    manager = make_manager(scheduler)
+    key, _ = manager.create_agent("task", "hello there", "model")  # 2 + 1 tokens
+    history = list(scheduler.get(key).messages)
+
+    reply = manager.message_agent(key, "one two three")  # 6 more tokens
+    assert reply.startswith("Error: ")
+    assert scheduler.get(key).messages == history
+    with pytest.raises(TokenBudgetExceeded):
+        scheduler.run(scheduler.complete(scheduler.get(key), history + history))
+
+
+def test_timeout_rolls_back_history(make_scheduler, make_manager):
+    scheduler = make_scheduler(MockModel(delay=0.5), request_timeout=0.05)
+    manager = make_manager(scheduler)
+    state = AgentState(key=0, task="task", model="model", messages=[])
+    scheduler.add(state)
+
+    assert manager.message_agent(0, "hello") == "Error: Agent 0 timed out"
+    assert scheduler.get(0).messages == []
+
+
+def test_cancel_rolls_back_history(make_scheduler, make_manager):
+    model = MockModel()
+    scheduler = make_scheduler(model)
+    manager = make_manager(scheduler)
+    key, _ = manager.create_agent("task", "hello", "model")
+    history = list(scheduler.get(key).messages)
+
+    future = scheduler.submit(manager.amessage_agent(key, "wait"))
+    deadline = time.monotonic() + 5
+    while model.release is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert scheduler.cancel(key)
+
+    assert future.result(5) == f"Error: Agent {key} was cancelled"
+    assert scheduler.get(key).messages == history
+    assert not scheduler.cancel(key)
+
+
+def test_evict_and_reload(make_scheduler, make_manager, tmp_path):
+    scheduler = make_scheduler(MockModel(), state_dir=tmp_path)
+    manager = make_manager(scheduler)
+    key, _ = manager.create_agent("task", "hello", "model")
+    state = scheduler.get(key)
+    history, tokens = list(state.messages), state.tokens_used
+
+    assert scheduler.evict_idle(0) == [key]
+    assert key not in scheduler.agents
+    assert (tmp_path / f"agent-{key}.json").exists()
+    assert manager.list_agents() == [(key, "task")]
+
+    # a new scheduler on the same directory finds the agent too
+    assert make_scheduler(MockModel(), state_dir=tmp_path).keys() == [key]
+
+    reloaded = scheduler.get(key)
+    assert reloaded.messages == history
+    assert reloaded.tokens_used == tokens
+    assert manager.message_agent(key, "again") == "ok"
+    assert scheduler.get(key).messages[len(history):] == [
+        {"role": "user", "content": "again"},
+        {"role": "assistant", "content": "ok"},
+        {"role": "assistant", "content": "ok"},
+    ]
+
+
+def test_evict_skips_busy_agents(make_scheduler, make_manager, tmp_path):
+    model = MockModel()
+    scheduler = make_scheduler(model, state_dir=tmp_path)
+    manager = make_manager(scheduler)
+    key, _ = manager.create_agent("task", "hello", "model")
+
+    future = scheduler.submit(manager.amessage_agent(key, "wait"))
+    deadline = time.monotonic() + 5
+    while model.release is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert scheduler.evict_idle(0) == []
+    assert scheduler.cancel_stale(0) == []
+
+    scheduler.submit(_set(model.release)).result(5)
+    assert future.result(5) == "ok"
+    assert scheduler.evict_idle(0) == [key]
+
+
+async def _set(event):
+    event.set()
@@ -0,0 +1,117 @@
+import threading
+
+from lilith.llm_cache import CompletionCache
+
+
+class StubCompletion:
+    """Stands in for create_chat_completion: answers with a count of its calls"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def create_chat_completion(
+        self, messages, model=None, temperature=0, max_tokens=None
+    ):
+        self.calls += 1
+        return f"reply {self.calls}"
+
+
+def test_hit_and_miss_by_content(tmp_path):
+    stub = StubCompletion()
+    complete = stub.create_chat_completion
+    cache = CompletionCache(tmp_path / "cache.db")
+    hello = [{"role": "user", "content": "hello"}]
+
+    assert cache.call(complete, hello, "model") == "reply 1"
+    # the same content, passed differently, is a hit
+    assert cache.call(complete, [dict(hello[0])], model="model") == "reply 1"
+    assert cache.call(complete, hello, "model", 0, None) == "reply 1"
+    assert stub.calls == 1
+    assert (cache.stats.hits, cache.stats.misses) == (2, 1)
+
+    # any other message, model or parameter is a miss
+    bye = [{"role": "user", "content": "bye"}]
+    assert cache.call(complete, bye, "model") == "reply 2"
+    assert cache.call(complete, hello, "other") == "reply 3"
+    assert cache.call(complete, hello, "model", max_tokens=10) == "reply 4"
+    assert stub.calls == 4
+    assert (cache.stats.hits, cache.stats.misses) == (2, 4)
+    assert len(cache) == 4
+
+
+def test_non_deterministic_calls_are_not_cached(tmp_path):
+    stub = StubCompletion()
+    complete = stub.create_chat_completion
+    cache = CompletionCache(tmp_path / "cache.db")
+    hello = [{"role": "user", "content": "hello"}]
+
+    assert cache.call(complete, hello, "model", temperature=0.7) == "reply 1"
+    assert cache.call(complete, hello, "model", temperature=0.7) == "reply 2"
+    assert cache.stats.bypassed == 2
+    assert (cache.stats.hits, cache.stats.misses) == (0, 0)
+    assert len(cache) == 0
+
+    # unless the cache is told to keep them anyway
+    cache = CompletionCache(tmp_path / "all.db", deterministic=False)
+    cache.call(complete, hello, "model", temperature=0.7)
+    assert cache.call(complete, hello, "model", temperature=0.7) == "reply 3"
+    assert cache.stats.bypassed == 0
+
+
+def test_cache_persists_across_instances(tmp_path):
+    stub = StubCompletion()
+    complete = stub.create_chat_completion
+    hello = [{"role": "user", "content": "hello"}]
+    cache = CompletionCache(tmp_path / "cache.db")
+    cache.call(complete, hello, "model")
+    cache.close()
+
+    reopened = CompletionCache(tmp_path / "cache.db")
+    assert reopened.call(complete, hello, "model") == "reply 1"
+    assert stub.calls == 1
+    assert reopened.stats.hits == 1
+    reopened.close()
+
+
+def test_ttl_and_eviction(tmp_path):
+    stub = StubCompletion()
+    complete = stub.create_chat_completion
+    cache = CompletionCache(tmp_path / "cache.db", max_entries=2)
+    for content in ["a", "b", "c"]:
+        cache.call(complete, [{"role": "user", "content": content}])
+    assert len(cache) == 2
+    assert cache.stats.evictions == 1
+
+    expired = CompletionCache(tmp_path / "cache.db", ttl=-1)
+    expired.call(complete, [{"role": "user", "content": "c"}])
+    assert expired.stats.expired == 1
+    assert stub.calls == 4
+
+
+def test_identical_concurrent_calls_share_one_call(tmp_path):
+    release = threading.Event()
+    calls = []
+
+    def slow_completion(messages, model=None):
+        calls.append(messages)
+        release.wait(5)
+        return "reply"
+
+    cache = CompletionCache(tmp_path / "cache.db")
+    hello = [{"role": "user", "content": "hello"}]
+    results = []
+    def call():
+        results.append(cache.call(slow_completion, hello))
+
+    threads = [threading.Thread(target=call) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    while cache.stats.misses + cache.stats.shared < 4:
+        threading.Event().wait(0.01)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert results == ["reply"] * 4
+    assert len(calls) == 1
+    assert (cache.stats.misses, cache.stats.shared) == (1, 3)
@@ -0,0 +1,88 @@
+import json
+from types import SimpleNamespace
+
+from lilith.agent import message_history
+from lilith.agent.message_history import MessageHistory, new_history
+
+
+def count_words(messages, model):
+    return sum(len(m["content"].split()) for m in messages)
+
+
+def message(i):
+    return {"role": "user", "content": f"message {i}"}  # 2 tokens
+
+
+def test_window_spill_and_summary(tmp_path):
+    summaries = []
+
+    def summarizer(summary, messages):
+        summaries.append([m["content"] for m in messages])
+        return f"{summary or ''}+{len(messages)}"
+
+    history = MessageHistory(
+        "model",
+        window_tokens=6,
+        spill_path=tmp_path / "history.jsonl",
+        summarizer=summarizer,
+        segment_tokens=4,
+        token_counter=count_words,
+    )
+    history.extend([message(i) for i in range(7)])
+
+    assert len(history) == 7
+    assert history.spilled == 4
+    assert list(history) == [message(i) for i in range(7)]
+    assert history[1] == message(1) and history[-1] == message(6)
+    with open(tmp_path / "history.jsonl", encoding="utf-8") as f:
+        assert [json.loads(line) for line in f] == [message(i) for i in range(4)]
+    assert summaries == [["message 0", "message 1"], ["message 2", "message 3"]]
+
+    context = history.context(token_limit=100)
+    assert context[0]["role"] == "system" and "+2+2" in context[0]["content"]
+    assert context[1:] == [message(i) for i in range(4, 7)]
+    context.append(message(7))
+    assert history[-1] == message(7)
+    history.close()
+
+
+def test_new_history_from_config(tmp_path, monkeypatch):
+    prompts = []
+
+    def completion(model, messages):
+        prompts.append((model, messages[0]["content"]))
+        return "summary"
+
+    monkeypatch.setattr(message_history, "create_chat_completion", completion)
+    cfg = SimpleNamespace(
+        fast_llm_model="fast",
+        fast_token_limit=4,
+        history_spill_dir=str(tmp_path / "spill"),
+        summarize_history=True,
+    )
+    history = new_history(
+        cfg,
+        "agent",
+        [message(i) for i in range(3)],
+        segment_tokens=2,
+        token_counter=count_words,
+    )
+    history.extend([message(i) for i in range(3, 6)])
+
+    spilled = list((tmp_path / "spill").iterdir())
+    assert len(spilled) == 1 and spilled[0].name.startswith("agent-")
+    assert history.spilled > 0
+    assert prompts and prompts[0][0] == "fast"
+    assert history.summary == "summary"
+    history.close()
+
+
+def test_new_history_in_memory():
+    cfg = SimpleNamespace(
+        fast_llm_model="fast",
+        fast_token_limit=4000,
+        history_spill_dir="",
+        summarize_history=False,
+    )
+    history = new_history(cfg, "agent", token_counter=count_words)
+    assert history.summarizer is None and history._spill is None
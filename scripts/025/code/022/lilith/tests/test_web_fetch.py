@@ -0,0 +1,135 @@
+import asyncio
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from lilith.commands.web_fetch import FetchEngine, HttpCache
+
+
+class Handler(BaseHTTPRequestHandler):
+    """Serves /fresh with max-age, /etag with no-cache and an ETag, and
+    /slow/* after a delay; counts requests and concurrent connections"""
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests[self.path] += 1
+            server.active += 1
+            server.peak = max(server.peak, server.active)
+        try:
+            if self.path == "/fresh":
+                self._send(200, b"fresh", {"Cache-Control": "max-age=60"})
+            elif self.path == "/etag":
+                if self.headers.get("If-None-Match") == '"v1"':
+                    server.revalidated += 1
+                    self._send(304, b"", {"ETag": '"v1"'})
+                else:
+                    headers = {"Cache-Control": "no-cache", "ETag": '"v1"'}
+                    self._send(200, b"etag", headers)
+            elif self.path.startswith("/slow/"):
+                time.sleep(0.1)
+                self._send(200, self.path.encode(), {"Cache-Control": "no-store"})
+            else:
+                self._send(404, b"", {})
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def _send(self, status, body, headers):
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        if status != 304:
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    httpd.lock = threading.Lock()
+    httpd.requests = Counter()
+    httpd.revalidated = 0
+    httpd.active = 0
+    httpd.peak = 0
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    httpd.url = f"http://127.0.0.1:{httpd.server_address[1]}"
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_cache_hit(server, tmp_path):
+    engine = FetchEngine(cache=HttpCache(tmp_path))
+    first = engine.get(f"{server.url}/fresh")
+    second = engine.get(f"{server.url}/fresh")
+
+    assert (first.content, first.from_cache) == (b"fresh", False)
+    assert (second.content, second.from_cache) == (b"fresh", True)
+    assert server.requests["/fresh"] == 1
+
+    # the cache is on disk: a new engine finds the response there
+    third = FetchEngine(cache=HttpCache(tmp_path)).get(f"{server.url}/fresh")
+    assert third.from_cache
+    assert server.requests["/fresh"] == 1
+
+
+def test_revalidation(server, tmp_path):
+    engine = FetchEngine(cache=HttpCache(tmp_path))
+    first = engine.get(f"{server.url}/etag")
+    second = engine.get(f"{server.url}/etag")
+
+    assert (first.content, first.from_cache) == (b"etag", False)
+    assert (second.content, second.from_cache) == (b"etag", True)
+    assert second.status_code == 200
+    assert server.requests["/etag"] == 2
+    assert server.revalidated == 1
+
+
+def test_no_store_is_not_cached(server, tmp_path):
+    engine = FetchEngine(cache=HttpCache(tmp_path))
+    engine.get(f"{server.url}/slow/0")
+    assert not engine.get(f"{server.url}/slow/0").from_cache
+    assert server.requests["/slow/0"] == 2
+
+
+def test_concurrent_fetch(server, tmp_path):
+    engine = FetchEngine(cache=HttpCache(tmp_path), max_connections=8, max_per_host=3)
+    urls = [f"{server.url}/slow/{i}" for i in range(6)]
+
+    start = time.monotonic()
+    results = engine.get_many(urls)
+    elapsed = time.monotonic() - start
+
+    assert [r.content for r in results] == [f"/slow/{i}".encode() for i in range(6)]
+    assert server.peak == 3  # bounded by max_per_host
+    assert elapsed < 6 * 0.1  # about 2 rounds of 3 requests
+
+
+def test_concurrent_fetches_of_one_url_share_a_request(server, tmp_path):
+    engine = FetchEngine(cache=HttpCache(tmp_path))
+    url = f"{server.url}/slow/shared"
+
+    async def fetch_all():
+        return await asyncio.gather(*(engine.fetch(url) for _ in range(5)))
+
+    results = asyncio.run(fetch_all())
+    assert {r.content for r in results} == {b"/slow/shared"}
+    assert server.requests["/slow/shared"] == 1
+
+
+def test_errors_are_not_cached(server, tmp_path):
+    engine = FetchEngine(cache=HttpCache(tmp_path))
+    missing, fresh = engine.get_many([f"{server.url}/missing", f"{server.url}/fresh"])
+
+    assert missing.status_code == 404
+    assert fresh.content == b"fresh"
+    assert HttpCache(tmp_path).get(f"{server.url}/missing") is None
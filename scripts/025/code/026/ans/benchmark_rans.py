@@ -0,0 +1,80 @@
+''' Compares the rANS coder with the Huffman codec of ../huffman_tree and zlib.
+
+    python benchmark_rans.py                 # built-in corpora
+    python benchmark_rans.py some/file.log   # any files
+
+Sizes are compressed/original; speeds are MB/s of original data.
+'''
+
+import argparse
+import os
+import sys
+import time
+import zlib
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'huffman_tree'))
+
+import rans
+from benchmark_codec import synthetic_log
+import huffman_codec
+
+
+def corpora(size, seed=0):
+    rng = np.random.default_rng(seed)
+    yield 'synthetic log', synthetic_log(size, seed)
+    yield 'geometric bytes', np.minimum(rng.geometric(0.2, size) - 1, 255).astype(np.uint8).tobytes()
+    yield 'uniform bytes', rng.integers(0, 256, size, dtype=np.uint8).tobytes()
+
+
+def codecs(adaptive_prefix):
+    yield 'rans interleaved', rans.compress, rans.decompress, None
+
+    def adaptive_compress(data):
+        return rans.encode(list(data), rans.AdaptiveModel())
+
+    def adaptive_decompress(data, count):
+        return bytes(rans.decode(data, count, rans.AdaptiveModel()))
+    yield 'rans adaptive (scalar)', adaptive_compress, adaptive_decompress, adaptive_prefix
+
+    yield 'huffman', huffman_codec.compress, huffman_codec.decompress, None
+    for level in (1, 6, 9):
+        yield f'zlib -{level}', (lambda data, level=level: zlib.compress(data, level)), zlib.decompress, None
+
+
+def bench(name, data, adaptive_prefix):
+    print(f'{name} ({len(data)} bytes)')
+    for codec, compress, decompress, prefix in codecs(adaptive_prefix):
+        sample = data[:prefix] if prefix else data
+        t0 = time.perf_counter()
+        packed = compress(sample)
+        t1 = time.perf_counter()
+        restored = decompress(packed, len(sample)) if prefix else decompress(packed)
+        t2 = time.perf_counter()
+        assert restored == sample, codec
+        mb = len(sample) / 1e6
+        note = f'   (first {len(sample)} bytes)' if prefix else ''
+        print(f'  {codec:22s} size {len(packed) / len(sample):7.2%}   '
+              f'encode {mb / (t1 - t0):8.2f} MB/s   decode {mb / (t2 - t1):8.2f} MB/s{note}')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('files', nargs='*')
+    parser.add_argument('--size', type=int, default=4 << 20, help='size of the built-in corpora')
+    parser.add_argument('--adaptive-prefix', type=int, default=1 << 18,
+                        help='bytes coded by the (slow) scalar adaptive coder')
+    args = parser.parse_args()
+
+    if args.files:
+        for filename in args.files:
+            with open(filename, 'rb') as f:
+                bench(filename, f.read(), args.adaptive_prefix)
+    else:
+        for name, data in corpora(args.size):
+            bench(name, data, args.adaptive_prefix)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,318 @@
+''' Range ANS (rANS) with a 32-bit state and byte-wise renormalisation.
+
+Follows the byte-oriented coder of https://github.com/rygorous/ryg_rans
+(rans_byte.h); push/pop are the same as in ans_bravo.py, with the state kept
+in [RANS_L, 256 * RANS_L) by moving whole bytes in and out of a stream.
+
+Symbols are coded with a model giving, for each symbol, (start, freq) on a
+scale of 2**scale_bits.  Decoding finds the symbol of a slot in
+[0, 2**scale_bits) with a slot -> symbol table, so each step is O(1).
+
+Two coders share the format of the state and of the renormalisation:
+
+- encode/decode: one state, any model, including adaptive ones that change
+  after every symbol (Model.update).  rANS is last-in first-out, so the
+  encoder first runs the model forward to record (start, freq) of each
+  symbol and then pushes them in reverse.
+- encode_interleaved/decode_interleaved: `lanes` independent states, symbol
+  i going to lane i % lanes, each lane with its own byte stream.  All lanes
+  advance together as NumPy vectors, so the Python overhead is paid once per
+  `lanes` symbols.  Static FrequencyTable models only.
+'''
+
+import struct
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+RANS_L = 1 << 23  # lower bound of the normalised state
+SCALE_BITS = 12
+
+
+class RansError(Exception):
+    pass
+
+
+def normalise_counts(counts: Sequence[int], scale_bits: int = SCALE_BITS) -> np.ndarray:
+    ''' Frequencies summing to 2**scale_bits, at least 1 for every symbol with a nonzero count.'''
+    counts = np.asarray(counts, dtype=np.int64)
+    total = counts.sum()
+    target = 1 << scale_bits
+    present = counts > 0
+    if total == 0:
+        raise RansError('no symbols to model')
+    if present.sum() > target:
+        raise RansError(f'{present.sum()} symbols do not fit in {scale_bits} scale bits')
+    freqs = np.where(present, np.maximum(counts * target // total, 1), 0)
+    # Give the rounding error to (or take it from) the largest frequencies
+    while freqs.sum() != target:
+        diff = target - freqs.sum()
+        order = np.argsort(-freqs, kind='stable')
+        if diff > 0:
+            freqs[order[0]] += diff
+        else:
+            for s in order:
+                take = min(freqs[s] - 1, -diff)
+                freqs[s] -= take
+                diff += take
+                if diff == 0:
+                    break
+    return freqs
+
+
+class FrequencyTable:
+    ''' Static model: normalised frequencies, their cumulative starts and the slot table.'''
+
+    def __init__(self, freqs: Sequence[int], scale_bits: int = SCALE_BITS) -> None:
+        freqs = np.asarray(freqs, dtype=np.int64)
+        if freqs.sum() != 1 << scale_bits or (freqs < 0).any():
+            raise RansError(f'frequencies must be >= 0 and sum to 2**{scale_bits}')
+        if not 1 <= scale_bits <= 16:
+            raise RansError('scale_bits must be between 1 and 16')
+        self.scale_bits = scale_bits
+        self.freqs = freqs
+        self.starts = np.concatenate(([0], np.cumsum(freqs)[:-1]))
+        self.slot_to_symbol = np.repeat(np.arange(len(freqs)), freqs)
+        # Python lists for the scalar coder
+        self._freqs = freqs.tolist()
+        self._starts = self.starts.tolist()
+        self._slots = self.slot_to_symbol.tolist()
+
+    @staticmethod
+    def from_counts(counts: Sequence[int], scale_bits: int = SCALE_BITS) -> 'FrequencyTable':
+        return FrequencyTable(normalise_counts(counts, scale_bits), scale_bits)
+
+    @staticmethod
+    def from_data(data: bytes, scale_bits: int = SCALE_BITS) -> 'FrequencyTable':
+        return FrequencyTable.from_counts(np.bincount(np.frombuffer(data, dtype=np.uint8), minlength=256),
+                                          scale_bits)
+
+    # Model interface
+    def encode_params(self, symbol: int) -> Tuple[int, int]:
+        return self._starts[symbol], self._freqs[symbol]
+
+    def decode_symbol(self, slot: int) -> Tuple[int, int, int]:
+        symbol = self._slots[slot]
+        return symbol, self._starts[symbol], self._freqs[symbol]
+
+    def update(self, symbol: int) -> None:
+        pass
+
+
+class AdaptiveModel(FrequencyTable):
+    ''' Counts the symbols coded so far and rebuilds the table every `interval` symbols.
+
+    Encoder and decoder see the same symbols in the same order, so they rebuild
+    identical tables.  Counts are halved when they reach `max_total`, so the
+    model follows slow changes of the statistics.'''
+
+    def __init__(self, num_symbols: int = 256, scale_bits: int = SCALE_BITS,
+                 interval: int = 1024, max_total: int = 1 << 16) -> None:
+        self.counts = np.ones(num_symbols, dtype=np.int64)
+        self.interval = interval
+        self.max_total = max_total
+        self._pending = []
+        super().__init__(normalise_counts(self.counts, scale_bits), scale_bits)
+
+    def update(self, symbol: int) -> None:
+        self._pending.append(symbol)
+        if len(self._pending) == self.interval:
+            self.counts += np.bincount(self._pending, minlength=len(self.counts))
+            self._pending = []
+            while self.counts.sum() > self.max_total:
+                self.counts = (self.counts + 1) >> 1
+            FrequencyTable.__init__(self, normalise_counts(self.counts, self.scale_bits), self.scale_bits)
+
+
+# Scalar coder
+
+def encode(symbols: Sequence[int], model) -> bytes:
+    ''' rANS-codes symbols with one state; the model is updated after each symbol.'''
+    params = []
+    for symbol in symbols:
+        params.append(model.encode_params(symbol))
+        model.update(symbol)
+
+    scale_bits = model.scale_bits
+    out = bytearray()
+    x = RANS_L
+    for start, freq in reversed(params):
+        if freq == 0:
+            raise RansError('symbol with zero frequency')
+        x_max = ((RANS_L >> scale_bits) << 8) * freq
+        while x >= x_max:
+            out.append(x & 0xff)
+            x >>= 8
+        x = ((x // freq) << scale_bits) + (x % freq) + start
+    out += struct.pack('<I', x)  # reversed below into the big-endian first 4 bytes
+    out.reverse()
+    return bytes(out)
+
+
+def decode(data: bytes, count: int, model) -> List[int]:
+    ''' Inverse of encode; the model must start in the state the encoder's started in.'''
+    if len(data) < 4:
+        raise RansError('truncated stream')
+    scale_bits = model.scale_bits
+    mask = (1 << scale_bits) - 1
+    x = int.from_bytes(data[:4], 'big')
+    pos = 4
+    symbols = [0] * count
+    try:
+        for i in range(count):
+            symbol, start, freq = model.decode_symbol(x & mask)
+            x = freq * (x >> scale_bits) + (x & mask) - start
+            while x < RANS_L:
+                x = (x << 8) | data[pos]
+                pos += 1
+            symbols[i] = symbol
+            model.update(symbol)
+    except IndexError:
+        raise RansError('truncated stream')
+    return symbols
+
+
+# Interleaved coder
+
+def encode_interleaved(symbols: np.ndarray, table: FrequencyTable, lanes: int = 1024) -> List[bytes]:
+    ''' Codes symbol i in lane i % lanes; returns one byte stream per lane.'''
+    symbols = np.asarray(symbols, dtype=np.int64)
+    n = len(symbols)
+    steps = -(-n // lanes)
+    scale_bits = table.scale_bits
+    if n and table.freqs[symbols].min() == 0:
+        raise RansError('symbol with zero frequency')
+
+    grid = np.zeros(steps * lanes, dtype=np.int64)
+    grid[:n] = symbols
+    grid = grid.reshape(steps, lanes)
+    active_lanes = np.full(steps, lanes)
+    if steps:
+        active_lanes[-1] = n - (steps - 1) * lanes
+
+    # Each symbol emits at most 2 bytes (scale_bits <= 16), then 4 bytes of final state.
+    out = np.zeros((lanes, 2 * steps + 4), dtype=np.uint8)
+    used = np.zeros(lanes, dtype=np.int64)
+    lane_index = np.arange(lanes)
+    x = np.full(lanes, RANS_L, dtype=np.int64)
+    bound = (RANS_L >> scale_bits) << 8
+
+    for step in range(steps - 1, -1, -1):
+        k = active_lanes[step]
+        s = grid[step, :k]
+        freq = table.freqs[s]
+        start = table.starts[s]
+        xk = x[:k]
+        x_max = bound * freq
+        for ignored in range(2):
+            emit = xk >= x_max
+            if not emit.any():
+                break
+            lanes_emitting = lane_index[:k][emit]
+            out[lanes_emitting, used[lanes_emitting]] = xk[emit] & 0xff
+            used[lanes_emitting] += 1
+            xk = np.where(emit, xk >> 8, xk)
+        x[:k] = ((xk // freq) << scale_bits) + (xk % freq) + start
+
+    for shift in (0, 8, 16, 24):
+        out[lane_index, used] = (x >> shift) & 0xff
+        used += 1
+    return [out[lane, :used[lane]][::-1].tobytes() for lane in range(lanes)]
+
+
+def decode_interleaved(streams: Sequence[bytes], count: int, table: FrequencyTable) -> np.ndarray:
+    ''' Inverse of encode_interleaved.'''
+    lanes = len(streams)
+    steps = -(-count // lanes)
+    scale_bits = table.scale_bits
+    mask = (1 << scale_bits) - 1
+    lengths = np.array([len(s) for s in streams], dtype=np.int64)
+    if (lengths < 4).any():
+        raise RansError('truncated stream')
+    buffer = np.zeros((lanes, lengths.max() + 2), dtype=np.int64)
+    for lane, stream in enumerate(streams):
+        buffer[lane, :len(stream)] = np.frombuffer(stream, dtype=np.uint8)
+
+    lane_index = np.arange(lanes)
+    x = (buffer[:, 0] << 24) | (buffer[:, 1] << 16) | (buffer[:, 2] << 8) | buffer[:, 3]
+    pos = np.full(lanes, 4, dtype=np.int64)
+    freqs, starts, slots = table.freqs, table.starts, table.slot_to_symbol
+    symbols = np.empty(steps * lanes, dtype=np.int64).reshape(max(steps, 0), lanes)
+
+    for step in range(steps):
+        k = min(lanes, count - step * lanes)
+        xk = x[:k]
+        slot = xk & mask
+        s = slots[slot]
+        xk = freqs[s] * (xk >> scale_bits) + slot - starts[s]
+        for ignored in range(2):
+            read = xk < RANS_L
+            if not read.any():
+                break
+            lanes_reading = lane_index[:k][read]
+            xk = np.where(read, xk << 8, xk)
+            xk[read] |= buffer[lanes_reading, pos[lanes_reading]]
+            pos[lanes_reading] += 1
+        x[:k] = xk
+        symbols[step, :k] = s
+
+    if (pos > lengths).any():
+        raise RansError('truncated stream')
+    return symbols.reshape(-1)[:count]
+
+
+# Byte stream format:
+#   MAGIC, scale_bits (u8), number of lanes (u16), 256 frequencies (u32: a single
+#   symbol has frequency 2**16 at scale_bits 16),
+#   then blocks of: symbol count (u32), lane stream lengths (u32 each), lane streams
+#   and a final block with symbol count 0.
+
+MAGIC = b'RANS'
+CHUNK_SIZE = 1 << 22  # lanes cost 8 bytes each per chunk, 0.2% with the defaults
+_header = struct.Struct('<4sBH')
+_count = struct.Struct('<I')
+
+
+def compress(data: bytes, lanes: int = 1024, scale_bits: int = SCALE_BITS, chunk_size: int = CHUNK_SIZE) -> bytes:
+    ''' Compresses bytes with a static order-0 model and interleaved lanes.'''
+    if not data:
+        freqs = np.zeros(256, dtype=np.int64)
+        freqs[0] = 1 << scale_bits
+        table = FrequencyTable(freqs, scale_bits)
+    else:
+        table = FrequencyTable.from_data(data, scale_bits)
+    out = [_header.pack(MAGIC, scale_bits, lanes), table.freqs.astype('<u4').tobytes()]
+    for begin in range(0, len(data), chunk_size):
+        chunk = np.frombuffer(data[begin:begin + chunk_size], dtype=np.uint8)
+        streams = encode_interleaved(chunk, table, lanes)
+        out.append(_count.pack(len(chunk)))
+        out.append(np.array([len(s) for s in streams], dtype='<u4').tobytes())
+        out.extend(streams)
+    out.append(_count.pack(0))
+    return b''.join(out)
+
+
+def decompress(data: bytes) -> bytes:
+    if len(data) < _header.size + 1024:
+        raise RansError('truncated stream')
+    magic, scale_bits, lanes = _header.unpack_from(data)
+    if magic != MAGIC:
+        raise RansError('not a rANS stream')
+    pos = _header.size
+    table = FrequencyTable(np.frombuffer(data, dtype='<u4', count=256, offset=pos).astype(np.int64), scale_bits)
+    pos += 1024
+    out = []
+    while True:
+        if pos + _count.size > len(data):
+            raise RansError('truncated stream')
+        count, = _count.unpack_from(data, pos)
+        pos += _count.size
+        if count == 0:
+            return b''.join(out)
+        lengths = np.frombuffer(data, dtype='<u4', count=lanes, offset=pos).tolist()
+        pos += 4 * lanes
+        streams = []
+        for length in lengths:
+            streams.append(data[pos:pos + length])
+            pos += length
+        out.append(decode_interleaved(streams, count, table).astype(np.uint8).tobytes())
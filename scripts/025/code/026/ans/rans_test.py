@@ -0,0 +1,21 @@
+import os
+
+from rans import compress, decompress
+
+
+def test_round_trip():
+    data = os.urandom(1000) + b'abracadabra' * 500
+    for scale_bits in (12, 16):
+        assert decompress(compress(data, lanes=16, scale_bits=scale_bits)) == data
+
+
+def test_single_symbol_and_empty_at_16_scale_bits():
+    # the only symbol present has frequency 2**16
+    for data in (b'aaaa', b'a', b''):
+        assert decompress(compress(data, scale_bits=16)) == data
+
+
+if __name__ == '__main__':
+    test_round_trip()
+    test_single_symbol_and_empty_at_16_scale_bits()
+    print('ok')
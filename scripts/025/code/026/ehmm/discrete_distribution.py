@@ -1,6 +1,5 @@
 import numpy as np
-import pandas as pd
-from typing import Dict, List, Union
+from typing import Dict, List, Sequence, Tuple, Union
 
 class HMMException(Exception):
     pass
@@ -10,27 +9,35 @@ class ProbabilityVector: # Probability Distribution
         states = [s for s in state_frequency.keys()]
         frequencies = [f for f in state_frequency.values()]
         total = sum(frequencies)
-        
+
         assert len(states) == len(frequencies), "number of frequencies must match number of states."
-        
+
         assert len(states) == len(set(states)), "states must be unique."
-        
+
         assert all(map(lambda x: 0 <= x, frequencies)), "frequencies must be >= 0"
 
         assert total > 0, "must be sum(frequencies) > 0"
-        
+
         self._states = states
+        self._index = {s: i for i, s in enumerate(states)}
         probabilities = np.array(frequencies, dtype=float) / total
+        probabilities.flags.writeable = False
         self._probabilities = probabilities
+        self._df = None
 
     @property
     def states(self) -> List[str]:
         return self._states
-    
+
     @property
     def probabilities(self) -> np.ndarray:
         return self._probabilities
-    
+
+    @property
+    def values(self) -> np.ndarray:
+        # row vector (1, N), as used by the matrix products of HiddenMarkovChain
+        return self._probabilities.reshape(1, -1)
+
     @staticmethod
     def random_initialize(states: List[str], max_frequency: int = 10) -> 'ProbabilityVector':
         size = len(states)
@@ -38,45 +45,121 @@ class ProbabilityVector: # Probability Distribution
         frequency_per_state = dict(((k, v) for k, v in zip(states, frequencies)))
         return ProbabilityVector(frequency_per_state)
 
+    @staticmethod
+    def from_numpy(array: np.ndarray, states: List[str]) -> 'ProbabilityVector':
+        return ProbabilityVector(dict(zip(states, np.asarray(array, dtype=float).ravel())))
+
     @property
     def df(self):
-        return pd.DataFrame(data=[self.probabilities], 
-                            columns=self.states,
-                            index=['probability'])
-    
-    def __getitem__(self, state: str) -> float:
+        # pandas is only needed for display, so it is imported on first use
+        if self._df is None:
+            import pandas as pd
+            self._df = pd.DataFrame(data=[self.probabilities],
+                                    columns=self.states,
+                                    index=['probability'])
+        return self._df
+
+    def index(self, state: str) -> int:
         try:
-            index = self.states.index(state)
-            return self.probabilities[index]
-        except ValueError:
-            raise HMMException(f'unknown state {state:s}')
-        
+            return self._index[state]
+        except KeyError:
+            raise HMMException(f'unknown state {state}')
+
+    def __getitem__(self, state: str) -> float:
+        return self.probabilities[self.index(state)]
+
     def __mul__(self, other: Union['ProbabilityVector', int, float]) -> np.ndarray:
         if isinstance(other, ProbabilityVector):
             return self.probabilities * other.probabilities
         elif isinstance(other, (int, float)):
             return self.probabilities * other
         else:
-            raise HMMException(f'__mul__({other.__class.__name__:s}) not implemented')
-        
+            raise HMMException(f'__mul__({other.__class__.__name__:s}) not implemented')
+
     def __rmul__(self, other: Union['ProbabilityVector', int, float]) -> np.ndarray:
         return self.__mul__(other)
-    
+
     def argmax(self):
         index = self.probabilities.argmax()
         return self.states[index]
 
 
+DiscreteDistribution = ProbabilityVector
+
+
 class ProbabilityMatrix:
-    def __init__(self):
-        self._states: List[str] = []
-        self._observables: List[str] = []
-        self._frequencies: Dict[str, int] = {}
-        
-        
-from itertools import product
-from functools import reduce
-        
+    # One ProbabilityVector over the observables per state, stored as an
+    # (N states, M observables) array with index maps for both axes.
+    def __init__(self, rows: Dict[str, ProbabilityVector]) -> None:
+        states = [s for s in rows.keys()]
+        assert len(states) > 0, "at least one state is required."
+        observables = rows[states[0]].states
+        assert all(map(lambda v: v.states == observables, rows.values())), \
+            "all rows must be distributions over the same observables."
+
+        self._states = states
+        self._observables = observables
+        self._state_index = {s: i for i, s in enumerate(states)}
+        self._observable_index = {o: j for j, o in enumerate(observables)}
+        values = np.stack([rows[s].probabilities for s in states])
+        values.flags.writeable = False
+        self._values = values
+        self._columns = [values[:, j:j + 1] for j in range(len(observables))]  # (N, 1) views
+        self._df = None
+
+    @property
+    def states(self) -> List[str]:
+        return self._states
+
+    @property
+    def observables(self) -> List[str]:
+        return self._observables
+
+    @property
+    def values(self) -> np.ndarray:
+        return self._values
+
+    @staticmethod
+    def random_initialize(states: List[str], observables: List[str]) -> 'ProbabilityMatrix':
+        return ProbabilityMatrix(dict((s, ProbabilityVector.random_initialize(observables)) for s in states))
+
+    @staticmethod
+    def from_numpy(array: np.ndarray, states: List[str], observables: List[str]) -> 'ProbabilityMatrix':
+        array = np.asarray(array, dtype=float)
+        assert array.shape == (len(states), len(observables)), "array shape must be (states, observables)."
+        return ProbabilityMatrix(dict((s, ProbabilityVector.from_numpy(row, observables))
+                                      for s, row in zip(states, array)))
+
+    @property
+    def df(self):
+        if self._df is None:
+            import pandas as pd
+            self._df = pd.DataFrame(data=self.values, columns=self.observables, index=self.states)
+        return self._df
+
+    def state_index(self, state: str) -> int:
+        try:
+            return self._state_index[state]
+        except KeyError:
+            raise HMMException(f'unknown state {state}')
+
+    def observable_index(self, observable: str) -> int:
+        try:
+            return self._observable_index[observable]
+        except KeyError:
+            raise HMMException(f'unknown observable {observable}')
+
+    def encode(self, observables: Sequence[str]) -> np.ndarray:
+        return np.fromiter((self.observable_index(o) for o in observables), dtype=np.int64, count=len(observables))
+
+    def probability(self, state: str, observable: str) -> float:
+        return self.values[self.state_index(state), self.observable_index(observable)]
+
+    def __getitem__(self, observable: str) -> np.ndarray:
+        # column (N, 1): probability of the observable from each state
+        return self._columns[self.observable_index(observable)]
+
+
 class HiddenMarkovChain:
     def __init__(self, T, E, pi):
         self._T = T # transmission matrix A
@@ -84,87 +167,118 @@ class HiddenMarkovChain:
         self._pi = pi
         self._states = pi.states
         self._observables = E.observables
-        
+
+    @property
+    def T(self) -> ProbabilityMatrix:
+        return self._T
+
+    @property
+    def E(self) -> ProbabilityMatrix:
+        return self._E
+
+    @property
+    def pi(self) -> ProbabilityVector:
+        return self._pi
+
+    @property
+    def states(self) -> List[str]:
+        return self._states
+
+    @property
+    def observables(self) -> List[str]:
+        return self._observables
+
     @staticmethod
     def random_initialize(states: List[str], observables: List[str]) -> 'HiddenMarkovChain':
         T = ProbabilityMatrix.random_initialize(states, states)
         E = ProbabilityMatrix.random_initialize(states, observables)
         pi = ProbabilityVector.random_initialize(states)
         return HiddenMarkovChain(T, E, pi)
-    
-    def _create_all_chains(self, chain_length):
-        return list(product(*(self.states,) * chain_length))
-    
-    def score(self, observations: list) -> float:
-        def mul(x, y): return x * y
-        
-        score = 0
-        all_chains = self._create_all_chains(len(observations))
-        for idx, chain in enumerate(all_chains):
-            expanded_chain = list(zip(chain, [self.T.states[0]] + list(chain)))
-            expanded_obser = list(zip(observations, chain))
-            
-            p_observations = list(map(lambda x: self.E.df.loc[x[1], x[0]], expanded_obser))
-            p_hidden_state = list(map(lambda x: self.T.df.loc[x[1], x[0]], expanded_chain))
-            p_hidden_state[0] = self.pi[chain[0]]
-            
-            score += reduce(mul, p_observations) * reduce(mul, p_hidden_state)
-        return score
 
+    def _emissions(self, observations: list) -> np.ndarray:
+        # (len(observations), N): probability of each observation from each state
+        return self.E.values[:, self.E.encode(observations)].T
 
-class HiddenMarkovChain_FP(HiddenMarkovChain):
-    def _alphas(self, observations: list) -> np.ndarray:
+    def _scaled_alphas(self, observations: list) -> Tuple[np.ndarray, np.ndarray]:
+        # forward algorithm, each row normalised to sum 1; returns the rows and
+        # the normalising constants, whose product is P(observations)
+        emissions = self._emissions(observations)
         alphas = np.zeros((len(observations), len(self.states)))
-        alphas[0, :] = self.pi.values * self.E[observations[0]].T
-        for t in range(1, len(observations)):
-            alphas[t, :] = (alphas[t - 1, :].reshape(1, -1) 
-                         @ self.T.values) * self.E[observations[t]].T
-        return alphas
-    
+        scales = np.ones(len(observations))
+        a = self.pi.probabilities * emissions[0]
+        for t in range(len(observations)):
+            if t > 0:
+                a = (alphas[t - 1] @ self.T.values) * emissions[t]
+            scales[t] = a.sum()
+            if scales[t] == 0:
+                break
+            alphas[t] = a / scales[t]
+        return alphas, scales
+
+    def _alphas(self, observations: list) -> np.ndarray:
+        alphas, scales = self._scaled_alphas(observations)
+        return alphas * np.cumprod(scales)[:, None]
+
+    def log_score(self, observations: list) -> float:
+        if len(observations) == 0:
+            return 0.0
+        _, scales = self._scaled_alphas(observations)
+        with np.errstate(divide='ignore'):
+            return float(np.log(scales).sum())
+
     def score(self, observations: list) -> float:
-        alphas = self._alphas(observations)
-        return float(alphas[-1].sum())
+        # P(observations), by the forward algorithm in O(len(observations) * N^2)
+        return float(np.exp(self.log_score(observations)))
+
+
+class HiddenMarkovChain_FP(HiddenMarkovChain):
+    pass
 
 
 class HiddenMarkovChain_Simulation(HiddenMarkovChain):
     def run(self, length: int) -> (list, list):
+        # Draws each state and observation independently from the marginal
+        # distributions pi T^t and pi T^t E, all in one vectorized step.
         assert length >= 0, "The chain needs to be a non-negative number."
-        s_history = [0] * (length + 1)
-        o_history = [0] * (length + 1)
-        
-        prb = self.pi.values
-        obs = prb @ self.E.values
-        s_history[0] = np.random.choice(self.states, p=prb.flatten())
-        o_history[0] = np.random.choice(self.observables, p=obs.flatten())
-        
+        prb = np.zeros((length + 1, len(self.states)))
+        prb[0] = self.pi.probabilities
         for t in range(1, length + 1):
-            prb = prb @ self.T.values
-            obs = prb @ self.E.values
-            s_history[t] = np.random.choice(self.states, p=prb.flatten())
-            o_history[t] = np.random.choice(self.observables, p=obs.flatten())
-        
+            prb[t] = prb[t - 1] @ self.T.values
+        obs = prb @ self.E.values
+
+        s_index = _sample_rows(prb)
+        o_index = _sample_rows(obs)
+        o_history = [self.observables[j] for j in o_index]
+        s_history = [self.states[i] for i in s_index]
         return o_history, s_history
 
 
+def _sample_rows(probabilities: np.ndarray) -> np.ndarray:
+    # one categorical draw per row, by inverting the cumulative distribution
+    cumulative = probabilities.cumsum(axis=1)
+    u = np.random.random(len(probabilities)) * cumulative[:, -1]
+    return np.minimum((cumulative <= u[:, None]).sum(axis=1), probabilities.shape[1] - 1)
+
+
 class HiddenMarkovChain_Uncover(HiddenMarkovChain_Simulation):
-    def _alphas(self, observations: list) -> np.ndarray:
-        alphas = np.zeros((len(observations), len(self.states)))
-        alphas[0, :] = self.pi.values * self.E[observations[0]].T
-        for t in range(1, len(observations)):
-            alphas[t, :] = (alphas[t - 1, :].reshape(1, -1) @ self.T.values) \
-                         * self.E[observations[t]].T
-        return alphas
-    
     def _betas(self, observations: list) -> np.ndarray:
+        emissions = self._emissions(observations)
+        betas = np.zeros((len(observations), len(self.states)))
+        betas[-1, :] = 1
+        for t in range(len(observations) - 2, -1, -1):
+            betas[t, :] = self.T.values @ (emissions[t + 1] * betas[t + 1, :])
+        return betas
+
+    def _scaled_betas(self, observations: list, scales: np.ndarray) -> np.ndarray:
+        emissions = self._emissions(observations)
         betas = np.zeros((len(observations), len(self.states)))
         betas[-1, :] = 1
         for t in range(len(observations) - 2, -1, -1):
-            betas[t, :] = (self.T.values @ (self.E[observations[t + 1]] \
-                        * betas[t + 1, :].reshape(-1, 1))).reshape(1, -1)
+            betas[t, :] = self.T.values @ (emissions[t + 1] * betas[t + 1, :]) / scales[t + 1]
         return betas
-    
+
     def uncover(self, observations: list) -> list:
-        alphas = self._alphas(observations)
-        betas = self._betas(observations)
+        alphas, scales = self._scaled_alphas(observations)
+        betas = self._scaled_betas(observations, scales)
         maxargs = (alphas * betas).argmax(axis=1)
-        return list(map(lambda x: self.states[x], maxargs))    
+        return list(map(lambda x: self.states[x], maxargs))
@@ -0,0 +1,93 @@
+# Compares the original double-loop Viterbi of HMM.viterbi with the
+# vectorized log-space decoders in viterbi.py.
+#
+#   python benchmark_viterbi.py [--states 100] [--symbols 20] [--length 2000] [--batch 16] [--lag 64]
+
+import argparse
+import time
+
+import numpy as np
+
+from viterbi import StreamingViterbi, viterbi_batch, viterbi_log
+
+
+def viterbi_loop(A, B, pi, observations):
+    """The original HMM.viterbi: probability space, Python loop over t and j."""
+    T = len(observations)
+    N = A.shape[0]
+    delta = np.zeros((T, N))
+    phi = np.zeros((T, N), dtype=np.int64)
+
+    # Initialization
+    delta[0] = pi * B[:, observations[0]]
+
+    # Recursion
+    for t in range(1, T):
+        for j in range(N):
+            delta[t, j] = np.max(delta[t-1] * A[:, j]) * B[j, observations[t]]
+            phi[t, j] = np.argmax(delta[t-1] * A[:, j])
+
+    # Backtracking
+    path = np.zeros(T, dtype=np.int64)
+    path[T-1] = np.argmax(delta[T-1])
+    for t in range(T-2, -1, -1):
+        path[t] = phi[t+1, path[t+1]]
+
+    return path
+
+
+def random_model(rng, N, M):
+    A = rng.random((N, N)) ** 4  # peaked rows, so the best path is well separated
+    A /= A.sum(axis=1, keepdims=True)
+    B = rng.random((N, M)) ** 4
+    B /= B.sum(axis=1, keepdims=True)
+    pi = np.full(N, 1.0 / N)
+    return A, B, pi
+
+
+def timed(f, *args):
+    t0 = time.perf_counter()
+    result = f(*args)
+    return result, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--states', type=int, default=100)
+    parser.add_argument('--symbols', type=int, default=20)
+    parser.add_argument('--length', type=int, default=2000)
+    parser.add_argument('--batch', type=int, default=16)
+    parser.add_argument('--lag', type=int, default=64)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    A, B, pi = random_model(rng, args.states, args.symbols)
+    T = args.length
+    observations = rng.integers(0, args.symbols, size=T)
+
+    # The loop version works in probability space and underflows on long
+    # sequences, so agreement is checked on a short prefix only.
+    short = observations[:50]
+    assert np.array_equal(viterbi_loop(A, B, pi, short), viterbi_log(A, B, pi, short)[0])
+
+    _, t_loop = timed(viterbi_loop, A, B, pi, observations)
+    (path, log_prob), t_log = timed(viterbi_log, A, B, pi, observations)
+    print(f'N={args.states} M={args.symbols} T={T}')
+    print(f'loop (original)   {t_loop:8.3f} s')
+    print(f'viterbi_log       {t_log:8.3f} s   x{t_loop / t_log:.1f}   log P = {log_prob:.2f}')
+
+    batch = rng.integers(0, args.symbols, size=(T, args.batch))
+    (paths, _), t_batch = timed(viterbi_batch, A, B, pi, batch)
+    assert np.array_equal(paths[:, 0], viterbi_log(A, B, pi, batch[:, 0])[0])
+    print(f'viterbi_batch     {t_batch:8.3f} s   {args.batch} sequences, '
+          f'{t_batch / args.batch:.3f} s per sequence')
+
+    decoder = StreamingViterbi(A, B, pi, lag=args.lag)
+    streamed, t_stream = timed(decoder.decode, observations)
+    agreement = np.mean(streamed == path)
+    print(f'streaming lag={args.lag:<4} {t_stream:8.3f} s   agrees with offline path on {agreement:.2%} of steps')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,236 @@
+# Scaled forward-backward for discrete HMMs, batched over many sequences.
+#
+# Rabiner, "A Tutorial on Hidden Markov Models and Selected Applications in
+# Speech Recognition", section V.A (scaling).
+#
+# alpha_hat[t] = alpha[t] / (c[0] * ... * c[t]) sums to 1 at every step, so
+# nothing underflows; the log-likelihood of a sequence is sum(log(c[t])).
+# beta_hat[t] is scaled with the same factors, so gamma[t] = alpha_hat[t] * beta_hat[t].
+#
+# Arrays are time-major: observations have shape (T, S) for S sequences padded
+# to length T, alpha_hat/beta_hat have shape (T, S, N).  Steps at t >= lengths[s]
+# are padding and contribute nothing.
+
+from typing import Iterator, List, NamedTuple, Sequence, Tuple
+
+import numpy as np
+
+
+class Statistics(NamedTuple):
+    log_likelihood: np.ndarray  # (S,) log P(sequence)
+    initial: np.ndarray  # (N,) sum over sequences of gamma[0]
+    transitions: np.ndarray  # (N, N) expected number of i -> j transitions
+    emissions: np.ndarray  # (N, M) expected number of times state i emits symbol k
+    occupancy: np.ndarray  # (N,) expected number of steps spent in each state
+
+    def __add__(self, other: 'Statistics') -> 'Statistics':
+        return Statistics(np.concatenate([self.log_likelihood, other.log_likelihood]),
+                          self.initial + other.initial,
+                          self.transitions + other.transitions,
+                          self.emissions + other.emissions,
+                          self.occupancy + other.occupancy)
+
+
+def pad_sequences(sequences: Sequence[Sequence[int]], fill: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """Stacks sequences of symbols into a time-major (T, S) array, returning it and the lengths."""
+    lengths = np.array([len(s) for s in sequences], dtype=np.int64)
+    observations = np.full((lengths.max(initial=0), len(sequences)), fill, dtype=np.int64)
+    for s, sequence in enumerate(sequences):
+        observations[:lengths[s], s] = sequence
+    return observations, lengths
+
+
+def _as_batch(observations: np.ndarray, lengths: np.ndarray = None) -> Tuple[np.ndarray, np.ndarray]:
+    observations = np.asarray(observations)
+    if observations.ndim == 1:
+        observations = observations[:, None]
+    if lengths is None:
+        lengths = np.full(observations.shape[1], observations.shape[0], dtype=np.int64)
+    return observations, np.asarray(lengths)
+
+
+def forward_scaled(A: np.ndarray,
+                   B: np.ndarray,
+                   pi: np.ndarray,
+                   observations: np.ndarray,
+                   lengths: np.ndarray = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Returns alpha_hat (T, S, N) and the scale factors c (T, S); c is 1 on padding."""
+    observations, lengths = _as_batch(observations, lengths)
+    T, S = observations.shape
+    N = A.shape[0]
+    alpha = np.empty((T, S, N))
+    scale = np.ones((T, S))
+    BT = B.T  # (M, N): BT[observations[t]] is the (S, N) emission probability of each step
+
+    # Initialization
+    a = pi * BT[observations[0]]
+    c = a.sum(axis=1)
+    active = lengths > 0
+    scale[0] = np.where(active, c, 1.0)
+    alpha[0] = a / np.where(c > 0, c, 1.0)[:, None]
+
+    # Recursion; while t < shortest every sequence is still active.
+    shortest = lengths.min(initial=T)
+    for t in range(1, T):
+        a = np.dot(alpha[t - 1], A) * BT[observations[t]]
+        c = a.sum(axis=1)
+        if t < shortest:
+            scale[t] = c
+            np.divide(a, np.where(c > 0, c, 1.0)[:, None], out=alpha[t])
+        else:
+            active = t < lengths
+            scale[t] = np.where(active, c, 1.0)
+            alpha[t] = np.where(active[:, None], a / np.where(c > 0, c, 1.0)[:, None], alpha[t - 1])
+
+    return alpha, scale
+
+
+def backward_blocks(A: np.ndarray,
+                    B: np.ndarray,
+                    observations: np.ndarray,
+                    scale: np.ndarray,
+                    lengths: np.ndarray,
+                    block: int) -> Iterator[Tuple[int, np.ndarray]]:
+    """
+    Yields (t0, beta_hat[t0:t0 + block]) from the last block to the first, so
+    that callers can consume beta_hat without holding all of it.
+    """
+    T, S = observations.shape
+    N = A.shape[0]
+    BT = B.T
+    AT = A.T
+    shortest = lengths.min(initial=T)
+    following = None  # beta_hat at the first step of the previous (later) block
+    for t0 in range(((T - 1) // block) * block, -1, -block):
+        t1 = min(t0 + block, T)
+        beta = np.empty((t1 - t0, S, N))
+        for t in range(t1 - 1, t0 - 1, -1):
+            if t == T - 1:
+                # Initialization
+                beta[t - t0] = 1.0
+                continue
+            # Recursion; while t + 1 < shortest every sequence is still active.
+            next_beta = beta[t + 1 - t0] if t + 1 < t1 else following
+            b = np.dot(BT[observations[t + 1]] * next_beta, AT)
+            c = scale[t + 1]
+            if t + 1 < shortest:
+                np.divide(b, np.where(c > 0, c, 1.0)[:, None], out=beta[t - t0])
+            else:
+                active = t + 1 < lengths
+                beta[t - t0] = np.where(active[:, None], b / np.where(c > 0, c, 1.0)[:, None], 1.0)
+        following = beta[0]
+        yield t0, beta
+
+
+def backward_scaled(A: np.ndarray,
+                    B: np.ndarray,
+                    observations: np.ndarray,
+                    scale: np.ndarray,
+                    lengths: np.ndarray = None) -> np.ndarray:
+    """Returns beta_hat (T, S, N), scaled with the factors computed by forward_scaled."""
+    observations, lengths = _as_batch(observations, lengths)
+    T, S = observations.shape
+    beta = np.empty((T, S, A.shape[0]))
+    for t0, block in backward_blocks(A, B, observations, scale, lengths, max(T, 1)):
+        beta[t0:t0 + len(block)] = block
+    return beta
+
+
+def log_likelihood(A: np.ndarray,
+                   B: np.ndarray,
+                   pi: np.ndarray,
+                   observations: np.ndarray,
+                   lengths: np.ndarray = None) -> np.ndarray:
+    """Returns log P(sequence) for each sequence of the batch."""
+    _, scale = forward_scaled(A, B, pi, observations, lengths)
+    with np.errstate(divide='ignore'):
+        return np.log(scale).sum(axis=0)
+
+
+def expected_statistics(A: np.ndarray,
+                        B: np.ndarray,
+                        pi: np.ndarray,
+                        observations: np.ndarray,
+                        lengths: np.ndarray = None,
+                        block: int = 4096) -> Statistics:
+    """
+    E-step of Baum-Welch: expected counts summed over time and over the batch.
+
+    Only alpha_hat is kept for the whole batch: beta_hat is computed ``block``
+    steps at a time, and the counts of each block are accumulated as soon as
+    its beta_hat is known.  The transition counts of a block are one
+    (N, block*S) @ (block*S, N) product instead of a (block, N, N) xi tensor.
+    """
+    observations, lengths = _as_batch(observations, lengths)
+    T, S = observations.shape
+    N, M = B.shape
+
+    alpha, scale = forward_scaled(A, B, pi, observations, lengths)
+
+    with np.errstate(divide='ignore'):
+        loglik = np.log(scale).sum(axis=0)
+
+    initial = np.zeros(N)
+    transitions = np.zeros((N, N))
+    emissions = np.zeros((N, M))
+    occupancy = np.zeros(N)
+    steps = np.arange(T)
+    for t0, beta in backward_blocks(A, B, observations, scale, lengths, block):
+        t1 = t0 + len(beta)
+        # gamma[t] = alpha_hat[t] * beta_hat[t], zeroed on padding
+        mask = steps[t0:t1, None] < lengths[None, :]  # (block, S)
+        gamma = alpha[t0:t1] * beta
+        gamma *= mask[:, :, None]
+        if t0 == 0:
+            initial = gamma[0][lengths > 0].sum(axis=0)
+
+        # sum_t xi[t]_ij = A_ij * sum_t alpha_hat[t]_i * B_j(o[t+1]) * beta_hat[t+1]_j / c[t+1],
+        # summed here over the steps t + 1 of the block
+        u0 = max(t0, 1)
+        if u0 < t1:
+            right = B.T[observations[u0:t1]] * beta[u0 - t0:] / scale[u0:t1, :, None]
+            right *= mask[u0 - t0:, :, None]
+            transitions += alpha[u0 - 1:t1 - 1].reshape(-1, N).T @ right.reshape(-1, N)
+
+        flat_observations = observations[t0:t1][mask]
+        flat_gamma = gamma[mask]
+        for i in range(N):
+            emissions[i] += np.bincount(flat_observations, weights=flat_gamma[:, i], minlength=M)
+        occupancy += flat_gamma.sum(axis=0)
+
+    return Statistics(loglik, initial, A * transitions, emissions, occupancy)
+
+
+def _batches(order: List[int], sequences: List[Sequence[int]], batch_size: int, max_steps: int) -> Iterator[List[int]]:
+    # order is sorted by length, so the last sequence of a batch is its longest
+    batch = []
+    for s in order:
+        if batch and (len(batch) == batch_size or len(sequences[s]) * (len(batch) + 1) > max_steps):
+            yield batch
+            batch = []
+        batch.append(s)
+    if batch:
+        yield batch
+
+
+def expected_statistics_chunked(A: np.ndarray,
+                                B: np.ndarray,
+                                pi: np.ndarray,
+                                sequences: List[Sequence[int]],
+                                batch_size: int = 64,
+                                max_steps: int = 1 << 18) -> Statistics:
+    """
+    expected_statistics over a list of sequences of different lengths, padded in
+    batches of at most ``batch_size`` sequences of similar length to limit the
+    padding.  A batch also holds at most ``max_steps`` padded steps (the size of
+    alpha_hat is max_steps * N floats), unless a single sequence is longer.
+    """
+    order = sorted(range(len(sequences)), key=lambda s: len(sequences[s]))
+    total = None
+    loglik = np.empty(len(sequences))
+    for batch in _batches(order, sequences, batch_size, max_steps):
+        observations, lengths = pad_sequences([sequences[s] for s in batch])
+        stats = expected_statistics(A, B, pi, observations, lengths)
+        loglik[batch] = stats.log_likelihood
+        total = stats if total is None else total + stats
+    return total._replace(log_likelihood=loglik)
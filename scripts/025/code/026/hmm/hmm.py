@@ -4,6 +4,11 @@
 
 import numpy as np
 
+from engine import backward_scaled, forward_scaled, log_likelihood
+from training import baum_welch
+from viterbi import viterbi_log
+
+
 class HMM:
     def __init__(self, A, B, pi):
         self.A = A  # Transition matrix
@@ -14,99 +19,59 @@ class HMM:
         self.M = B.shape[1]  # Number of observable symbols
 
     def forward(self, observations: np.ndarray) -> np.ndarray:
-        T = len(observations)
-        alpha = np.zeros((T, self.N))
-
-        # Initialization
-        alpha[0] = self.pi * self.B[:, observations[0]]
-
-        # Recursion
-        for t in range(1, T):
-            alpha[t] = np.dot(alpha[t-1], self.A) * self.B[:, observations[t]]
-
-        return alpha
+        """
+        Returns alpha_hat (T, N), the forward variables scaled to sum to 1 at each
+        step (see engine.py), so that long sequences do not underflow.
+        """
+        return forward_scaled(self.A, self.B, self.pi, observations)[0][:, 0]
 
     def backward(self, observations: np.ndarray) -> np.ndarray:
-        T = len(observations)
-        beta = np.zeros((T, self.N))
-
-        # Initialization
-        beta[T-1] = 1
+        """Returns beta_hat (T, N), scaled with the same factors as forward()."""
+        scale = forward_scaled(self.A, self.B, self.pi, observations)[1]
+        return backward_scaled(self.A, self.B, observations, scale)[:, 0]
 
-        # Recursion
-        for t in range(T-2, -1, -1):
-            beta[t] = np.dot(self.A, self.B[:, observations[t+1]] * beta[t+1])
-
-        return beta
+    def log_likelihood(self, observations: np.ndarray) -> float:
+        """Returns log P(observations)."""
+        return float(log_likelihood(self.A, self.B, self.pi, observations)[0])
 
     def compute_gamma(self, 
                       observations: np.ndarray, 
                       alpha: np.ndarray, 
                       beta: np.ndarray) -> np.ndarray:
-        T = len(observations)
-        gamma = np.zeros((T, self.N))
-
-        for t in range(T):
-            gamma[t] = (alpha[t] * beta[t]) / np.sum(alpha[t] * beta[t])
-
-        return gamma
+        # Normalised at each step, so alpha and beta may be scaled or not
+        gamma = alpha * beta
+        return gamma / gamma.sum(axis=1, keepdims=True)
 
     def compute_xi(self,  
                       observations: np.ndarray, 
                       alpha: np.ndarray, 
                       beta: np.ndarray) -> np.ndarray:
-        T = len(observations)
-        xi = np.zeros((T-1, self.N, self.N))
-
-        for t in range(T-1):
-            numerator = alpha[t].reshape(-1, 1) * self.A * self.B[:, observations[t+1]] * beta[t+1]
-            denominator = np.sum(alpha[t] * beta[t])
-            xi[t] = numerator / denominator
-
-        return xi
-
-    def train(self, observations, tol=1e-6, max_iter=100):
-        T = len(observations)
-
-        for i in range(max_iter):
-            alpha = self.forward(observations)
-            beta = self.backward(observations)
-            gamma = self.compute_gamma(observations, alpha, beta)
-            xi = self.compute_xi(observations, alpha, beta)
-
-            # Update A
-            self.A = np.sum(xi, axis=0) / np.sum(gamma[:-1], axis=0).reshape(-1, 1)
-
-            # Update B
-            gamma_sum = np.sum(gamma, axis=0)
-            for j in range(self.M):
-                self.B[:, j] = np.sum(gamma[observations == j], axis=0) / gamma_sum
-
-            # Update pi
-            self.pi = gamma[0] / np.sum(gamma[0])
-
-            # Check for convergence
-            if np.max(np.abs(alpha - beta)) < tol:
-                break
-
-    def viterbi(self, observations):
-        T = len(observations)
-        delta = np.zeros((T, self.N))
-        phi = np.zeros((T, self.N))
-
-        # Initialization
-        delta[0] = self.pi * self.B[:, observations[0]]
-
-        # Recursion
-        for t in range(1, T):
-            for j in range(self.N):
-                delta[t, j] = np.max(delta[t-1] * self.A[:, j]) * self.B[j, observations[t]]
-                phi[t, j] = np.argmax(delta[t-1] * self
- 
-        best_path = list()
-
-https://en.wikipedia.org/wiki/Viterbi_algorithm#:~:text=The%20Viterbi%20algorithm%20is%20a,hidden%20Markov%20models%20(HMM).
-
+        # xi[t]_ij is proportional to alpha[t]_i * A_ij * B_j(o[t+1]) * beta[t+1]_j;
+        # normalised at each step, so alpha and beta may be scaled or not
+        right = self.B[:, observations[1:]].T * beta[1:]
+        xi = alpha[:-1, :, None] * self.A * right[:, None, :]
+        return xi / xi.sum(axis=(1, 2), keepdims=True)
+
+    def train(self, sequences, tol=1e-6, max_iter=100, processes=1, checkpoint=None, resume=False):
+        """
+        Baum-Welch over a corpus (see training.py); a single 1-D array of symbols
+        is treated as a corpus of one sequence.  Returns the log-likelihood history.
+        """
+        if isinstance(sequences, np.ndarray) and sequences.ndim == 1:
+            sequences = [sequences]
+        result = baum_welch(self.A, self.B, self.pi, sequences,
+                            max_iter=max_iter, tol=tol, processes=processes,
+                            checkpoint=checkpoint, resume=resume)
+        self.A, self.B, self.pi = result.A, result.B, result.pi
+        return result.log_likelihoods
+
+    def viterbi(self, observations: np.ndarray):
+        """Returns the most probable state path and its log-probability (see viterbi.py)."""
+        return viterbi_log(self.A, self.B, self.pi, observations)
+
+
+# https://en.wikipedia.org/wiki/Viterbi_algorithm#:~:text=The%20Viterbi%20algorithm%20is%20a,hidden%20Markov%20models%20(HMM).
+# Dictionary-based reference version, O(T * N^2) in pure Python; use for small examples only.
 
 def viterbi(obs, states, start_p, trans_p, emit_p):
     V = [{}]
@@ -127,9 +92,6 @@ def viterbi(obs, states, start_p, trans_p, emit_p):
             max_prob = max_tr_prob
             V[t] [st] = {"prob": max_prob, "prev": prev_st_selected}
 
-    for line in dptable(V):
-        print(line)
-
     opt = []
     max_prob = 0.0
     best_st = None
@@ -146,7 +108,7 @@ def viterbi(obs, states, start_p, trans_p, emit_p):
         opt.insert(0, V[t + 1] [previous] ["prev"])
         previous = V[t + 1] [previous] ["prev"]
 
-    print ("The steps of states are " + " ".join(opt) + " with highest probability of %s" % max_prob)
+    return opt, max_prob
 
 def dptable(V):
     # Print a table of steps from dictionary
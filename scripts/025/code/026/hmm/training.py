@@ -0,0 +1,137 @@
+# Baum-Welch re-estimation over a corpus of sequences.
+#
+# E-step: engine.expected_statistics over shards of the corpus, optionally in a
+# process pool.  The corpus is sent to each worker once, when the pool starts;
+# each iteration only ships the current (A, B, pi) and the shard indices.
+# M-step: normalise the summed expected counts.
+#
+# Training stops when the total log-likelihood improves by less than
+# tol * |log-likelihood|.
+
+import multiprocessing
+import os
+from typing import Callable, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from engine import Statistics, expected_statistics_chunked
+
+
+class TrainingResult(NamedTuple):
+    A: np.ndarray
+    B: np.ndarray
+    pi: np.ndarray
+    log_likelihoods: List[float]  # total corpus log-likelihood before each M-step
+    converged: bool
+
+
+_corpus = None  # the worker's copy of the sequences, set by _init_worker
+
+
+def _init_worker(sequences: List[np.ndarray]) -> None:
+    global _corpus
+    _corpus = sequences
+
+
+def _shard_statistics(args: Tuple[np.ndarray, np.ndarray, np.ndarray, Sequence[int], int]) -> Statistics:
+    A, B, pi, shard, batch_size = args
+    return expected_statistics_chunked(A, B, pi, [_corpus[s] for s in shard], batch_size)
+
+
+def _normalise(counts: np.ndarray, fallback: np.ndarray) -> np.ndarray:
+    # Rows with no expected counts (unvisited states) keep their previous values.
+    totals = counts.sum(axis=-1, keepdims=True)
+    return np.where(totals > 0, counts / np.where(totals > 0, totals, 1.0), fallback)
+
+
+def maximisation(stats: Statistics,
+                 A: np.ndarray,
+                 B: np.ndarray,
+                 pi: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """M-step: new (A, B, pi) from the expected counts of a whole corpus."""
+    return (_normalise(stats.transitions, A),
+            _normalise(stats.emissions, B),
+            _normalise(stats.initial, pi))
+
+
+def save_checkpoint(path: str,
+                    A: np.ndarray,
+                    B: np.ndarray,
+                    pi: np.ndarray,
+                    log_likelihoods: Sequence[float]) -> None:
+    """Writes the parameters and the log-likelihood history; the file is replaced atomically."""
+    tmp = path + '.tmp.npz'
+    np.savez(tmp, A=A, B=B, pi=pi, log_likelihoods=np.asarray(log_likelihoods, dtype=float))
+    os.replace(tmp, path)
+
+
+def load_checkpoint(path: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray, List[float]]:
+    with np.load(path) as data:
+        return data['A'], data['B'], data['pi'], data['log_likelihoods'].tolist()
+
+
+def baum_welch(A: np.ndarray,
+               B: np.ndarray,
+               pi: np.ndarray,
+               sequences: Sequence[Sequence[int]],
+               max_iter: int = 100,
+               tol: float = 1e-6,
+               processes: int = 1,
+               shard_size: int = 256,
+               batch_size: int = 64,
+               checkpoint: Optional[str] = None,
+               resume: bool = False,
+               callback: Optional[Callable[[int, float], None]] = None) -> TrainingResult:
+    """
+    Trains (A, B, pi) on all ``sequences``.
+
+    processes > 1 runs the E-step of each shard of ``shard_size`` sequences in
+    a multiprocessing pool.  If ``checkpoint`` is given the parameters are saved
+    there after every iteration, and with ``resume`` training restarts from it
+    when it exists.  ``callback(iteration, log_likelihood)`` is called once per
+    iteration.
+    """
+    sequences = [np.asarray(s, dtype=np.int64) for s in sequences]
+    if not sequences:
+        raise ValueError("empty training corpus")
+    A, B, pi = (np.array(x, dtype=float) for x in (A, B, pi))
+    history = []
+    if checkpoint is not None and resume and os.path.exists(checkpoint):
+        A, B, pi, history = load_checkpoint(checkpoint)
+
+    # Deal the sequences, longest first, round-robin into shards of similar total length.
+    order = sorted(range(len(sequences)), key=lambda s: -len(sequences[s]))
+    num_shards = max(1, -(-len(order) // shard_size))
+    shards = [shard for shard in (order[k::num_shards] for k in range(num_shards)) if shard]
+
+    pool = multiprocessing.Pool(processes, _init_worker, (sequences,)) if processes > 1 else None
+    if pool is None:
+        _init_worker(sequences)
+    converged = False
+    try:
+        for iteration in range(len(history), max_iter):
+            tasks = [(A, B, pi, shard, batch_size) for shard in shards]
+            parts = pool.map(_shard_statistics, tasks) if pool else [_shard_statistics(t) for t in tasks]
+            stats = parts[0]
+            for part in parts[1:]:
+                stats = stats + part
+            log_likelihood = float(stats.log_likelihood.sum())
+            history.append(log_likelihood)
+            if callback is not None:
+                callback(iteration, log_likelihood)
+
+            A, B, pi = maximisation(stats, A, B, pi)
+            if checkpoint is not None:
+                save_checkpoint(checkpoint, A, B, pi, history)
+
+            if len(history) > 1 and history[-1] - history[-2] < tol * abs(history[-1]):
+                converged = True
+                break
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+        else:
+            _init_worker(None)
+
+    return TrainingResult(A, B, pi, history, converged)
@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+
+from training import baum_welch
+
+
+def random_model(rng, N=3, M=4):
+    A = rng.random((N, N))
+    B = rng.random((N, M))
+    pi = rng.random(N)
+    return A / A.sum(axis=1, keepdims=True), B / B.sum(axis=1, keepdims=True), pi / pi.sum()
+
+
+def test_empty_corpus():
+    A, B, pi = random_model(np.random.default_rng(0))
+    with pytest.raises(ValueError, match="empty training corpus"):
+        baum_welch(A, B, pi, [])
+
+
+def test_log_likelihood_does_not_decrease():
+    rng = np.random.default_rng(0)
+    A, B, pi = random_model(rng)
+    sequences = [rng.integers(0, 4, rng.integers(5, 50)) for _ in range(20)]
+    result = baum_welch(A, B, pi, sequences, max_iter=10, tol=0)
+    assert len(result.log_likelihoods) == 10
+    assert np.all(np.diff(result.log_likelihoods) >= -1e-9)
+    assert np.allclose(result.A.sum(axis=1), 1) and np.allclose(result.B.sum(axis=1), 1)
+
+
+if __name__ == '__main__':
+    test_empty_corpus()
+    test_log_likelihood_does_not_decrease()
+    print('ok')
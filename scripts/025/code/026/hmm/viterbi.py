@@ -0,0 +1,189 @@
+# Log-space Viterbi decoding for discrete HMMs.
+#
+# https://en.wikipedia.org/wiki/Viterbi_algorithm
+#
+# delta[t]_j = max_i (delta[t-1]_i + log A_ij) + log B_j(o[t])
+# psi[t]_j   = argmax_i (delta[t-1]_i + log A_ij)
+#
+# Each step is one (N, N) broadcast and a column argmax instead of a Python
+# loop over the states.  Backpointers are stored in the smallest integer type
+# that holds a state index.
+
+from collections import deque
+from typing import List, Tuple
+
+import numpy as np
+
+
+def _log(p: np.ndarray) -> np.ndarray:
+    with np.errstate(divide='ignore'):
+        return np.log(p)
+
+
+def _index_dtype(N: int) -> np.dtype:
+    return np.min_scalar_type(max(N - 1, 0))
+
+
+def viterbi_log(A: np.ndarray,
+                B: np.ndarray,
+                pi: np.ndarray,
+                observations: np.ndarray) -> Tuple[np.ndarray, float]:
+    """Returns the most probable state path of one sequence and its log-probability."""
+    observations = np.asarray(observations)
+    T = len(observations)
+    N = A.shape[0]
+    if T == 0:
+        return np.zeros(0, dtype=np.int64), 0.0
+    log_A = _log(A)
+    log_BT = _log(B.T)  # (M, N)
+    psi = np.empty((T, N), dtype=_index_dtype(N))
+    columns = np.arange(N)
+
+    # Initialization
+    delta = _log(pi) + log_BT[observations[0]]
+
+    # Recursion
+    for t in range(1, T):
+        scores = delta[:, None] + log_A
+        psi[t] = scores.argmax(axis=0)
+        delta = scores[psi[t], columns] + log_BT[observations[t]]
+
+    # Backtracking
+    path = np.empty(T, dtype=np.int64)
+    path[T - 1] = delta.argmax()
+    for t in range(T - 1, 0, -1):
+        path[t - 1] = psi[t, path[t]]
+
+    return path, float(delta[path[T - 1]])
+
+
+def viterbi_batch(A: np.ndarray,
+                  B: np.ndarray,
+                  pi: np.ndarray,
+                  observations: np.ndarray,
+                  lengths: np.ndarray = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Decodes S sequences at once.  observations is time-major (T, S), padded
+    as by engine.pad_sequences; returns the paths (T, S), -1 on padding, and
+    the log-probability of each path (S,).
+    """
+    observations = np.asarray(observations)
+    if observations.ndim == 1:
+        observations = observations[:, None]
+    T, S = observations.shape
+    N = A.shape[0]
+    lengths = np.full(S, T, dtype=np.int64) if lengths is None else np.asarray(lengths)
+    paths = np.full((T, S), -1, dtype=np.int64)
+    if T == 0:
+        return paths, np.zeros(S)
+    log_A = _log(A)
+    log_BT = _log(B.T)
+    psi = np.empty((T, S, N), dtype=_index_dtype(N))
+    columns = np.arange(N)
+    rows = np.arange(S)[:, None]
+
+    # Initialization
+    delta = _log(pi) + log_BT[observations[0]]  # (S, N)
+
+    # Recursion; once a sequence has ended its delta is carried unchanged and its
+    # backpointers are the identity, so backtracking from T - 1 passes through.
+    for t in range(1, T):
+        scores = delta[:, :, None] + log_A  # (S, N, N)
+        best = scores.argmax(axis=1)
+        step = scores[rows, best, columns] + log_BT[observations[t]]
+        active = (t < lengths)[:, None]
+        psi[t] = np.where(active, best, columns)
+        delta = np.where(active, step, delta)
+
+    # Backtracking
+    state = delta.argmax(axis=1)
+    log_probs = delta[np.arange(S), state]
+    paths[T - 1] = state
+    for t in range(T - 1, 0, -1):
+        state = psi[t, np.arange(S), state]
+        paths[t - 1] = state
+    paths[np.arange(T)[:, None] >= lengths[None, :]] = -1
+
+    return paths, np.where(lengths > 0, log_probs, 0.0)
+
+
+class StreamingViterbi:
+    """
+    Fixed-lag online Viterbi decoder.
+
+    push() consumes one observation and, once ``lag`` observations are past,
+    returns the decision for the state ``lag`` steps back, obtained by tracing
+    back from the currently most probable state.  Only the last ``lag`` rows of
+    backpointers are kept, so memory is O(lag * N) however long the stream is.
+
+    Decisions are final once emitted; with a small lag they may differ from the
+    offline Viterbi path (and need not form a path the model allows), converging
+    to it as the lag grows.
+    """
+
+    def __init__(self, A: np.ndarray, B: np.ndarray, pi: np.ndarray, lag: int = 32):
+        if lag < 1:
+            raise ValueError('lag must be at least 1')
+        self.log_A = _log(A)
+        self.log_BT = _log(B.T)
+        self.log_pi = _log(pi)
+        self.lag = lag
+        self.N = A.shape[0]
+        self.columns = np.arange(self.N)
+        self.reset()
+
+    def reset(self) -> None:
+        self.t = -1  # time of the last observation pushed
+        self.delta = None
+        self.offset = 0.0  # delta is kept normalised to max 0; offset accumulates the maxima
+        self.psi = deque(maxlen=self.lag)
+
+    def _normalise(self, delta: np.ndarray) -> np.ndarray:
+        top = delta.max()
+        self.offset += top
+        return delta - top
+
+    def push(self, symbol: int) -> List[Tuple[int, int]]:
+        """Consumes one observation; returns [(t, state)] decided by it (zero or one entries)."""
+        self.t += 1
+        if self.delta is None:
+            self.delta = self._normalise(self.log_pi + self.log_BT[symbol])
+            return []
+
+        scores = self.delta[:, None] + self.log_A
+        best = scores.argmax(axis=0)
+        decided = []
+        if len(self.psi) == self.lag:
+            # The oldest backpointer row is about to be dropped: decide its predecessor.
+            state = self.delta.argmax()
+            for row in reversed(self.psi):
+                state = row[state]
+            decided.append((self.t - 1 - self.lag, int(state)))
+        self.psi.append(best.astype(_index_dtype(self.N)))
+        self.delta = self._normalise(scores[best, self.columns] + self.log_BT[symbol])
+        return decided
+
+    def flush(self) -> List[Tuple[int, int]]:
+        """Decides all pending states by tracing back from the most probable final state."""
+        if self.delta is None:
+            return []
+        state = int(self.delta.argmax())
+        decided = [(self.t, state)]
+        for k, row in enumerate(reversed(self.psi)):
+            state = int(row[state])
+            decided.append((self.t - 1 - k, state))
+        decided.reverse()
+        self.reset()
+        return decided
+
+    def log_probability(self) -> float:
+        """Log-probability of the most probable path over the observations seen so far."""
+        return self.offset + float(self.delta.max()) if self.delta is not None else 0.0
+
+    def decode(self, observations) -> np.ndarray:
+        """Runs the whole stream through the decoder; returns the decided states in order."""
+        path = []
+        for symbol in observations:
+            path.extend(state for t, state in self.push(symbol))
+        path.extend(state for t, state in self.flush())
+        return np.array(path, dtype=np.int64)
@@ -0,0 +1,83 @@
+# Throughput of the Huffman codec, in MB/s of uncompressed data.
+#
+#   python benchmark_codec.py                # synthetic log file
+#   python benchmark_codec.py some/file.log  # any files
+#
+# The string-based encode_huffman_text/decode_huffman_text of huffman_tree.py
+# are timed on a small prefix for comparison.
+
+import argparse
+import io
+import random
+import time
+
+from huffman_codec import compress, decode_stream, encode_stream
+from huffman_tree import build_huffman_tree, decode_huffman_text, encode_huffman_text
+
+
+def synthetic_log(size: int, seed: int = 0) -> bytes:
+    rng = random.Random(seed)
+    levels = ['INFO', 'INFO', 'INFO', 'DEBUG', 'WARNING', 'ERROR']
+    modules = ['server', 'db.pool', 'auth', 'cache', 'scheduler', 'http.client']
+    messages = ['request served in {} ms', 'connection {} opened', 'cache miss for key {}',
+                'retrying job {} after timeout', 'user {} logged in', 'queue length {}']
+    lines = []
+    total = 0
+    while total < size:
+        line = (f'2023-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} '
+                f'{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:{rng.randint(0, 59):02d} '
+                f'{rng.choice(levels):7s} {rng.choice(modules)}: '
+                f'{rng.choice(messages).format(rng.randint(0, 99999))}\n')
+        lines.append(line)
+        total += len(line)
+    return ''.join(lines).encode('ascii')[:size]
+
+
+def throughput(size: int, seconds: float) -> float:
+    return size / seconds / 1e6
+
+
+def bench(name: str, data: bytes, chunk_size: int, text_prefix: int) -> None:
+    t0 = time.perf_counter()
+    compressed = io.BytesIO()
+    encode_stream(io.BytesIO(data), compressed, chunk_size)
+    t1 = time.perf_counter()
+    restored = io.BytesIO()
+    decode_stream(io.BytesIO(compressed.getvalue()), restored)
+    t2 = time.perf_counter()
+    assert restored.getvalue() == data
+
+    size = len(compressed.getvalue())
+    print(f'{name}: {len(data)} bytes -> {size} bytes ({size / max(len(data), 1):.1%})')
+    print(f'  codec  encode {throughput(len(data), t1 - t0):8.2f} MB/s   decode {throughput(len(data), t2 - t1):8.2f} MB/s')
+
+    text = data[:text_prefix].decode('latin-1')
+    tree = build_huffman_tree(text)
+    t0 = time.perf_counter()
+    encoded = encode_huffman_text(text, tree)
+    t1 = time.perf_counter()
+    decode_huffman_text(encoded, tree)
+    t2 = time.perf_counter()
+    print(f'  string encode {throughput(len(text), t1 - t0):8.2f} MB/s   decode {throughput(len(text), t2 - t1):8.2f} MB/s'
+          f'   ({len(text)} byte prefix, {len(encoded)} bytes of bit characters)')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('files', nargs='*')
+    parser.add_argument('--size', type=int, default=8 << 20, help='size of the synthetic log')
+    parser.add_argument('--chunk-size', type=int, default=1 << 20)
+    parser.add_argument('--text-prefix', type=int, default=200000)
+    args = parser.parse_args()
+
+    if args.files:
+        for filename in args.files:
+            with open(filename, 'rb') as f:
+                bench(filename, f.read(), args.chunk_size, args.text_prefix)
+    else:
+        bench('synthetic log', synthetic_log(args.size), args.chunk_size, args.text_prefix)
+    assert compress(b'') and compress(b'a')
+
+
+if __name__ == '__main__':
+    main()
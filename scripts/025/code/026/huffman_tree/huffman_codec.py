@@ -0,0 +1,280 @@
+# Canonical Huffman codec over bytes, with packed output and table-driven decoding.
+#
+# https://en.wikipedia.org/wiki/Canonical_Huffman_code
+#
+# Only the code length of each of the 256 byte values is stored; the codes are
+# rebuilt canonically (shorter codes first, then by symbol value).  Lengths are
+# limited to MAX_CODE_LENGTH bits, so the decoder can look up the next
+# TABLE_BITS >= MAX_CODE_LENGTH bits of the stream in one table, whose entries
+# hold every whole code in those bits (several symbols per lookup).
+#
+# Stream format:
+#   MAGIC, 256 code lengths (one byte each),
+#   then blocks of: symbol count (u32), payload size (u32), payload
+#   and a final block with symbol count 0.
+# Each block is padded to a whole byte, so blocks decode independently and a
+# stream can be written and read one chunk at a time.
+
+import io
+import struct
+from heapq import heapify, heappop, heappush
+from typing import BinaryIO, Iterable, Iterator, List, Tuple
+
+import numpy as np
+
+MAGIC = b'HUF1'
+MAX_CODE_LENGTH = 15
+CHUNK_SIZE = 1 << 20
+TABLE_BITS = 16  # bits looked up per step by the decoder; at least MAX_CODE_LENGTH
+
+_block_header = struct.Struct('<II')
+
+
+class HuffmanError(Exception):
+    pass
+
+
+def count_symbols(data: bytes) -> np.ndarray:
+    return np.bincount(np.frombuffer(data, dtype=np.uint8), minlength=256)
+
+
+def code_lengths(counts: Iterable[int], max_length: int = MAX_CODE_LENGTH) -> np.ndarray:
+    """
+    Huffman code length of each byte value; 0 for bytes that do not occur.
+    If the tree is deeper than max_length the counts are halved and the tree rebuilt.
+    """
+    counts = np.asarray(counts, dtype=np.int64)
+    lengths = np.zeros(256, dtype=np.uint8)
+    symbols = np.flatnonzero(counts)
+    if len(symbols) == 1:
+        lengths[symbols[0]] = 1
+        return lengths
+
+    while len(symbols) > 1:
+        # Heap entries are (frequency, tie breaker, symbols below the node)
+        heap = [(int(counts[s]), int(s), [int(s)]) for s in symbols]
+        heapify(heap)
+        depth = np.zeros(256, dtype=np.int64)
+        while len(heap) > 1:
+            f1, t1, s1 = heappop(heap)
+            f2, t2, s2 = heappop(heap)
+            for s in s1:
+                depth[s] += 1
+            for s in s2:
+                depth[s] += 1
+            heappush(heap, (f1 + f2, min(t1, t2), s1 + s2))
+        if depth.max() <= max_length:
+            lengths[:] = depth
+            break
+        counts = np.where(counts > 0, np.maximum(counts >> 1, 1), 0)
+
+    return lengths
+
+
+def canonical_codes(lengths: np.ndarray) -> np.ndarray:
+    """Canonical code of each byte value, as an integer of lengths[value] bits."""
+    codes = np.zeros(256, dtype=np.uint32)
+    code = 0
+    previous = 0
+    for length, symbol in sorted((int(l), s) for s, l in enumerate(lengths) if l > 0):
+        code <<= length - previous
+        codes[symbol] = code
+        code += 1
+        previous = length
+    if previous and code > (1 << previous):
+        raise HuffmanError('code lengths do not form a prefix code')
+    return codes
+
+
+def decode_table(lengths: np.ndarray) -> Tuple[np.ndarray, np.ndarray, int]:
+    """
+    Tables indexed by the next `width` bits of the stream: the symbol whose code
+    starts those bits and the length of that code.
+    """
+    width = max(int(lengths.max()), 1)
+    codes = canonical_codes(lengths)
+    symbols = np.zeros(1 << width, dtype=np.uint8)
+    sizes = np.zeros(1 << width, dtype=np.int64)  # 0 marks a bit pattern no code starts with
+    for s in np.flatnonzero(lengths):
+        shift = width - int(lengths[s])
+        start = int(codes[s]) << shift
+        symbols[start:start + (1 << shift)] = s
+        sizes[start:start + (1 << shift)] = lengths[s]
+    return symbols, sizes, width
+
+
+def multi_symbol_table(lengths: np.ndarray, width: int = TABLE_BITS) -> Tuple[List[bytes], List[int]]:
+    """
+    For every pattern of the next `width` bits: all the whole codes it contains,
+    decoded, and the number of bits they take.  width must be at least the
+    longest code, so every entry holds at least one symbol.
+    """
+    symbols, sizes, code_width = decode_table(lengths)
+    patterns = np.arange(1 << width, dtype=np.int64)
+    used = np.zeros(1 << width, dtype=np.int64)
+    decoded = np.zeros((1 << width, width), dtype=np.uint8)
+    count = np.zeros(1 << width, dtype=np.int64)
+    for k in range(width):
+        peek = ((patterns << used) & ((1 << width) - 1)) >> (width - code_width)
+        size = sizes[peek]
+        fits = (size > 0) & (used + size <= width)
+        if not fits.any():
+            break
+        decoded[fits, k] = symbols[peek[fits]]
+        count += fits
+        used += np.where(fits, size, 0)
+    return [row[:n].tobytes() for row, n in zip(decoded, count.tolist())], used.tolist()
+
+
+class HuffmanCodec:
+    def __init__(self, lengths: np.ndarray) -> None:
+        self.lengths = np.asarray(lengths, dtype=np.uint8)
+        if self.lengths.shape != (256,) or self.lengths.max() > 16:
+            raise HuffmanError('expected 256 code lengths of at most 16 bits')
+        self.codes = canonical_codes(self.lengths)
+        self._table_symbols, self._table_sizes = multi_symbol_table(self.lengths)
+        self._table_counts = [len(symbols) for symbols in self._table_symbols]
+
+    @staticmethod
+    def from_data(data: bytes) -> 'HuffmanCodec':
+        return HuffmanCodec(code_lengths(count_symbols(data)))
+
+    def code_dict(self) -> dict:
+        return dict((int(s), format(int(self.codes[s]), f'0{self.lengths[s]}b')) for s in np.flatnonzero(self.lengths))
+
+    def encode_block(self, data: bytes) -> bytes:
+        """Packs the codes of data into bytes, most significant bit first, zero padded."""
+        if len(data) == 0:
+            return b''
+        # 32-bit arithmetic while the bit offsets fit, it is faster
+        dtype = np.int32 if len(data) * 16 < 1 << 31 else np.int64
+        symbols = np.frombuffer(data, dtype=np.uint8)
+        lengths = self.lengths.astype(dtype)[symbols]
+        if not lengths.all():
+            raise HuffmanError('data contains a byte with no code')
+        # Bit offset of each code.  A code of at most 15 bits starting at bit
+        # (offset & 7) of its first byte fits in 3 bytes: shift it into place
+        # in a 24-bit window and sum the windows of the codes starting in each
+        # byte (codes do not overlap, so adding their bits is the same as
+        # or-ing them; the sums stay below 2**24, exact as float64 weights).
+        # Byte i of the output is then made of the sums of bytes i, i-1, i-2.
+        ends = np.cumsum(lengths, dtype=dtype)
+        offsets = ends - lengths
+        n_bytes = (int(ends[-1]) + 7) // 8
+        window = self.codes.astype(dtype)[symbols] << (24 - (offsets & 7) - lengths)
+        sums = np.bincount(offsets >> 3, weights=window, minlength=n_bytes).astype(dtype)
+        out = sums >> 16
+        out[1:] += (sums[:-1] >> 8) & 0xff
+        out[2:] += sums[:-2] & 0xff
+        return out.astype(np.uint8).tobytes()
+
+    def decode_block(self, payload: bytes, count: int) -> bytes:
+        """Decodes count symbols from a payload produced by encode_block."""
+        if count == 0:
+            return b''
+        # words[i] holds bytes i..i+3, so any TABLE_BITS-bit window at bit p is
+        # (words[p >> 3] >> (32 - TABLE_BITS - (p & 7))) & mask
+        padded = np.zeros(len(payload) + 4, dtype=np.uint32)
+        padded[:len(payload)] = np.frombuffer(payload, dtype=np.uint8)
+        words = ((padded[:-3] << 24) | (padded[1:-2] << 16) | (padded[2:-1] << 8) | padded[3:]).tolist()
+
+        table_symbols = self._table_symbols
+        table_sizes = self._table_sizes
+        table_counts = self._table_counts
+        shift = 32 - TABLE_BITS
+        mask = (1 << TABLE_BITS) - 1
+        n_bits = len(payload) * 8
+        out = []
+        append = out.append
+        p = 0
+        n = 0
+        while n < count:
+            if p >= n_bits:
+                raise HuffmanError('payload ends before all symbols are decoded')
+            pattern = (words[p >> 3] >> (shift - (p & 7))) & mask
+            size = table_sizes[pattern]
+            if size == 0:
+                # corrupt payload, or lengths that leave some codes unused
+                raise HuffmanError(f'no code matches the bits at offset {p}')
+            append(table_symbols[pattern])
+            n += table_counts[pattern]
+            p += size
+
+        # The last lookup may decode symbols past count from the zero padding
+        return b''.join(out)[:count]
+
+    def write_header(self, dst: BinaryIO) -> None:
+        dst.write(MAGIC)
+        dst.write(self.lengths.tobytes())
+
+    @staticmethod
+    def read_header(src: BinaryIO) -> 'HuffmanCodec':
+        if src.read(len(MAGIC)) != MAGIC:
+            raise HuffmanError('not a Huffman stream')
+        lengths = src.read(256)
+        if len(lengths) != 256:
+            raise HuffmanError('truncated header')
+        return HuffmanCodec(np.frombuffer(lengths, dtype=np.uint8))
+
+    def write_block(self, dst: BinaryIO, data: bytes) -> None:
+        payload = self.encode_block(data)
+        dst.write(_block_header.pack(len(data), len(payload)))
+        dst.write(payload)
+
+    def read_blocks(self, src: BinaryIO) -> Iterator[bytes]:
+        while True:
+            header = src.read(_block_header.size)
+            if len(header) != _block_header.size:
+                raise HuffmanError('truncated stream')
+            count, size = _block_header.unpack(header)
+            if count == 0:
+                return
+            payload = src.read(size)
+            if len(payload) != size:
+                raise HuffmanError('truncated block')
+            yield self.decode_block(payload, count)
+
+
+def _chunks(src: BinaryIO, chunk_size: int) -> Iterator[bytes]:
+    while True:
+        chunk = src.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+def encode_stream(src: BinaryIO, dst: BinaryIO, chunk_size: int = CHUNK_SIZE) -> HuffmanCodec:
+    """
+    Compresses src into dst chunk by chunk.  src must be seekable: a first pass
+    counts the bytes to build the code, a second one encodes.
+    """
+    start = src.tell()
+    counts = np.zeros(256, dtype=np.int64)
+    for chunk in _chunks(src, chunk_size):
+        counts += count_symbols(chunk)
+    src.seek(start)
+
+    codec = HuffmanCodec(code_lengths(counts))
+    codec.write_header(dst)
+    for chunk in _chunks(src, chunk_size):
+        codec.write_block(dst, chunk)
+    dst.write(_block_header.pack(0, 0))
+    return codec
+
+
+def decode_stream(src: BinaryIO, dst: BinaryIO) -> None:
+    codec = HuffmanCodec.read_header(src)
+    for block in codec.read_blocks(src):
+        dst.write(block)
+
+
+def compress(data: bytes, chunk_size: int = CHUNK_SIZE) -> bytes:
+    dst = io.BytesIO()
+    encode_stream(io.BytesIO(data), dst, chunk_size)
+    return dst.getvalue()
+
+
+def decompress(data: bytes) -> bytes:
+    dst = io.BytesIO()
+    decode_stream(io.BytesIO(data), dst)
+    return dst.getvalue()
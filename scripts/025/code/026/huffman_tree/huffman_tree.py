@@ -65,16 +65,13 @@ def encode_huffman_text(text, huffman_tree):
     traverse(huffman_tree)
 
     # Encode the text using the Huffman codes
-    encoded_text = ""
-    for char in text:
-        encoded_text += code_dict[char]
-
-    return encoded_text
+    # (one character per bit; see huffman_codec.py for packed output)
+    return "".join(code_dict[char] for char in text)
 
 
 def decode_huffman_text(encoded_text, huffman_tree):
     # Decode the text using the Huffman codes
-    decoded_text = ""
+    decoded_chars = []
     node = huffman_tree
 
     for bit in encoded_text:
@@ -84,8 +81,8 @@ def decode_huffman_text(encoded_text, huffman_tree):
             node = node.right
 
         if node.char:
-            decoded_text += node.char
+            decoded_chars.append(node.char)
             node = huffman_tree
 
-    return decoded_text
+    return "".join(decoded_chars)
  
@@ -1,35 +1,45 @@
 # https://ai-boson.github.io/mcts/
+#
+# The state must provide get_legal_actions(), move(action), is_game_over()
+# and game_result() (1 for a win, -1 for a loss, anything else for a draw).
+
+import time
 
 import numpy as np
-from collections import defaultdict
 
 class MonteCarloTreeSearchNode:
+    __slots__ = ('state', 'parent', 'parent_action', 'children',
+                 '_number_of_visits', '_wins', '_losses', '_untried_actions')
+
     def __init__(self, state, parent=None, parent_action=None):
         self.state = state
         self.parent = parent
         self.parent_action = parent_action
         self.children = []
         self._number_of_visits = 0
-        self._results = defaultdict(int)
-        self._results[1] = 0
-        self._results[-1] = 0
-        self._untried_actions = self.state.get_legal_actions()
- 
+        self._wins = 0
+        self._losses = 0
+        self._untried_actions = None  # filled on first use, see untried_actions
+
+    @property
+    def untried_actions(self):
+        if self._untried_actions is None:
+            self._untried_actions = list(self.state.get_legal_actions())
+        return self._untried_actions
+
     def q(self):
-        wins = self._results[1]
-        loses = self._results[-1]
-        return wins - loses
+        return self._wins - self._losses
 
     def n(self):
         return self._number_of_visits
-    
+
     def expand(self):
-        action = self._untried_actions.pop()
+        action = self.untried_actions.pop()
         next_state = self.state.move(action)
         child_node = MonteCarloTreeSearchNode(
             next_state, parent=self, parent_action=action)
         self.children.append(child_node)
-        return child_node 
+        return child_node
 
     def is_terminal_node(self):
         return self.state.is_game_over()
@@ -41,15 +51,38 @@ class MonteCarloTreeSearchNode:
             action = self.rollout_policy(possible_moves)
             current_rollout_state = current_rollout_state.move(action)
         return current_rollout_state.game_result()
-    
+
     def backpropagate(self, result):
-        self._number_of_visits += 1.
-        self._results[result] += 1.
-        if self.parent:
-            self.parent.backpropagate(result)
+        # Iterative: deep games would exceed the recursion limit
+        node = self
+        while node is not None:
+            node._number_of_visits += 1
+            if result == 1:
+                node._wins += 1
+            elif result == -1:
+                node._losses += 1
+            node = node.parent
 
     def is_fully_expanded(self):
-        return len(self._untried_actions) == 0
+        return len(self.untried_actions) == 0
+
+    def best_child(self, c_param=0.1):
+        """
+        The child with the best UCT score.  Children never visited (created by
+        child()) are chosen first when exploring (c_param > 0), and only if no
+        child was visited otherwise.
+        """
+        if not self.children:
+            raise RuntimeError(f"best_child called on a node without children: {self.state}")
+        n = np.array([c.n() for c in self.children], dtype=float)
+        visited = n > 0
+        if not visited.all() and (c_param > 0 or not visited.any()):
+            return self.children[int(np.argmin(visited))]
+        q = np.array([c.q() for c in self.children], dtype=float)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            choices_weights = q / n + c_param * np.sqrt(2 * np.log(self.n()) / n)
+        choices_weights[~visited] = -np.inf
+        return self.children[int(np.argmax(choices_weights))]
 
     def rollout_policy(self, possible_moves):
         return possible_moves[np.random.randint(len(possible_moves))]
@@ -62,11 +95,49 @@ class MonteCarloTreeSearchNode:
             else:
                 current_node = current_node.best_child()
         return current_node
-    
-    def best_action(self):
-        simulation_no = 100
-        for i in range(simulation_no):
+
+    def best_action(self, simulation_no=None, time_limit=None):
+        """
+        Runs simulations from this node and returns the most promising child.
+        The budget is simulation_no simulations, time_limit seconds of wall
+        clock, or whichever comes first if both are given (100 simulations if
+        neither is).  At least one simulation is run.
+        """
+        if self.is_terminal_node():
+            raise RuntimeError(f"best_action called on a terminal state: {self.state}")
+        if simulation_no is None and time_limit is None:
+            simulation_no = 100
+        deadline = None if time_limit is None else time.perf_counter() + time_limit
+        i = 0
+        while i == 0 or simulation_no is None or i < simulation_no:
+            if i > 0 and deadline is not None and time.perf_counter() >= deadline:
+                break
             v = self._tree_policy()
             reward = v.rollout()
             v.backpropagate(reward)
+            i += 1
         return self.best_child(c_param=0.)
+
+    def child(self, action):
+        "The child reached by action, created if it has not been expanded yet"
+        for child_node in self.children:
+            if child_node.parent_action == action:
+                return child_node
+        untried = self.untried_actions
+        if action in untried:
+            untried.remove(action)
+        child_node = MonteCarloTreeSearchNode(self.state.move(action), parent=self, parent_action=action)
+        self.children.append(child_node)
+        return child_node
+
+    def advance(self, action):
+        """
+        Re-roots the tree on the move actually played: returns the child for
+        action, detached from this node so that the rest of the old tree can be
+        freed and the statistics gathered below the child are kept.
+        """
+        new_root = self.child(action)
+        new_root.parent = None
+        new_root.parent_action = None
+        self.children = []
+        return new_root
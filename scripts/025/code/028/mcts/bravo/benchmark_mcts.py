@@ -0,0 +1,66 @@
+"""
+Rollouts per second of the MCTS searchers on tic-tac-toe.
+
+    python benchmark_mcts.py [--rollouts 5000]
+
+"tree only" replaces the random playout by a constant reward, to time the
+select / expand / backpropagate part of the search on its own.  The last
+lines compare scalar random playouts with the batched bitboard playouts.
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+from bitboard import PlayoutMCTS, new_bitboard, random_playouts
+from mcts import MCTS
+from table_mcts import TableMCTS
+from tictactoe import new_tic_tac_toe_board
+
+
+def constant_reward(node):
+    return 0.5
+
+
+def rollouts_per_second(tree, rollouts, board=None):
+    board = new_tic_tac_toe_board() if board is None else board
+    start = time.perf_counter()
+    for _ in range(rollouts):
+        tree.do_rollout(board)
+    return rollouts / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rollouts", type=int, default=5000)
+    parser.add_argument("--playouts", type=int, default=64, help="playouts per PlayoutMCTS rollout")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for name, searcher in (("MCTS", MCTS), ("TableMCTS", TableMCTS)):
+        random.seed(args.seed)
+        full = rollouts_per_second(searcher(), args.rollouts)
+        tree = searcher()
+        tree._simulate = constant_reward
+        tree_only = rollouts_per_second(tree, args.rollouts)
+        print(f"{name:10s} {full:10.0f} rollouts/s   tree only {tree_only:10.0f} rollouts/s")
+
+    tree = PlayoutMCTS(playouts=args.playouts, seed=args.seed)
+    full = rollouts_per_second(tree, args.rollouts, new_bitboard())
+    print(f"PlayoutMCTS {full:9.0f} rollouts/s   ({args.playouts} bitboard playouts per rollout)")
+
+    board = new_tic_tac_toe_board()
+    start = time.perf_counter()
+    for _ in range(args.rollouts):
+        MCTS._simulate(None, board)
+    scalar = args.rollouts / (time.perf_counter() - start)
+    n = 100 * args.rollouts
+    start = time.perf_counter()
+    random_playouts(0, 0, True, n, np.random.default_rng(args.seed))
+    batched = n / (time.perf_counter() - start)
+    print(f"playouts from the empty board: scalar {scalar:.0f}/s   bitboard batch {batched:.0f}/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+Tic-tac-toe on bitboards, with random playouts simulated in batches in NumPy.
+
+A board is two 9-bit masks, one per player, with bit i for square i
+(indexed by row as in tictactoe.py).  Every question about a mask is answered
+by a table with one entry per possible mask (2**9 entries):
+
+    IS_WIN[mask]        mask contains a winning line
+    POPCOUNT[mask]      number of squares in mask
+    NTH_BIT[mask, k]    index of the k-th square of mask
+
+random_playouts plays n random games from the same position at once: each ply
+is a handful of table lookups over the n games still running.  PlayoutMCTS
+uses it as the `_simulate` hook of TableMCTS, averaging a batch of playouts
+per leaf; any Node class with a `random_playouts(n, rng)` method can be
+plugged in the same way.
+"""
+from collections import namedtuple
+from random import choice
+
+import numpy as np
+
+from mcts import Node
+from table_mcts import TableMCTS
+
+FULL = (1 << 9) - 1
+
+WIN_MASKS = tuple(
+    sum(1 << i for i in combo)
+    for combo in [(0, 1, 2), (3, 4, 5), (6, 7, 8),  # rows
+                  (0, 3, 6), (1, 4, 7), (2, 5, 8),  # columns
+                  (0, 4, 8), (2, 4, 6)]  # diagonals
+)
+
+_masks = np.arange(1 << 9)
+IS_WIN = np.zeros(1 << 9, dtype=bool)
+for _w in WIN_MASKS:
+    IS_WIN |= (_masks & _w) == _w
+POPCOUNT = np.array([bin(m).count("1") for m in range(1 << 9)], dtype=np.int64)
+NTH_BIT = np.zeros((1 << 9, 9), dtype=np.int64)
+for _m in range(1 << 9):
+    _bits = [i for i in range(9) if _m >> i & 1]
+    NTH_BIT[_m, :len(_bits)] = _bits
+_IS_WIN = IS_WIN.tolist()  # plain list for the scalar methods
+
+
+def random_playouts(x, o, x_to_move, n, rng=None):
+    """
+    Plays n random games from the position (x, o).  Returns an int array of
+    outcomes: 1 if X wins, -1 if O wins, 0 for a draw.
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    # `mover` holds the squares of the player about to move; swapped every ply
+    mover = np.full(n, x if x_to_move else o, dtype=np.int64)
+    other = np.full(n, o if x_to_move else x, dtype=np.int64)
+    outcome = np.zeros(n, dtype=np.int64)
+    sign = 1 if x_to_move else -1  # outcome if the player about to move wins
+
+    if _IS_WIN[x]:
+        outcome[:] = 1
+        return outcome
+    if _IS_WIN[o]:
+        outcome[:] = -1
+        return outcome
+
+    active = np.arange(n)
+    for _ in range(9):
+        empty = FULL & ~(mover[active] | other[active])
+        playing = POPCOUNT[empty] > 0
+        active, empty = active[playing], empty[playing]
+        if len(active) == 0:
+            break
+        k = (rng.random(len(active)) * POPCOUNT[empty]).astype(np.int64)
+        moved = mover[active] | (1 << NTH_BIT[empty, k])
+        mover[active] = moved
+        won = IS_WIN[moved]
+        outcome[active[won]] = sign
+        active = active[~won]
+        mover, other = other, mover
+        sign = -sign
+    return outcome
+
+
+_BB = namedtuple("BitboardTicTacToe", "x o turn")
+
+
+class BitboardTicTacToe(_BB, Node):
+    "Tic-tac-toe board as two 9-bit masks; turn is True when X is to move"
+
+    @property
+    def winner(board):
+        if _IS_WIN[board.x]:
+            return True
+        if _IS_WIN[board.o]:
+            return False
+        return None
+
+    @property
+    def terminal(board):
+        return _IS_WIN[board.x] or _IS_WIN[board.o] or (board.x | board.o) == FULL
+
+    def empty_squares(board):
+        empty = FULL & ~(board.x | board.o)
+        return [i for i in range(9) if empty >> i & 1]
+
+    def find_children(board):
+        if board.terminal:
+            return set()
+        return {board.make_move(i) for i in board.empty_squares()}
+
+    def find_random_child(board):
+        if board.terminal:
+            return None
+        return board.make_move(choice(board.empty_squares()))
+
+    def reward(board):
+        if not board.terminal:
+            raise RuntimeError(f"reward called on nonterminal board {board}")
+        winner = board.winner
+        if winner is board.turn:
+            raise RuntimeError(f"reward called on unreachable board {board}")
+        if winner is None:
+            return 0.5  # Board is a tie
+        return 0  # Your opponent has just won. Bad.
+
+    def is_terminal(board):
+        return board.terminal
+
+    def make_move(board, index):
+        if board.turn:
+            return BitboardTicTacToe(board.x | 1 << index, board.o, False)
+        return BitboardTicTacToe(board.x, board.o | 1 << index, True)
+
+    def random_playouts(board, n, rng=None):
+        "Rewards of n random games for the player who moved into this board"
+        outcome = random_playouts(board.x, board.o, board.turn, n, rng)
+        last_mover = -1 if board.turn else 1
+        return np.where(outcome == last_mover, 1.0, np.where(outcome == 0, 0.5, 0.0))
+
+    def to_pretty_string(board):
+        def to_char(i):
+            return "X" if board.x >> i & 1 else ("O" if board.o >> i & 1 else " ")
+        rows = [[to_char(3 * row + col) for col in range(3)] for row in range(3)]
+        return (
+            "\n  1 2 3\n"
+            + "\n".join(str(i + 1) + " " + " ".join(row) for i, row in enumerate(rows))
+            + "\n"
+        )
+
+    @staticmethod
+    def from_tuple_board(board):
+        "Converts a tictactoe.TicTacToeBoard"
+        x = sum(1 << i for i, v in enumerate(board.tup) if v is True)
+        o = sum(1 << i for i, v in enumerate(board.tup) if v is False)
+        return BitboardTicTacToe(x, o, board.turn)
+
+
+def new_bitboard():
+    return BitboardTicTacToe(x=0, o=0, turn=True)
+
+
+class PlayoutMCTS(TableMCTS):
+    "TableMCTS whose simulation step averages a batch of vectorized random playouts"
+
+    def __init__(self, exploration_weight=1, capacity=1 << 14, playouts=64, seed=None):
+        super().__init__(exploration_weight, capacity)
+        self.playouts = playouts
+        self.rng = np.random.default_rng(seed)
+
+    def _simulate(self, node):
+        if hasattr(node, "random_playouts"):
+            return float(node.random_playouts(self.playouts, self.rng).mean())
+        return super()._simulate(node)
@@ -0,0 +1,193 @@
+"""
+Parallel Monte Carlo tree search on top of TableMCTS.
+
+Root parallelism (RootParallelMCTS): every worker process grows its own tree
+from the same root with its own random seed; the visit counts and rewards of
+the root's children are summed over the trees and the move with the most
+visits is played.
+
+Tree parallelism (VirtualLossMCTS): one shared tree in the calling process.
+Each round selects a batch of leaves, adding a virtual loss (a visit with
+reward 0) along each selected path so that the following selections in the
+batch spread over different lines of play; the random playouts of the batch,
+the expensive part, then run in a process pool, and the real results replace
+the virtual losses.  (Python threads cannot run playouts in parallel, so the
+workers share the tree through the coordinating process instead of locks.)
+
+Both take a budget per move: a number of rollouts, a wall-clock time limit in
+seconds, or both (whichever runs out first).  Deadlines are time.monotonic()
+values, which are comparable between processes.
+"""
+import multiprocessing
+import random
+import time
+
+import numpy as np
+
+from table_mcts import TableMCTS
+
+# Seconds of a root-parallel time limit left for sending the workers' results back
+RESULT_MARGIN = 0.01
+
+
+def _out_of_budget(done, rollouts, deadline):
+    if rollouts is not None and done >= rollouts:
+        return True
+    return deadline is not None and time.monotonic() >= deadline
+
+
+def _check_budget(rollouts, time_limit):
+    if rollouts is None and time_limit is None:
+        raise ValueError("a rollout or time budget is required")
+
+
+_worker_searcher = None  # (searcher class, exploration weight) of the root-parallel workers
+_worker_simulate = None  # playout function of the tree-parallel workers
+
+
+def _init_root_worker(searcher, exploration_weight):
+    global _worker_searcher
+    _worker_searcher = (searcher, exploration_weight)
+
+
+def _init_playout_worker(simulate):
+    global _worker_simulate
+    _worker_simulate = simulate
+
+
+def _root_search(args):
+    root, rollouts, deadline, seed = args
+    random.seed(seed)
+    np.random.seed(seed % (1 << 32))
+    searcher, exploration_weight = _worker_searcher
+    tree = searcher(exploration_weight)
+    done = 0
+    while not _out_of_budget(done, rollouts, deadline):
+        tree.do_rollout(root)
+        done += 1
+    i = tree.ids[root]
+    children = tree.children[i]
+    if children is None:
+        return []
+    return [(tree.nodes[c], tree.N[c], tree.Q[c]) for c in children]
+
+
+def _simulate_leaf(node):
+    return _worker_simulate(node)
+
+
+class RootParallelMCTS:
+    "Independent trees in a process pool, merged at the root."
+
+    def __init__(self, processes=None, exploration_weight=1, searcher=TableMCTS, seed=None):
+        self.processes = processes or multiprocessing.cpu_count()
+        self.exploration_weight = exploration_weight
+        self.rng = random.Random(seed)
+        self.pool = multiprocessing.Pool(self.processes, _init_root_worker, (searcher, exploration_weight))
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def search(self, node, rollouts=None, time_limit=None):
+        """
+        Returns {child: (visits, total reward)} summed over the workers' trees.
+        rollouts is the total over all workers; time_limit bounds the whole call,
+        the workers stopping RESULT_MARGIN seconds before it to send their results.
+        """
+        _check_budget(rollouts, time_limit)
+        if node.is_terminal():
+            raise RuntimeError(f"search called on terminal node {node}")
+        # one deadline for all the workers, however late each of them starts
+        deadline = time.monotonic() + max(time_limit - RESULT_MARGIN, 0) if time_limit is not None else None
+        tasks = []
+        for k in range(self.processes):
+            share = None if rollouts is None else rollouts // self.processes + (k < rollouts % self.processes)
+            tasks.append((node, share, deadline, self.rng.getrandbits(63)))
+        stats = {}
+        for result in self.pool.map(_root_search, tasks, chunksize=1):
+            for child, n, q in result:
+                n0, q0 = stats.get(child, (0.0, 0.0))
+                stats[child] = (n0 + n, q0 + q)
+        return stats
+
+    def choose(self, node, rollouts=None, time_limit=None):
+        "Choose the successor of node visited most over all trees"
+        stats = self.search(node, rollouts, time_limit)
+        if not stats:
+            return node.find_random_child()
+        return max(stats, key=lambda child: stats[child][0])
+
+
+class VirtualLossMCTS(TableMCTS):
+    "Shared tree; batches of leaves selected under virtual loss, playouts in a process pool."
+
+    def __init__(self, exploration_weight=1, processes=None, batch_size=None, virtual_loss=1, capacity=1 << 14):
+        super().__init__(exploration_weight, capacity)
+        self.processes = processes or multiprocessing.cpu_count()
+        self.batch_size = batch_size or 4 * self.processes
+        self.virtual_loss = virtual_loss
+        self.pool = None
+        if self.processes > 1:
+            # the workers get a copy of this (still empty) searcher for its _simulate hook
+            self.pool = multiprocessing.Pool(self.processes, _init_playout_worker, (self._simulate,))
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __getstate__(self):
+        # the pool cannot be pickled, and the workers do not need it
+        state = self.__dict__.copy()
+        state["pool"] = None
+        return state
+
+    def search(self, node, rollouts=None, time_limit=None):
+        "Grows the shared tree from node until the budget runs out; returns the rollouts done"
+        _check_budget(rollouts, time_limit)
+        deadline = time.monotonic() + time_limit if time_limit is not None else None
+        root = self.intern(node)
+        done = 0
+        while not _out_of_budget(done, rollouts, deadline):
+            batch = self.batch_size if rollouts is None else min(self.batch_size, rollouts - done)
+            self._do_batch(root, batch)
+            done += batch
+        return done
+
+    def choose(self, node, rollouts=None, time_limit=None):
+        if rollouts is not None or time_limit is not None:
+            self.search(node, rollouts, time_limit)
+        return super().choose(node)
+
+    def _do_batch(self, root, batch):
+        paths = []
+        for _ in range(batch):
+            path = self._select(root)
+            leaf = path[-1]
+            self._expand(leaf)  # so that later selections in the batch see it as explored
+            np.add.at(self.N, np.array(path), self.virtual_loss)
+            paths.append(path)
+
+        leaves = [self.nodes[path[-1]] for path in paths]
+        if self.pool is not None:
+            rewards = self.pool.map(_simulate_leaf, leaves, chunksize=max(1, len(leaves) // self.processes))
+        else:
+            rewards = [self._simulate(leaf) for leaf in leaves]
+
+        for path, reward in zip(paths, rewards):
+            np.add.at(self.N, np.array(path), -self.virtual_loss)
+            self._backpropagate(path, reward)
@@ -0,0 +1,127 @@
+"""
+Monte Carlo tree search over a transposition table.
+
+Same search as MCTS in mcts.py (same Node interface, same select / expand /
+simulate / backpropagate steps), but every board state is interned once into
+an integer id, and the statistics live in arrays indexed by id:
+
+    Q[id], N[id]      total reward and visit count
+    children[id]      int array of child ids, None until expanded
+    cursor[id]        children[id][:cursor[id]] are all expanded
+
+Selection never hashes a board: it walks ids, finds the next unexplored child
+by advancing the cursor (children only ever become expanded, so the cursor
+never moves back) and scores all children of a node with one vectorized UCT
+expression.  Boards reached by different move orders share one id.
+"""
+import math
+
+import numpy as np
+
+
+class TableMCTS:
+    "Monte Carlo tree searcher over a transposition table. First rollout the tree then choose a move."
+
+    def __init__(self, exploration_weight=1, capacity=1 << 14):
+        self.exploration_weight = exploration_weight
+        self.ids = dict()  # board -> id
+        self.nodes = []  # id -> board
+        self.children = []  # id -> array of child ids, or None if not expanded
+        self.cursor = []  # id -> index of the first child that may be unexplored
+        self.Q = np.zeros(capacity)  # total reward of each node
+        self.N = np.zeros(capacity)  # total visit count for each node
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def intern(self, node):
+        "Returns the id of node, adding it to the table if needed"
+        i = self.ids.get(node)
+        if i is None:
+            i = len(self.nodes)
+            self.ids[node] = i
+            self.nodes.append(node)
+            self.children.append(None)
+            self.cursor.append(0)
+            if i == len(self.N):
+                self.Q = np.concatenate((self.Q, np.zeros(i)))
+                self.N = np.concatenate((self.N, np.zeros(i)))
+        return i
+
+    def choose(self, node):
+        "Choose the best successor of node. (Choose a move in the game)"
+        if node.is_terminal():
+            raise RuntimeError(f"choose called on terminal node {node}")
+
+        i = self.ids.get(node)
+        if i is None or self.children[i] is None:
+            return node.find_random_child()
+
+        children = self.children[i]
+        n = self.N[children]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            score = np.where(n > 0, self.Q[children] / n, -np.inf)  # avoid unseen moves
+        return self.nodes[children[score.argmax()]]
+
+    def do_rollout(self, node):
+        "Make the tree one layer better. (Train for one iteration.)"
+        path = self._select(self.intern(node))
+        leaf = path[-1]
+        self._expand(leaf)
+        reward = self._simulate(self.nodes[leaf])
+        self._backpropagate(path, reward)
+
+    def _select(self, i):
+        "Find an unexplored descendent of `i`; returns the path of ids"
+        path = []
+        while True:
+            path.append(i)
+            children = self.children[i]
+            if children is None or len(children) == 0:
+                # node is either unexplored or terminal
+                return path
+            unexplored = self._next_unexplored(i)
+            if unexplored is not None:
+                path.append(unexplored)
+                return path
+            i = self._uct_select(i)  # descend a layer deeper
+
+    def _next_unexplored(self, i):
+        children = self.children[i]
+        k = self.cursor[i]
+        while k < len(children) and self.children[children[k]] is not None:
+            k += 1
+        self.cursor[i] = k
+        return int(children[k]) if k < len(children) else None
+
+    def _expand(self, i):
+        "Set the children of `i`"
+        if self.children[i] is not None:
+            return  # already expanded
+        child_ids = [self.intern(n) for n in self.nodes[i].find_children()]
+        self.children[i] = np.array(child_ids, dtype=np.int64)
+
+    def _simulate(self, node):
+        "Returns the reward for a random simulation (to completion) of `node`"
+        invert_reward = True
+        while True:
+            if node.is_terminal():
+                reward = node.reward()
+                return 1 - reward if invert_reward else reward
+            node = node.find_random_child()
+            invert_reward = not invert_reward
+
+    def _backpropagate(self, path, reward):
+        "Send the reward back up to the ancestors of the leaf"
+        path = np.array(path[::-1], dtype=np.int64)
+        rewards = np.where(np.arange(len(path)) % 2 == 0, reward, 1 - reward)
+        # 1 for me is 0 for my enemy, and vice versa; add.at since a path may revisit a state
+        np.add.at(self.N, path, 1)
+        np.add.at(self.Q, path, rewards)
+
+    def _uct_select(self, i):
+        "Select a child of `i`, balancing exploration & exploitation"
+        children = self.children[i]
+        n = self.N[children]
+        uct = self.Q[children] / n + self.exploration_weight * np.sqrt(math.log(self.N[i]) / n)
+        return int(children[uct.argmax()])
@@ -7,6 +7,7 @@ from flask_migrate import Migrate
 from flask_login import LoginManager
 from redis import Redis
 from config import Config
+from app.search import SearchEngine
 
 
 def get_locale():
@@ -28,6 +29,8 @@ def create_app(config_class=Config):
     db.init_app(app)
     migrate.init_app(app, db)
     login.init_app(app)
+    app.search_engine = SearchEngine(app.config['SEARCH_INDEX_DIR']) \
+        if app.config['SEARCH_INDEX_DIR'] else None
 
     from app.errors import bp as errors_bp
     app.register_blueprint(errors_bp)
@@ -13,7 +13,8 @@ import jwt
 import redis
 import rq
 from app import db, login
-from app.search import add_to_index, remove_from_index, query_index
+from app.search import add_to_index, remove_from_index, flush_indexes, \
+    query_index
 
 
 class SearchableMixin:
@@ -48,12 +49,16 @@ class SearchableMixin:
         for obj in session._changes['delete']:
             if isinstance(obj, SearchableMixin):
                 remove_from_index(obj.__tablename__, obj)
+        flush_indexes()
         session._changes = None
 
     @classmethod
-    def reindex(cls):
-        for obj in db.session.scalars(sa.select(cls)):
-            add_to_index(cls.__tablename__, obj)
+    def reindex(cls, batch_size=1000):
+        query = sa.select(cls).execution_options(yield_per=batch_size)
+        for batch in db.session.scalars(query).partitions():
+            for obj in batch:
+                add_to_index(cls.__tablename__, obj)
+            flush_indexes()
 
 
 db.event.listen(db.session, 'before_commit', SearchableMixin.before_commit)
@@ -0,0 +1,390 @@
+from array import array
+from collections import Counter
+from contextlib import contextmanager
+import heapq
+import json
+import logging
+import math
+import os
+import re
+import threading
+import uuid
+from flask import current_app
+
+try:
+    import fcntl
+except ImportError:  # Windows: a single process per index directory
+    fcntl = None
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower())
+
+
+class Segment:
+    """Immutable inverted index of a batch of documents, stored in one file.
+
+    docs maps each document id to its length in tokens, and postings maps
+    each term to the ids of the documents containing it and the number of
+    times it occurs in each of them.
+    """
+
+    def __init__(self, name, docs, postings):
+        self.name = name
+        self.docs = docs
+        self.postings = postings
+
+    @classmethod
+    def build(cls, name, documents):
+        docs = {}
+        postings = {}
+        for id in sorted(documents):
+            tokens = documents[id]
+            docs[id] = len(tokens)
+            for term, tf in Counter(tokens).items():
+                ids, tfs = postings.setdefault(term, (array('q'), array('l')))
+                ids.append(id)
+                tfs.append(tf)
+        return cls(name, docs, postings)
+
+    @classmethod
+    def merge(cls, name, segments, deleted):
+        """A segment of the documents of segments not in their deleted sets"""
+        docs = {}
+        postings = {}
+        for segment in segments:
+            gone = deleted[segment.name]
+            docs.update((id, length) for id, length in segment.docs.items()
+                        if id not in gone)
+            for term, (ids, tfs) in segment.postings.items():
+                merged = postings.setdefault(term, (array('q'), array('l')))
+                for id, tf in zip(ids, tfs):
+                    if id not in gone:
+                        merged[0].append(id)
+                        merged[1].append(tf)
+        return cls(name, docs, postings)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        return cls(os.path.basename(path)[:-len('.json')],
+                   {id: length for id, length in data['docs']},
+                   {term: (array('q', ids), array('l', tfs))
+                    for term, (ids, tfs) in data['postings'].items()})
+
+    def save(self, path):
+        data = {
+            'docs': list(self.docs.items()),
+            'postings': {term: (ids.tolist(), tfs.tolist())
+                         for term, (ids, tfs) in self.postings.items()},
+        }
+        _write_json(path, data)
+
+
+def _write_json(path, data):
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        # dumps, unlike dump, uses the C encoder
+        f.write(json.dumps(data, separators=(',', ':')))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class Index:
+    """Full-text index of the documents of one model, ranked with BM25.
+
+    Documents added or removed are buffered until flush(), which writes
+    them as a new segment and marks their previous versions as deleted in
+    the manifest, the list of live segments.  Once there are more than
+    merge_factor segments, the smallest ones are merged in a background
+    thread, which also drops the deleted documents.  Several processes can
+    share the directory: changes are made under a file lock, and readers
+    reload the manifest when it has been replaced.
+    """
+
+    def __init__(self, path, merge_factor=10, k1=1.2, b=0.75):
+        self.path = path
+        self.merge_factor = merge_factor
+        self.k1 = k1
+        self.b = b
+        os.makedirs(path, exist_ok=True)
+        self._lock = threading.RLock()
+        self._pending = {}
+        self._segments = {}
+        self._deleted = {}
+        self._live = {}
+        self._total_length = 0
+        self._manifest_stat = None
+        self._merge_wanted = threading.Event()
+        self._merger = None
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.path, 'manifest.json')
+
+    def _segment_path(self, name):
+        return os.path.join(self.path, name + '.json')
+
+    @contextmanager
+    def _file_lock(self):
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.path, 'LOCK'), 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _refresh(self):
+        """Reload the manifest if another writer replaced it"""
+        try:
+            st = os.stat(self.manifest_path)
+            stat = (st.st_ino, st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            stat = None
+        if stat == self._manifest_stat:
+            return
+        manifest = {'segments': []}
+        if stat is not None:
+            with open(self.manifest_path, encoding='utf-8') as f:
+                manifest = json.load(f)
+        segments = {}
+        deleted = {}
+        for entry in manifest['segments']:
+            name = entry['name']
+            segments[name] = self._segments.get(name) or Segment.load(
+                self._segment_path(name))
+            deleted[name] = set(entry['deleted'])
+        self._segments = segments
+        self._deleted = deleted
+        self._live = {}
+        self._total_length = 0
+        for name, segment in segments.items():
+            for id, length in segment.docs.items():
+                if id not in deleted[name]:
+                    self._live[id] = name
+                    self._total_length += length
+        self._manifest_stat = stat
+
+    def _write_manifest(self):
+        _write_json(self.manifest_path, {'segments': [
+            {'name': name, 'deleted': sorted(self._deleted[name])}
+            for name in self._segments]})
+        st = os.stat(self.manifest_path)
+        self._manifest_stat = (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def _delete(self, id):
+        name = self._live.pop(id, None)
+        if name is not None:
+            self._deleted[name].add(id)
+            self._total_length -= self._segments[name].docs[id]
+
+    def add(self, id, text):
+        with self._lock:
+            self._pending[id] = tokenize(text)
+
+    def remove(self, id):
+        with self._lock:
+            self._pending[id] = None
+
+    def _apply_pending(self):
+        documents = {id: tokens for id, tokens in self._pending.items()
+                     if tokens is not None}
+        for id in self._pending:
+            self._delete(id)
+        if documents:
+            segment = Segment.build('seg-' + uuid.uuid4().hex, documents)
+            segment.save(self._segment_path(segment.name))
+            self._segments[segment.name] = segment
+            self._deleted[segment.name] = set()
+            for id, length in segment.docs.items():
+                self._live[id] = segment.name
+                self._total_length += length
+        self._write_manifest()
+
+    def flush(self):
+        """Write the buffered changes to disk"""
+        with self._lock:
+            if not self._pending:
+                return
+            with self._file_lock():
+                self._refresh()
+                try:
+                    self._apply_pending()
+                except BaseException:
+                    self._manifest_stat = None  # reload from disk next time
+                    raise
+                self._pending.clear()
+            if len(self._segments) > self.merge_factor:
+                self._start_merger()
+
+    def search(self, query, page, per_page):
+        """Ids of the page of documents best matching query, and the number
+        of documents matching any of its terms"""
+        with self._lock:
+            try:
+                self._refresh()
+            except FileNotFoundError:
+                # a segment was merged away by another process meanwhile
+                with self._file_lock():
+                    self._refresh()
+            n = len(self._live)
+            if n == 0:
+                return [], 0
+            avgdl = self._total_length / n
+            scores = {}
+            for term in set(tokenize(query)):
+                matches = []
+                for name, segment in self._segments.items():
+                    postings = segment.postings.get(term)
+                    if postings is not None:
+                        matches.append((segment, self._deleted[name],
+                                        postings))
+                df = sum(len(ids) - sum(1 for id in ids if id in deleted)
+                         if deleted else len(ids)
+                         for _, deleted, (ids, _) in matches)
+                if df == 0:
+                    continue
+                idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+                k1, b = self.k1, self.b
+                for segment, deleted, (ids, tfs) in matches:
+                    docs = segment.docs
+                    for id, tf in zip(ids, tfs):
+                        if id in deleted:
+                            continue
+                        norm = k1 * (1 - b + b * docs[id] / avgdl)
+                        scores[id] = scores.get(id, 0.0) + \
+                            idf * tf * (k1 + 1) / (tf + norm)
+        top = heapq.nsmallest(page * per_page, scores.items(),
+                              key=lambda item: (-item[1], item[0]))
+        return [id for id, _ in top[(page - 1) * per_page:]], len(scores)
+
+    def clear(self):
+        with self._lock, self._file_lock():
+            self._refresh()
+            names = list(self._segments)
+            self._pending.clear()
+            self._segments, self._deleted = {}, {}
+            self._live, self._total_length = {}, 0
+            self._write_manifest()
+            for name in names:
+                os.remove(self._segment_path(name))
+
+    def _start_merger(self):
+        if self._merger is None:
+            self._merger = threading.Thread(target=self._merge_loop,
+                                            daemon=True)
+            self._merger.start()
+        self._merge_wanted.set()
+
+    def _merge_loop(self):
+        while True:
+            self._merge_wanted.wait()
+            self._merge_wanted.clear()
+            try:
+                while self.merge():
+                    pass
+            except Exception:
+                # the segments are left as they are, and merged next time
+                logging.getLogger(__name__).exception(
+                    'Merge of the segments of %s failed', self.path)
+
+    def merge(self, full=False):
+        """Merge the smallest segments into one (all of them if full is set),
+        returns False if there was nothing to merge"""
+        with self._lock:
+            self._refresh()
+            if len(self._segments) <= (1 if full else self.merge_factor):
+                return False
+            segments = sorted(self._segments.values(),
+                              key=lambda segment: len(segment.docs))
+            if not full:
+                segments = segments[:self.merge_factor]
+            deleted = {s.name: set(self._deleted[s.name]) for s in segments}
+        # the segment each live document of the merge comes from
+        origin = {id: s.name for s in segments for id in s.docs
+                  if id not in deleted[s.name]}
+        # the merge runs unlocked: searches and flushes go on meanwhile
+        merged = Segment.merge('seg-' + uuid.uuid4().hex, segments, deleted)
+        merged.save(self._segment_path(merged.name))
+        with self._lock, self._file_lock():
+            self._refresh()
+            if any(s.name not in self._segments for s in segments):
+                # another process merged them first
+                os.remove(self._segment_path(merged.name))
+                return True
+            # documents deleted or replaced while the merge was running
+            gone = {id for s in segments
+                    for id in self._deleted[s.name] - deleted[s.name]
+                    if origin.get(id) == s.name}
+            for s in segments:
+                del self._segments[s.name]
+                del self._deleted[s.name]
+            self._segments[merged.name] = merged
+            self._deleted[merged.name] = gone
+            for id in merged.docs:
+                if id not in gone:
+                    self._live[id] = merged.name
+            self._write_manifest()
+            for s in segments:
+                os.remove(self._segment_path(s.name))
+        return True
+
+
+class SearchEngine:
+    """The indexes of the searchable models, one directory each"""
+
+    def __init__(self, path, merge_factor=10):
+        self.path = path
+        self.merge_factor = merge_factor
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    def index(self, name):
+        with self._lock:
+            if name not in self._indexes:
+                self._indexes[name] = Index(os.path.join(self.path, name),
+                                            self.merge_factor)
+            return self._indexes[name]
+
+    def flush(self):
+        with self._lock:
+            indexes = list(self._indexes.values())
+        for index in indexes:
+            index.flush()
+
+
+def _engine():
+    return current_app.search_engine
+
+
+def add_to_index(index, model):
+    if not _engine():
+        return
+    text = ' '.join(str(getattr(model, field) or '')
+                    for field in model.__searchable__)
+    _engine().index(index).add(model.id, text)
+
+
+def remove_from_index(index, model):
+    if not _engine():
+        return
+    _engine().index(index).remove(model.id)
+
+
+def flush_indexes():
+    if not _engine():
+        return
+    _engine().flush()
+
+
+def query_index(index, query, page, per_page):
+    if not _engine():
+        return [], 0
+    return _engine().index(index).search(query, page, per_page)
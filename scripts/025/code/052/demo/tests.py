@@ -0,0 +1,57 @@
+import shutil
+import tempfile
+import unittest
+from app.search import Index
+
+
+class SearchIndexCase(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.index = Index(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_update_then_merge(self):
+        self.index.add(5, 'hello world')
+        self.index.flush()
+        self.index.add(5, 'hello again')
+        self.index.flush()
+        self.assertTrue(self.index.merge(full=True))
+        self.assertEqual(self.index.search('hello', 1, 10), ([5], 1))
+        self.assertEqual(self.index.search('world', 1, 10), ([], 0))
+
+        # the merged segment is the live location of the document
+        self.index.add(5, 'hello there')
+        self.index.flush()
+        self.assertEqual(self.index.search('there', 1, 10), ([5], 1))
+        self.assertEqual(self.index.search('again', 1, 10), ([], 0))
+
+        # and a new index on the same directory agrees
+        reopened = Index(self.path)
+        self.assertEqual(reopened.search('hello', 1, 10), ([5], 1))
+
+    def test_remove(self):
+        self.index.add(1, 'red apple')
+        self.index.add(2, 'green apple')
+        self.index.flush()
+        self.index.remove(1)
+        self.index.flush()
+        self.index.merge(full=True)
+        self.assertEqual(self.index.search('apple', 1, 10), ([2], 1))
+        self.assertEqual(self.index.search('red', 1, 10), ([], 0))
+
+    def test_ranking(self):
+        self.index.add(1, 'python and flask')
+        self.index.add(2, 'python python python')
+        self.index.add(3, 'flask')
+        self.index.flush()
+        ids, total = self.index.search('python', 1, 10)
+        self.assertEqual(ids, [2, 1])
+        self.assertEqual(total, 2)
+        self.assertEqual(self.index.search('python flask', 1, 3),
+                         ([1, 2, 3], 3))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,113 @@
+"""Timing, JSON storage and regression comparison of benchmark results."""
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+
+def git_commit():
+    """Returns the current git commit hash, or None if it cannot be determined."""
+    try:
+        out = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.strip()
+
+
+def time_benchmark(factory, repeat):
+    """
+    Times a benchmark ``repeat`` times.
+
+    ``factory`` is called (untimed) before each measurement and must return
+    ``(run, ops)``: a zero-argument callable to time, and the number of
+    operations it performs.  ``run`` may return a dict of counters, which are
+    stored with the result of the last measurement.
+    """
+    per_op = []
+    counters = None
+    for ignored in range(repeat):
+        run, ops = factory()
+        t0 = time.perf_counter()
+        counters = run()
+        per_op.append((time.perf_counter() - t0) / ops)
+
+    result = {'min': min(per_op),
+              'median': statistics.median(per_op),
+              'mean': statistics.mean(per_op),
+              'repeat': repeat,
+              'ops': ops}
+    if counters:
+        result['counters'] = counters
+    return result
+
+
+def make_report(results, params):
+    return {'meta': {'commit': git_commit(),
+                     'python': sys.version.split()[0],
+                     'implementation': platform.python_implementation(),
+                     'platform': platform.platform(),
+                     'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S')},
+            'params': params,
+            'results': results}
+
+
+def save_report(report, filename):
+    with open(filename, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+
+
+def load_report(filename):
+    with open(filename) as f:
+        return json.load(f)
+
+
+def compare_reports(baseline, current, threshold=0.1):
+    """
+    Compares the median time per operation of each benchmark present in both reports.
+
+    Returns a list of (name, baseline median, current median, ratio, verdict) tuples,
+    where verdict is 'slower' or 'faster' if the ratio differs from 1 by more than
+    ``threshold``, and 'same' otherwise.
+    """
+    rows = []
+    for name, cur in sorted(current['results'].items()):
+        base = baseline['results'].get(name)
+        if base is None:
+            continue
+        ratio = cur['median'] / base['median'] if base['median'] > 0 else float('inf')
+        if ratio > 1.0 + threshold:
+            verdict = 'slower'
+        elif ratio < 1.0 - threshold:
+            verdict = 'faster'
+        else:
+            verdict = 'same'
+        rows.append((name, base['median'], cur['median'], ratio, verdict))
+    return rows
+
+
+def format_seconds(t):
+    for unit, scale in (('s', 1.0), ('ms', 1e-3), ('us', 1e-6)):
+        if t >= scale:
+            return f'{t / scale:.3f} {unit}'
+    return f'{t / 1e-9:.1f} ns'
+
+
+def print_results(results):
+    width = max(len(name) for name in results)
+    for name, r in sorted(results.items()):
+        line = f'{name.ljust(width)}  median {format_seconds(r["median"]):>12}  min {format_seconds(r["min"]):>12}'
+        if 'counters' in r:
+            line += '  ' + ' '.join(f'{k}={v}' for k, v in sorted(r['counters'].items()))
+        print(line)
+
+
+def print_comparison(rows, baseline, current):
+    print(f'baseline {baseline["meta"].get("commit")} vs current {current["meta"].get("commit")}')
+    if not rows:
+        print('No benchmarks in common.')
+        return
+    width = max(len(row[0]) for row in rows)
+    for name, base, cur, ratio, verdict in rows:
+        print(f'{name.ljust(width)}  {format_seconds(base):>12} -> {format_seconds(cur):>12}  x{ratio:.3f}  {verdict}')
@@ -0,0 +1,301 @@
+"""
+Benchmarks for the hot paths of the neat core.
+
+Usage (from the repository root):
+    python -m benchmarks.run_benchmarks --output results.json
+    python -m benchmarks.run_benchmarks --compare baseline.json --output results.json
+
+With ``--compare``, the exit status is 1 if any benchmark is slower than the
+baseline by more than ``--regression-threshold`` (a fraction of the baseline
+median).
+"""
+import argparse
+import os
+import random
+import sys
+from itertools import count
+
+import neat
+from neat.ctrnn import CTRNN
+from neat.iznn import IZNN, IZGenome
+from neat.nn import FeedForwardNetwork, RecurrentNetwork
+from neat.reporting import ReporterSet
+from neat.species import DefaultSpeciesSet
+
+from benchmarks.harness import (compare_reports, load_report, make_report, print_comparison,
+                                print_results, save_report, time_benchmark)
+from benchmarks.synthetic import load_config, make_genome, make_lineage_population, make_population
+
+local_dir = os.path.dirname(__file__)
+xor_dir = os.path.join(local_dir, os.pardir, 'examples', 'xor')
+FEEDFORWARD_CONFIG = os.path.join(xor_dir, 'config-feedforward')
+SPIKING_CONFIG = os.path.join(xor_dir, 'config-spiking')
+
+xor_inputs = [(0.0, 0.0), (0.0, 1.0), (1.0, 0.0), (1.0, 1.0)]
+xor_outputs = [(0.0,), (1.0,), (1.0,), (0.0,)]
+
+
+def eval_xor_genomes(genomes, config):
+    for genome_id, genome in genomes:
+        genome.fitness = 4.0
+        net = FeedForwardNetwork.create(genome, config)
+        for xi, xo in zip(xor_inputs, xor_outputs):
+            output = net.activate(xi)
+            genome.fitness -= (output[0] - xo[0]) ** 2
+
+
+def feedforward_config(args):
+    return load_config(neat.DefaultGenome, FEEDFORWARD_CONFIG, args.inputs, args.outputs, args.pop_size)
+
+
+def recurrent_config(args):
+    config = feedforward_config(args)
+    config.genome_config.feed_forward = False
+    return config
+
+
+def random_inputs(config):
+    return [random.random() for ignored in config.genome_config.input_keys]
+
+
+def bench_feedforward_create(args):
+    config = feedforward_config(args)
+    genome = make_genome(config, 1, args.nodes, args.connections, recurrent=False)
+
+    def run():
+        for ignored in range(args.inner):
+            FeedForwardNetwork.create(genome, config)
+
+    return run, args.inner
+
+
+def bench_feedforward_activate(args):
+    config = feedforward_config(args)
+    net = FeedForwardNetwork.create(make_genome(config, 1, args.nodes, args.connections, recurrent=False), config)
+    inputs = random_inputs(config)
+
+    def run():
+        for ignored in range(args.inner):
+            net.activate(inputs)
+
+    return run, args.inner
+
+
+def bench_recurrent_create(args):
+    config = recurrent_config(args)
+    genome = make_genome(config, 1, args.nodes, args.connections, recurrent=args.recurrent)
+
+    def run():
+        for ignored in range(args.inner):
+            RecurrentNetwork.create(genome, config)
+
+    return run, args.inner
+
+
+def bench_recurrent_activate(args):
+    config = recurrent_config(args)
+    net = RecurrentNetwork.create(make_genome(config, 1, args.nodes, args.connections,
+                                              recurrent=args.recurrent), config)
+    inputs = random_inputs(config)
+
+    def run():
+        for ignored in range(args.inner):
+            net.activate(inputs)
+
+    return run, args.inner
+
+
+def bench_ctrnn_advance(args):
+    config = recurrent_config(args)
+    net = CTRNN.create(make_genome(config, 1, args.nodes, args.connections, recurrent=args.recurrent), config, 0.01)
+    inputs = random_inputs(config)
+
+    def run():
+        for ignored in range(args.inner):
+            net.advance(inputs, 0.01, 0.01)
+
+    return run, args.inner
+
+
+def bench_iznn_advance(args):
+    config = load_config(IZGenome, SPIKING_CONFIG, args.inputs, args.outputs, args.pop_size)
+    net = IZNN.create(make_genome(config, 1, args.nodes, args.connections, recurrent=args.recurrent), config)
+    net.set_inputs(random_inputs(config))
+
+    def run():
+        for ignored in range(args.inner):
+            net.advance(0.25)
+
+    return run, args.inner
+
+
+def bench_genome_distance(args):
+    config = feedforward_config(args)
+    genome_config = config.genome_config
+    g1 = make_genome(config, 1, args.nodes, args.connections, recurrent=args.recurrent)
+    g2 = make_genome(config, 2, args.nodes, args.connections, recurrent=args.recurrent)
+
+    def run():
+        for ignored in range(args.inner):
+            g1.distance(g2, genome_config)
+
+    return run, args.inner
+
+
+class CountingGenome(neat.DefaultGenome):
+    """A DefaultGenome that counts calls to `distance`."""
+    distance_calls = 0
+
+    def distance(self, other, config):
+        CountingGenome.distance_calls += 1
+        return neat.DefaultGenome.distance(self, other, config)
+
+
+def speciated(config, population):
+    species_set = DefaultSpeciesSet(config.species_set_config, ReporterSet())
+    species_set.speciate(config, population, 0)
+    return species_set
+
+
+def bench_speciate(args):
+    config = feedforward_config(args)
+    config.species_set_config.compatibility_threshold = args.threshold
+    population = make_population(config, args.nodes, args.connections, recurrent=args.recurrent)
+    species_set = speciated(config, population)
+    new_population = make_population(config, args.nodes, args.connections, recurrent=args.recurrent,
+                                     first_key=config.pop_size + 1)
+
+    def run():
+        species_set.speciate(config, new_population, 1)
+        return {'species': len(species_set.species)}
+
+    return run, 1
+
+
+def speciate_factory(args, representative_pivots):
+    config = feedforward_config(args)
+    config.genome_type = CountingGenome
+    config.species_set_config.compatibility_threshold = args.threshold
+    config.species_set_config.representative_pivots = representative_pivots
+    if args.lineages > 0:
+        population = make_lineage_population(config, args.nodes, args.connections, args.lineages,
+                                             recurrent=args.recurrent)
+    else:
+        population = make_population(config, args.nodes, args.connections, recurrent=args.recurrent)
+    species_set = DefaultSpeciesSet(config.species_set_config, ReporterSet())
+
+    def run():
+        CountingGenome.distance_calls = 0
+        species_set.speciate(config, population, 0)
+        return {'species': len(species_set.species), 'distance_calls': CountingGenome.distance_calls}
+
+    return run, 1
+
+
+def bench_speciate_empty(args):
+    return speciate_factory(args, 0)
+
+
+def bench_speciate_indexed(args):
+    return speciate_factory(args, args.pivots)
+
+
+def bench_reproduce(args):
+    config = feedforward_config(args)
+    population = make_population(config, args.nodes, args.connections, recurrent=args.recurrent)
+    species_set = speciated(config, population)
+    reporters = ReporterSet()
+    stagnation = config.stagnation_type(config.stagnation_config, reporters)
+    reproduction = config.reproduction_type(config.reproduction_config, reporters, stagnation)
+    reproduction.genome_indexer = count(config.pop_size + 1)
+
+    def run():
+        reproduction.reproduce(config, species_set, config.pop_size, 1)
+
+    return run, 1
+
+
+def bench_xor_generation(args):
+    config = load_config(neat.DefaultGenome, FEEDFORWARD_CONFIG, pop_size=args.pop_size)
+    config.fitness_threshold = float('inf')
+    p = neat.Population(config)
+
+    def run():
+        p.run(eval_xor_genomes, 1)
+
+    return run, 1
+
+
+BENCHMARKS = {'feedforward_create': bench_feedforward_create,
+              'feedforward_activate': bench_feedforward_activate,
+              'recurrent_create': bench_recurrent_create,
+              'recurrent_activate': bench_recurrent_activate,
+              'ctrnn_advance': bench_ctrnn_advance,
+              'iznn_advance': bench_iznn_advance,
+              'genome_distance': bench_genome_distance,
+              'speciate': bench_speciate,
+              'speciate_empty': bench_speciate_empty,
+              'speciate_indexed': bench_speciate_indexed,
+              'reproduce': bench_reproduce,
+              'xor_generation': bench_xor_generation}
+
+
+def make_parser():
+    parser = argparse.ArgumentParser(description='Benchmark the neat core hot paths.')
+    parser.add_argument('benchmarks', nargs='*', metavar='BENCHMARK',
+                        help='benchmarks to run (default: all of {})'.format(', '.join(sorted(BENCHMARKS))))
+    parser.add_argument('--nodes', type=int, default=50, help='hidden nodes per synthetic genome')
+    parser.add_argument('--connections', type=int, default=200, help='connections per synthetic genome')
+    parser.add_argument('--inputs', type=int, default=8, help='network inputs')
+    parser.add_argument('--outputs', type=int, default=4, help='network outputs')
+    parser.add_argument('--recurrent', action='store_true',
+                        help='allow cycles in genomes used by the recurrent, CTRNN, IZNN and genome benchmarks')
+    parser.add_argument('--pop-size', type=int, default=150, help='population size')
+    parser.add_argument('--threshold', type=float, default=3.0, help='compatibility threshold for speciate')
+    parser.add_argument('--lineages', type=int, default=0,
+                        help='if positive, speciate populations descended from this many ancestors')
+    parser.add_argument('--pivots', type=int, default=8, help='representative pivots for speciate_indexed')
+    parser.add_argument('--inner', type=int, default=100, help='inner iterations for per-call benchmarks')
+    parser.add_argument('--repeat', type=int, default=5, help='measurements per benchmark')
+    parser.add_argument('--seed', type=int, default=1, help='random seed')
+    parser.add_argument('--output', help='write results to this JSON file')
+    parser.add_argument('--compare', help='compare against this baseline JSON file')
+    parser.add_argument('--regression-threshold', type=float, default=0.1,
+                        help='relative slowdown reported as a regression')
+    return parser
+
+
+def main(argv=None):
+    parser = make_parser()
+    args = parser.parse_args(argv)
+    names = args.benchmarks or sorted(BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        parser.error('unknown benchmarks: {}'.format(', '.join(unknown)))
+
+    results = {}
+    for name in names:
+        random.seed(args.seed)
+        results[name] = time_benchmark(lambda: BENCHMARKS[name](args), args.repeat)
+    params = dict((k, v) for k, v in vars(args).items()
+                  if k not in ('benchmarks', 'output', 'compare', 'regression_threshold'))
+    report = make_report(results, params)
+
+    print_results(results)
+    if args.output:
+        save_report(report, args.output)
+
+    if args.compare:
+        baseline = load_report(args.compare)
+        if baseline['params'] != params:
+            print('Warning: baseline was run with different parameters: {}'.format(baseline['params']))
+        rows = compare_reports(baseline, report, args.regression_threshold)
+        print_comparison(rows, baseline, report)
+        if any(row[-1] == 'slower' for row in rows):
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,107 @@
+"""Builds synthetic genomes and populations of controllable size for benchmarking."""
+import copy
+import random
+
+from neat.config import Config
+from neat.reproduction import DefaultReproduction
+from neat.species import DefaultSpeciesSet
+from neat.stagnation import DefaultStagnation
+
+
+def load_config(genome_type, filename, num_inputs=None, num_outputs=None, pop_size=None):
+    """Loads a configuration file, optionally overriding the network and population sizes."""
+    config = Config(genome_type, DefaultReproduction, DefaultSpeciesSet, DefaultStagnation, filename)
+    genome_config = config.genome_config
+    if num_inputs is not None:
+        genome_config.num_inputs = num_inputs
+        genome_config.input_keys = [-i - 1 for i in range(num_inputs)]
+    if num_outputs is not None:
+        genome_config.num_outputs = num_outputs
+        genome_config.output_keys = [i for i in range(num_outputs)]
+    if pop_size is not None:
+        config.pop_size = pop_size
+    return config
+
+
+def make_genome(config, key, num_hidden, num_connections, recurrent=False):
+    """
+    Creates a genome with ``num_hidden`` hidden nodes and (at most) ``num_connections``
+    distinct connections chosen at random using the module-level random generator.
+
+    If ``recurrent`` is False, connections only run forward in the order
+    inputs, hidden nodes, outputs, so the genome is acyclic; otherwise any node
+    (including itself) may feed any non-input node.
+    """
+    genome_config = config.genome_config
+    genome = config.genome_type(key)
+
+    for node_key in genome_config.output_keys:
+        genome.nodes[node_key] = genome.create_node(genome_config, node_key)
+    first_hidden = len(genome_config.output_keys)
+    hidden_keys = list(range(first_hidden, first_hidden + num_hidden))
+    for node_key in hidden_keys:
+        genome.nodes[node_key] = genome.create_node(genome_config, node_key)
+
+    order = genome_config.input_keys + hidden_keys + genome_config.output_keys
+    num_inputs = len(genome_config.input_keys)
+    num_nodes = len(order)
+    if recurrent:
+        max_connections = num_nodes * (num_nodes - num_inputs)
+    else:
+        max_connections = sum(num_nodes - max(a + 1, num_inputs) for a in range(num_nodes))
+    num_connections = min(num_connections, max_connections)
+
+    while len(genome.connections) < num_connections:
+        a = random.randrange(num_nodes)
+        b = random.randrange(num_inputs, num_nodes)
+        if not recurrent:
+            if a == b:
+                continue
+            a, b = min(a, b), max(a, b)
+        key = (order[a], order[b])
+        if key not in genome.connections:
+            genome.connections[key] = genome.create_connection(genome_config, key[0], key[1])
+
+    return genome
+
+
+def make_population(config, num_hidden, num_connections, recurrent=False, first_key=1):
+    """Creates ``config.pop_size`` synthetic genomes with random fitness values."""
+    population = {}
+    for key in range(first_key, first_key + config.pop_size):
+        genome = make_genome(config, key, num_hidden, num_connections, recurrent)
+        genome.fitness = random.random()
+        population[key] = genome
+    return population
+
+
+def make_lineage_population(config, num_hidden, num_connections, num_lineages, mutations=5,
+                            spread=0.1, recurrent=False, first_key=1):
+    """
+    Creates ``config.pop_size`` genomes descended from ``num_lineages`` ancestors, so
+    that genomic distances have the clustered, tree-like structure of an evolved
+    population rather than all being roughly equal.
+
+    Each ancestor is a copy of an earlier ancestor with ``mutations`` rounds of
+    `DefaultGenome.mutate` applied; each member is a copy of a random ancestor
+    with its weights and biases perturbed by a gaussian of stdev ``spread``.
+    """
+    genome_config = config.genome_config
+    ancestors = [make_genome(config, 0, num_hidden, num_connections, recurrent)]
+    while len(ancestors) < num_lineages:
+        ancestor = copy.deepcopy(random.choice(ancestors))
+        for ignored in range(mutations):
+            ancestor.mutate(genome_config)
+        ancestors.append(ancestor)
+
+    population = {}
+    for key in range(first_key, first_key + config.pop_size):
+        genome = copy.deepcopy(random.choice(ancestors))
+        genome.key = key
+        for cg in genome.connections.values():
+            cg.weight += random.gauss(0.0, spread)
+        for ng in genome.nodes.values():
+            ng.bias += random.gauss(0.0, spread)
+        genome.fitness = random.random()
+        population[key] = genome
+    return population
@@ -16,3 +16,5 @@ from neat.parallel import ParallelEvaluator
 from neat.distributed import DistributedEvaluator, host_is_local
 from neat.threaded import ThreadedEvaluator
 from neat.checkpoint import Checkpointer
+from neat.islands import IslandModel
+from neat.archive import ArchiveReporter, GenomeArchive, GenomeArchiveWriter
@@ -0,0 +1,373 @@
+"""
+A compact, versioned binary format for storing genomes (and the `Config` that
+describes them), readable lazily through a memory map.
+
+File layout (all integers little-endian):
+    header      magic, format version, genome count, and the offsets of the
+                index and metadata blocks
+    records     one self-contained record per genome (see `genome_to_bytes`)
+    index       one fixed-size entry per genome: key, generation, fitness,
+                record offset and record length
+    metadata    JSON: gene attribute schema, genome type, and optionally the
+                text of the configuration file and the types it was loaded with
+
+Tools can scan the index (for instance to find the best genome of each
+generation) without decoding any genome, and decode only the records they need.
+"""
+import importlib
+import json
+import math
+import mmap
+import os
+import struct
+import tempfile
+from collections import namedtuple
+
+from neat.attributes import BoolAttribute, FloatAttribute, IntegerAttribute, StringAttribute
+from neat.config import Config
+from neat.reporting import BaseReporter
+
+MAGIC = b'NEATARC\0'
+FORMAT_VERSION = 1
+
+_header = struct.Struct('<8sHHIQQQ')  # magic, version, flags, count, index, metadata offset/length
+_index_entry = struct.Struct('<qIdQI')  # key, generation, fitness, record offset, record length
+_record_header = struct.Struct('<qdIIH')  # key, fitness, nodes, connections, strings
+
+_attribute_codes = {FloatAttribute: 'd', IntegerAttribute: 'q', BoolAttribute: '?', StringAttribute: 'H'}
+
+IndexEntry = namedtuple('IndexEntry', ['position', 'key', 'generation', 'fitness'])
+
+
+class ArchiveFormatError(Exception):
+    pass
+
+
+def _gene_schema(gene_type):
+    """Returns the list of (attribute name, struct code) pairs stored for a gene type."""
+    schema = []
+    for a in gene_type._gene_attributes:
+        for attribute_type, code in _attribute_codes.items():
+            if isinstance(a, attribute_type):
+                schema.append((a.name, code))
+                break
+        else:
+            raise ArchiveFormatError(f"Unsupported gene attribute type {type(a).__name__!r} for {a.name!r}")
+    return schema
+
+
+class _GeneCodec(object):
+    """Packs and unpacks the genes of one type as fixed-size binary records."""
+
+    def __init__(self, gene_type, num_keys):
+        self.gene_type = gene_type
+        self.schema = _gene_schema(gene_type)
+        self.num_keys = num_keys
+        self.struct = struct.Struct('<' + 'q' * num_keys + ''.join(code for name, code in self.schema))
+        self.strings = [i for i, (name, code) in enumerate(self.schema) if code == 'H']
+
+    def pack(self, genes, string_ids):
+        parts = []
+        for gene in genes:
+            key = gene.key if self.num_keys == 1 else list(gene.key)
+            values = [getattr(gene, name) for name, code in self.schema]
+            for i in self.strings:
+                s = values[i]
+                if s not in string_ids:
+                    string_ids[s] = len(string_ids)
+                values[i] = string_ids[s]
+            parts.append(self.struct.pack(*([key] if self.num_keys == 1 else key), *values))
+        return b''.join(parts)
+
+    def unpack(self, data, offset, count, strings):
+        genes = {}
+        names = [name for name, code in self.schema]
+        for values in struct.iter_unpack(self.struct.format, data[offset:offset + count * self.struct.size]):
+            key = values[0] if self.num_keys == 1 else tuple(values[:self.num_keys])
+            gene = self.gene_type(key)
+            attributes = list(values[self.num_keys:])
+            for i in self.strings:
+                attributes[i] = strings[attributes[i]]
+            for name, value in zip(names, attributes):
+                setattr(gene, name, value)
+            genes[key] = gene
+        return genes, offset + count * self.struct.size
+
+
+_codecs = {}
+
+
+def _get_codecs(genome_config):
+    key = (genome_config.node_gene_type, genome_config.connection_gene_type)
+    codecs = _codecs.get(key)
+    if codecs is None:
+        codecs = (_GeneCodec(genome_config.node_gene_type, 1),
+                  _GeneCodec(genome_config.connection_gene_type, 2))
+        _codecs[key] = codecs
+    return codecs
+
+
+def genome_to_bytes(genome, genome_config):
+    """
+    Encodes a genome as a self-contained record: key, fitness, gene counts, a small
+    table of the distinct string attribute values, then the packed node and
+    connection genes.
+    """
+    node_codec, connection_codec = _get_codecs(genome_config)
+    string_ids = {}
+    nodes = node_codec.pack(genome.nodes.values(), string_ids)
+    connections = connection_codec.pack(genome.connections.values(), string_ids)
+
+    fitness = math.nan if genome.fitness is None else genome.fitness
+    parts = [_record_header.pack(genome.key, fitness, len(genome.nodes), len(genome.connections),
+                                 len(string_ids))]
+    for s in string_ids:
+        encoded = s.encode('utf-8')
+        parts.append(struct.pack('<H', len(encoded)))
+        parts.append(encoded)
+    parts.append(nodes)
+    parts.append(connections)
+    return b''.join(parts)
+
+
+def genome_from_bytes(data, genome_type, genome_config):
+    """Decodes a record produced by `genome_to_bytes` into a new genome."""
+    key, fitness, num_nodes, num_connections, num_strings = _record_header.unpack_from(data, 0)
+    offset = _record_header.size
+    strings = []
+    for ignored in range(num_strings):
+        n, = struct.unpack_from('<H', data, offset)
+        strings.append(bytes(data[offset + 2:offset + 2 + n]).decode('utf-8'))
+        offset += 2 + n
+
+    node_codec, connection_codec = _get_codecs(genome_config)
+    genome = genome_type(key)
+    genome.fitness = None if math.isnan(fitness) else fitness
+    genome.nodes, offset = node_codec.unpack(data, offset, num_nodes, strings)
+    genome.connections, offset = connection_codec.unpack(data, offset, num_connections, strings)
+    return genome
+
+
+def _type_name(t):
+    return f'{t.__module__}:{t.__qualname__}'
+
+
+def _import_type(name):
+    module_name, qualname = name.split(':')
+    obj = importlib.import_module(module_name)
+    for part in qualname.split('.'):
+        obj = getattr(obj, part)
+    return obj
+
+
+def _config_text(config):
+    fd, filename = tempfile.mkstemp(prefix='neat-config-')
+    os.close(fd)
+    try:
+        config.save(filename)
+        with open(filename) as f:
+            return f.read()
+    finally:
+        os.remove(filename)
+
+
+class GenomeArchiveWriter(object):
+    """
+    Appends genomes to a new archive file.  Use as a context manager, or call
+    `close` to write the index and metadata; an unclosed archive is unreadable.
+
+    If ``config`` is given it is stored in the archive, so that `GenomeArchive`
+    can be opened without one.
+    """
+
+    def __init__(self, filename, genome_config, genome_type, config=None):
+        self.genome_config = genome_config
+        self.genome_type = genome_type
+        self.config = config
+        self.index = []
+        self.f = open(filename, 'wb')
+        self.f.write(_header.pack(MAGIC, FORMAT_VERSION, 0, 0, 0, 0, 0))
+        self.offset = _header.size
+
+    @classmethod
+    def from_config(cls, filename, config):
+        return cls(filename, config.genome_config, config.genome_type, config)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def add(self, genome, generation=0):
+        record = genome_to_bytes(genome, self.genome_config)
+        fitness = math.nan if genome.fitness is None else genome.fitness
+        self.index.append(_index_entry.pack(genome.key, generation, fitness, self.offset, len(record)))
+        self.f.write(record)
+        self.offset += len(record)
+
+    def add_population(self, population, generation=0):
+        for genome in population.values():
+            self.add(genome, generation)
+
+    def close(self):
+        if self.f is None:
+            return
+
+        index_offset = self.offset
+        self.f.write(b''.join(self.index))
+        node_codec, connection_codec = _get_codecs(self.genome_config)
+        metadata = {'genome_type': _type_name(self.genome_type),
+                    'node_schema': node_codec.schema,
+                    'connection_schema': connection_codec.schema}
+        if self.config is not None:
+            metadata['config'] = _config_text(self.config)
+            metadata['config_types'] = [_type_name(t) for t in (self.config.genome_type,
+                                                                self.config.reproduction_type,
+                                                                self.config.species_set_type,
+                                                                self.config.stagnation_type)]
+        encoded = json.dumps(metadata).encode('utf-8')
+        metadata_offset = index_offset + len(self.index) * _index_entry.size
+        self.f.write(encoded)
+
+        self.f.seek(0)
+        self.f.write(_header.pack(MAGIC, FORMAT_VERSION, 0, len(self.index), index_offset,
+                                  metadata_offset, len(encoded)))
+        self.f.close()
+        self.f = None
+
+
+class GenomeArchive(object):
+    """
+    Read-only, memory-mapped access to an archive written by `GenomeArchiveWriter`.
+
+    Index entries are read without decoding genomes; `load` decodes a single
+    record.  If ``config`` is not given, the configuration stored in the
+    archive (if any) is used.
+    """
+
+    def __init__(self, filename, config=None):
+        self.f = open(filename, 'rb')
+        try:
+            self.data = mmap.mmap(self.f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self.f.close()
+            raise ArchiveFormatError(f"Empty archive file {filename!r}")
+
+        if len(self.data) < _header.size:
+            self.close()
+            raise ArchiveFormatError(f"Truncated archive file {filename!r}")
+        magic, version, ignored_flags, count, index_offset, metadata_offset, metadata_length = \
+            _header.unpack_from(self.data, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ArchiveFormatError(f"{filename!r} is not a genome archive")
+        if version != FORMAT_VERSION:
+            self.close()
+            raise ArchiveFormatError(f"Unsupported genome archive version {version} in {filename!r}")
+        if index_offset == 0:
+            self.close()
+            raise ArchiveFormatError(f"Genome archive {filename!r} was not closed")
+
+        self.count = count
+        self.index_offset = index_offset
+        self.metadata = json.loads(bytes(self.data[metadata_offset:metadata_offset + metadata_length]))
+
+        if config is None:
+            config = self.load_config()
+        self.config = config
+        if config is not None:
+            self.genome_type = config.genome_type
+            node_codec, connection_codec = _get_codecs(config.genome_config)
+            if ([list(x) for x in node_codec.schema] != self.metadata['node_schema'] or
+                    [list(x) for x in connection_codec.schema] != self.metadata['connection_schema']):
+                self.close()
+                raise ArchiveFormatError("Gene attributes of the configuration do not match the archive")
+        else:
+            self.genome_type = _import_type(self.metadata['genome_type'])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def close(self):
+        if self.data is not None:
+            self.data.close()
+            self.data = None
+        self.f.close()
+
+    def load_config(self):
+        """Returns the `Config` stored in the archive, or None if there is none."""
+        text = self.metadata.get('config')
+        if text is None:
+            return None
+        fd, filename = tempfile.mkstemp(prefix='neat-config-')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                f.write(text)
+            return Config(*[_import_type(t) for t in self.metadata['config_types']], filename)
+        finally:
+            os.remove(filename)
+
+    def entry(self, position):
+        key, generation, fitness, ignored_offset, ignored_length = \
+            _index_entry.unpack_from(self.data, self.index_offset + position * _index_entry.size)
+        return IndexEntry(position, key, generation, None if math.isnan(fitness) else fitness)
+
+    def entries(self):
+        """Iterates over the index entries, in the order the genomes were added."""
+        index = self.data[self.index_offset:self.index_offset + self.count * _index_entry.size]
+        for position, (key, generation, fitness, ignored_offset, ignored_length) in \
+                enumerate(struct.iter_unpack(_index_entry.format, index)):
+            yield IndexEntry(position, key, generation, None if math.isnan(fitness) else fitness)
+
+    def best_per_generation(self):
+        """Returns a dict mapping each generation to the index entry of its fittest genome."""
+        best = {}
+        for e in self.entries():
+            if e.fitness is None:
+                continue
+            b = best.get(e.generation)
+            if b is None or e.fitness > b.fitness:
+                best[e.generation] = e
+        return best
+
+    def record(self, position):
+        """Returns the raw record (as a memoryview into the map) of the genome at ``position``."""
+        if not (0 <= position < self.count):
+            raise IndexError(position)
+        ignored_key, ignored_generation, ignored_fitness, offset, length = \
+            _index_entry.unpack_from(self.data, self.index_offset + position * _index_entry.size)
+        return memoryview(self.data)[offset:offset + length]
+
+    def load(self, position):
+        """Decodes the genome at ``position``."""
+        if self.config is None:
+            raise ArchiveFormatError("A configuration is required to decode genomes")
+        record = self.record(position)
+        try:
+            return genome_from_bytes(record, self.genome_type, self.config.genome_config)
+        finally:
+            record.release()
+
+
+class ArchiveReporter(BaseReporter):
+    """Appends every evaluated generation to a genome archive."""
+
+    def __init__(self, filename, config):
+        self.writer = GenomeArchiveWriter.from_config(filename, config)
+        self.generation = None
+
+    def start_generation(self, generation):
+        self.generation = generation
+
+    def post_evaluate(self, config, population, species, best_genome):
+        self.writer.add_population(population, self.generation)
+
+    def close(self):
+        self.writer.close()
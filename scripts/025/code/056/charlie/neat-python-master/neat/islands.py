@@ -0,0 +1,266 @@
+"""
+Runs several independent populations ("islands") in separate processes,
+periodically migrating the best genomes between them.
+
+Each island performs its own evaluation, reproduction and speciation, so the
+whole evolutionary loop (not only fitness evaluation) scales with the number
+of processes.  Genome and node keys are allocated from disjoint, strided
+ranges (island ``i`` of ``K`` only produces keys congruent to ``i`` modulo
+``K``), so keys remain globally unique even after genomes have migrated.
+"""
+import copy
+import random
+import traceback
+import weakref
+from itertools import count
+from multiprocessing import Pipe, Process
+
+from neat.population import Population
+from neat.reporting import BaseReporter
+
+
+def migration_targets(topology, num_islands):
+    """
+    Returns a dict mapping each island index to the list of island indices
+    that receive its emigrants.
+
+    ``topology`` may be 'ring' (each island sends to the next one), 'complete'
+    (each island sends to every other island), or an explicit dict with the
+    same layout as the return value.
+    """
+    if isinstance(topology, dict):
+        targets = {}
+        for i in range(num_islands):
+            dests = list(topology.get(i, []))
+            for d in dests:
+                if not (0 <= d < num_islands) or d == i:
+                    raise RuntimeError(f"Invalid migration target {d!r} for island {i}")
+            targets[i] = dests
+        return targets
+
+    if topology == 'ring':
+        if num_islands < 2:
+            return {i: [] for i in range(num_islands)}
+        return {i: [(i + 1) % num_islands] for i in range(num_islands)}
+
+    if topology == 'complete':
+        return {i: [j for j in range(num_islands) if j != i] for i in range(num_islands)}
+
+    raise RuntimeError(f"Unexpected migration topology: {topology!r}")
+
+
+class _MigrationTracker(BaseReporter):
+    """Remembers the fittest genomes of the most recently evaluated generation."""
+
+    def __init__(self):
+        self.emigrants = []
+        self.solution_found = False
+
+    def post_evaluate(self, config, population, species, best_genome):
+        self.emigrants = sorted(population.values(), key=lambda g: g.fitness, reverse=True)
+
+    def found_solution(self, config, generation, best):
+        self.solution_found = True
+
+
+def _create_island(config, index, num_islands, reporters):
+    """Creates a Population whose genome and node keys are strided by island."""
+    population = Population(config)
+    for r in reporters:
+        population.add_reporter(r)
+
+    # Discard the population created with the default (shared) key range and
+    # rebuild it from this island's own key range.
+    genome_config = config.genome_config
+    population.reproduction.genome_indexer = count(index + 1, num_islands)
+    population.reproduction.ancestors = {}
+    genome_config.node_indexer = count(genome_config.num_outputs + index, num_islands)
+    population.population = population.reproduction.create_new(config.genome_type,
+                                                                genome_config,
+                                                                config.pop_size)
+    population.species = config.species_set_type(config.species_set_config, population.reporters)
+    population.species.speciate(config, population.population, population.generation)
+
+    return population
+
+
+def _immigrate(population, genomes):
+    """
+    Replaces the youngest offspring of the (not yet evaluated) current generation
+    with copies of the given immigrants, then re-speciates.
+    """
+    if not genomes:
+        return
+    config = population.config
+    elites = set()
+    for s in population.species.species.values():
+        elites.update(gid for gid, g in s.members.items() if g.fitness is not None)
+    replaceable = sorted((gid for gid in population.population if gid not in elites), reverse=True)
+
+    for victim, g in zip(replaceable, genomes):
+        del population.population[victim]
+        migrant = copy.deepcopy(g)
+        migrant.key = next(population.reproduction.genome_indexer)
+        migrant.fitness = None
+        population.population[migrant.key] = migrant
+        population.reproduction.ancestors[migrant.key] = tuple()
+
+    population.species.speciate(config, population.population, population.generation)
+
+
+def _island_worker(connection, config, index, num_islands, seed, reporter_factory):
+    if seed is not None:
+        random.seed(seed + index)
+
+    try:
+        reporters = list(reporter_factory(index)) if reporter_factory is not None else []
+        tracker = _MigrationTracker()
+        population = _create_island(config, index, num_islands, reporters + [tracker])
+    except Exception:
+        connection.send(('error', traceback.format_exc()))
+        return
+    connection.send(('ready', None))
+
+    while True:
+        try:
+            command, args = connection.recv()
+        except EOFError:
+            break  # the IslandModel is gone
+        try:
+            if command == 'run':
+                fitness_function, n, num_migrants = args
+                tracker.solution_found = False
+                best = population.run(fitness_function, n)
+                emigrants = [copy.deepcopy(g) for g in tracker.emigrants[:num_migrants]]
+                connection.send(('ok', (best, emigrants, tracker.solution_found)))
+            elif command == 'immigrate':
+                _immigrate(population, args)
+                connection.send(('ok', None))
+            elif command == 'population':
+                connection.send(('ok', (population.population, population.generation)))
+            elif command == 'stop':
+                connection.send(('ok', None))
+                break
+            else:
+                raise RuntimeError(f"Unexpected island command: {command!r}")
+        except Exception:
+            connection.send(('error', traceback.format_exc()))
+
+
+def _stop_islands(connections, processes):
+    for c, p in zip(connections, processes):
+        if p.is_alive():
+            try:
+                c.send(('stop', None))
+                c.recv()
+            except (EOFError, OSError):
+                pass
+        p.join()
+    connections.clear()
+    processes.clear()
+
+
+class IslandModel(object):
+    """
+    Evolves ``num_islands`` populations in separate processes, migrating the
+    ``num_migrants`` best genomes of each island to its neighbours (as given by
+    ``topology``) every ``migration_interval`` generations.
+    """
+
+    def __init__(self, config, num_islands, migration_interval=10, num_migrants=1,
+                 topology='ring', seed=None, reporter_factory=None):
+        """
+        ``reporter_factory``, if given, is called in each island process with the
+        island index and must return an iterable of reporters for that island.
+        It (and the fitness function given to ``run``) must be picklable.
+        """
+        self.connections = []
+        self.processes = []
+        if num_islands < 1:
+            raise RuntimeError("num_islands must be at least 1")
+        if migration_interval < 1:
+            raise RuntimeError("migration_interval must be at least 1")
+
+        self.config = config
+        self.num_islands = num_islands
+        self.migration_interval = migration_interval
+        self.num_migrants = num_migrants
+        self.targets = migration_targets(topology, num_islands)
+        self.best_genome = None
+
+        # The islands are not daemonic, so that they can start processes of their
+        # own (reproduction with num_workers > 1, a ParallelEvaluator...); they are
+        # stopped by stop(), when the model is collected, or at interpreter exit.
+        self._finalizer = weakref.finalize(self, _stop_islands, self.connections, self.processes)
+        for i in range(num_islands):
+            parent_conn, child_conn = Pipe()
+            p = Process(target=_island_worker,
+                        args=(child_conn, config, i, num_islands, seed, reporter_factory))
+            p.start()
+            self.connections.append(parent_conn)
+            self.processes.append(p)
+
+        try:
+            for c in self.connections:
+                self._receive(c)
+        except BaseException:
+            self.stop()
+            raise
+
+    @staticmethod
+    def _receive(connection):
+        status, result = connection.recv()
+        if status == 'error':
+            raise RuntimeError("Island process failed:\n" + result)
+        return result
+
+    def _broadcast(self, messages):
+        for c, m in zip(self.connections, messages):
+            c.send(m)
+        return [self._receive(c) for c in self.connections]
+
+    def stop(self):
+        """Shuts down the island processes."""
+        self._finalizer()
+
+    def run(self, fitness_function, n=None):
+        """
+        Runs all islands for at most n generations (each), migrating every
+        ``migration_interval`` generations.  If n is None, run until any island
+        finds a solution.  ``fitness_function`` has the same interface as for
+        `Population.run`.  Returns the best genome seen on any island.
+        """
+        if self.config.no_fitness_termination and (n is None):
+            raise RuntimeError("Cannot have no generational limit with no fitness termination")
+
+        k = 0
+        while n is None or k < n:
+            epoch = self.migration_interval if n is None else min(self.migration_interval, n - k)
+            k += epoch
+
+            results = self._broadcast([('run', (fitness_function, epoch, self.num_migrants))] *
+                                      self.num_islands)
+
+            solved = False
+            for best, ignored_emigrants, solution_found in results:
+                if self.best_genome is None or best.fitness > self.best_genome.fitness:
+                    self.best_genome = best
+                solved = solved or solution_found
+
+            if solved and not self.config.no_fitness_termination:
+                break
+
+            # Route emigrants to their destination islands.
+            incoming = [[] for _ in range(self.num_islands)]
+            for src, (ignored_best, emigrants, ignored_solved) in enumerate(results):
+                for dest in self.targets[src]:
+                    incoming[dest].extend(emigrants)
+
+            self._broadcast([('immigrate', genomes) for genomes in incoming])
+
+        return self.best_genome
+
+    def get_populations(self):
+        """Returns the current population dict of each island, in island order."""
+        return [population for population, ignored_generation in
+                self._broadcast([('population', None)] * self.num_islands)]
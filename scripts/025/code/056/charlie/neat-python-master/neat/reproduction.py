@@ -6,6 +6,7 @@ asexual reproduction from parents.
 import math
 import random
 from itertools import count
+from multiprocessing import Pool
 
 from neat.config import ConfigParameter, DefaultClassConfig
 from neat.math_util import mean
@@ -17,18 +18,54 @@ from neat.math_util import mean
 # to become "cautious" and only make very slow progress.
 
 
+def spawn_offspring(config, task_seed, node_key_start, node_key_step, parents, child_keys):
+    """
+    Creates one child per key in ``child_keys`` from the given (key, genome) parents.
+
+    The module-level random generator is reseeded with ``task_seed`` and new node keys
+    are drawn from ``count(node_key_start, node_key_step)``, so the result depends only
+    on the arguments and not on the process (or order) in which the task is run.
+    Returns a list of (child key, child, (parent1 key, parent2 key)) tuples.
+    """
+    random.seed(task_seed)
+    config.genome_config.node_indexer = count(node_key_start, node_key_step)
+
+    offspring = []
+    for gid in child_keys:
+        parent1_id, parent1 = random.choice(parents)
+        parent2_id, parent2 = random.choice(parents)
+
+        child = config.genome_type(gid)
+        child.configure_crossover(parent1, parent2, config.genome_config)
+        child.mutate(config.genome_config)
+        offspring.append((gid, child, (parent1_id, parent2_id)))
+
+    return offspring
+
+
+def _spawn_offspring_task(args):
+    return spawn_offspring(*args)
+
+
 class DefaultReproduction(DefaultClassConfig):
     """
     Implements the default NEAT-python reproduction scheme:
     explicit fitness sharing with fixed-time species stagnation.
+
+    If ``num_workers`` is positive, offspring are created in chunks of at most
+    ``offspring_chunk_size`` children, each with its own deterministic random
+    stream, using a pool of ``num_workers`` processes when it is greater than one.
     """
 
+    offspring_chunk_size = 50
+
     @classmethod
     def parse_config(cls, param_dict):
         return DefaultClassConfig(param_dict,
                                   [ConfigParameter('elitism', int, 0),
                                    ConfigParameter('survival_threshold', float, 0.2),
-                                   ConfigParameter('min_species_size', int, 1)])
+                                   ConfigParameter('min_species_size', int, 1),
+                                   ConfigParameter('num_workers', int, 0)])
 
     def __init__(self, config, reporters, stagnation):
         # pylint: disable=super-init-not-called
@@ -37,6 +74,13 @@ class DefaultReproduction(DefaultClassConfig):
         self.genome_indexer = count(1)
         self.stagnation = stagnation
         self.ancestors = {}
+        self.pool = None
+
+    def __del__(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool.terminate()
 
     def create_new(self, genome_type, genome_config, num_genomes):
         new_genomes = {}
@@ -138,6 +182,7 @@ class DefaultReproduction(DefaultClassConfig):
                                            pop_size, min_species_size)
 
         new_population = {}
+        jobs = []
         species.species = {}
         for spawn, s in zip(spawn_amounts, remaining_species):
             # If elitism is enabled, each species always at least gets to retain its elites.
@@ -169,6 +214,13 @@ class DefaultReproduction(DefaultClassConfig):
             repro_cutoff = max(repro_cutoff, 2)
             old_members = old_members[:repro_cutoff]
 
+            if self.reproduction_config.num_workers > 0:
+                # Offspring are generated after all quotas are known; see _reproduce_parallel.
+                child_keys = [next(self.genome_indexer) for _ in range(spawn)]
+                for i in range(0, spawn, self.offspring_chunk_size):
+                    jobs.append((old_members, child_keys[i:i + self.offspring_chunk_size]))
+                continue
+
             # Randomly choose parents and produce the number of offspring allotted to the species.
             while spawn > 0:
                 spawn -= 1
@@ -186,4 +238,54 @@ class DefaultReproduction(DefaultClassConfig):
                 new_population[gid] = child
                 self.ancestors[gid] = (parent1_id, parent2_id)
 
+        if jobs:
+            self._reproduce_parallel(config, jobs, new_population)
+
         return new_population
+
+    def _reproduce_parallel(self, config, jobs, new_population):
+        """
+        Runs the (parents, child keys) jobs through `spawn_offspring`, in a pool of
+        ``num_workers`` processes if more than one worker is configured.
+
+        Each job gets its own random seed, derived from a single draw of the global
+        random generator, and its own strided range of node keys, so the offspring
+        (and their keys) are identical for a given seed regardless of scheduling.
+        """
+        genome_config = config.genome_config
+        generation_seed = random.getrandbits(64)
+
+        # Reserve node keys from the progression start, start + step, ... of the
+        # current indexer (strided per island by `neat.islands`): job j allocates
+        # start + j * step, start + (j + len(jobs)) * step, ...
+        if genome_config.node_indexer is None:
+            start = max((max(g.nodes) for parents, ignored_keys in jobs
+                         for ignored_pid, g in parents if g.nodes), default=-1) + 1
+            start = max(start, len(genome_config.output_keys))
+            step = 1
+        else:
+            start = next(genome_config.node_indexer)
+            step = next(genome_config.node_indexer) - start
+        node_key_step = step * len(jobs)
+
+        tasks = [(config, f"{generation_seed}:{j}", start + j * step, node_key_step, parents, child_keys)
+                 for j, (parents, child_keys) in enumerate(jobs)]
+
+        if self.reproduction_config.num_workers > 1:
+            if self.pool is None:
+                self.pool = Pool(processes=self.reproduction_config.num_workers)
+            results = self.pool.map(_spawn_offspring_task, tasks)
+        else:
+            results = [spawn_offspring(*t) for t in tasks]
+        # Continue the global random stream identically however the jobs were run.
+        random.seed(generation_seed)
+
+        max_node_key = start - 1
+        for offspring in results:
+            for gid, child, parent_ids in offspring:
+                new_population[gid] = child
+                self.ancestors[gid] = parent_ids
+                if child.nodes:
+                    max_node_key = max(max_node_key, max(child.nodes))
+        # Continue the same progression past every key allocated by the jobs.
+        genome_config.node_indexer = count(start + (max_node_key - start) // step * step + step, step)
@@ -47,6 +47,63 @@ class GenomeDistanceCache(object):
         return d
 
 
+class RepresentativeIndex(object):
+    """
+    Pivot-based (LAESA-style) index over species representatives.
+
+    The distances from every representative to a few pivot representatives are
+    kept, so that for a new genome ``g`` the bound ``|d(g, p) - d(p, r)| <= d(g, r)``
+    lets most representatives ``r`` be skipped without computing ``d(g, r)``.
+    The result is the same as a linear scan whenever the genome distance obeys
+    the triangle inequality; since the size normalization in `DefaultGenome.distance`
+    does not guarantee this, the index is optional.
+    """
+
+    def __init__(self, distances, num_pivots):
+        self.distances = distances
+        self.num_pivots = num_pivots
+        self.pivots = []
+        # sid -> (insertion order, representative, distances to the pivots)
+        self.entries = {}
+
+    def add(self, sid, representative):
+        if len(self.pivots) < self.num_pivots:
+            self.pivots.append(representative)
+            for ignored_order, rep, pivot_distances in self.entries.values():
+                pivot_distances.append(self.distances(rep, representative))
+        pivot_distances = [self.distances(representative, p) for p in self.pivots]
+        self.entries[sid] = (len(self.entries), representative, pivot_distances)
+
+    def nearest(self, genome, threshold):
+        """
+        Returns (distance, sid) for the representative closest to ``genome`` among
+        those closer than ``threshold``, or None if there is no such representative.
+        Ties are resolved in favour of the representative added first.
+        """
+        genome_distances = [self.distances(p, genome) for p in self.pivots]
+
+        bounded = []
+        for sid, (order, rep, pivot_distances) in self.entries.items():
+            lower_bound = 0.0
+            for a, b in zip(genome_distances, pivot_distances):
+                lower_bound = max(lower_bound, abs(a - b))
+            if lower_bound < threshold:
+                bounded.append((lower_bound, order, sid, rep))
+        bounded.sort(key=lambda x: x[:2])
+
+        best = None
+        for lower_bound, order, sid, rep in bounded:
+            if best is not None and lower_bound > best[0]:
+                break
+            d = self.distances(rep, genome)
+            if d < threshold and (best is None or (d, order) < best[:2]):
+                best = (d, order, sid)
+
+        if best is None:
+            return None
+        return best[0], best[2]
+
+
 class DefaultSpeciesSet(DefaultClassConfig):
     """ Encapsulates the default speciation scheme. """
 
@@ -61,7 +118,8 @@ class DefaultSpeciesSet(DefaultClassConfig):
     @classmethod
     def parse_config(cls, param_dict):
         return DefaultClassConfig(param_dict,
-                                  [ConfigParameter('compatibility_threshold', float)])
+                                  [ConfigParameter('compatibility_threshold', float),
+                                   ConfigParameter('representative_pivots', int, 0)])
 
     def speciate(self, config, population, generation):
         """
@@ -96,18 +154,29 @@ class DefaultSpeciesSet(DefaultClassConfig):
             new_members[sid] = [new_rid]
             unspeciated.remove(new_rid)
 
+        index = None
+        num_pivots = self.species_set_config.representative_pivots
+        if num_pivots > 0:
+            index = RepresentativeIndex(distances, num_pivots)
+            for sid, rid in new_representatives.items():
+                index.add(sid, population[rid])
+
         # Partition population into species based on genetic similarity.
         while unspeciated:
             gid = unspeciated.pop()
             g = population[gid]
 
             # Find the species with the most similar representative.
-            candidates = []
-            for sid, rid in new_representatives.items():
-                rep = population[rid]
-                d = distances(rep, g)
-                if d < compatibility_threshold:
-                    candidates.append((d, sid))
+            if index is not None:
+                nearest = index.nearest(g, compatibility_threshold)
+                candidates = [nearest] if nearest is not None else []
+            else:
+                candidates = []
+                for sid, rid in new_representatives.items():
+                    rep = population[rid]
+                    d = distances(rep, g)
+                    if d < compatibility_threshold:
+                        candidates.append((d, sid))
 
             if candidates:
                 ignored_sdist, sid = min(candidates, key=lambda x: x[0])
@@ -118,6 +187,8 @@ class DefaultSpeciesSet(DefaultClassConfig):
                 sid = next(self.indexer)
                 new_representatives[sid] = gid
                 new_members[sid] = [gid]
+                if index is not None:
+                    index.add(sid, g)
 
         # Update species collection based on new speciation.
         self.genome_to_species = {}
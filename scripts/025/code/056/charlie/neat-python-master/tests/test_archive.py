@@ -0,0 +1,100 @@
+import os
+import tempfile
+import unittest
+
+import neat
+from neat.archive import (ArchiveFormatError, ArchiveReporter, GenomeArchive, GenomeArchiveWriter,
+                          genome_from_bytes, genome_to_bytes)
+
+
+def load_config(genome_type, filename):
+    local_dir = os.path.dirname(__file__)
+    config_path = os.path.join(local_dir, filename)
+    return neat.Config(genome_type, neat.DefaultReproduction,
+                       neat.DefaultSpeciesSet, neat.DefaultStagnation,
+                       config_path)
+
+
+def eval_dummy_genomes(genomes, config):
+    for genome_id, genome in genomes:
+        genome.fitness = float(len(genome.connections)) + genome_id * 1e-6
+
+
+class ArchiveTests(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.dir.name, 'genomes.bin')
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def assertSameGenome(self, g1, g2):
+        self.assertEqual(g1.key, g2.key)
+        self.assertEqual(g1.fitness, g2.fitness)
+        self.assertEqual(str(g1), str(g2))
+
+    def test_bytes_round_trip(self):
+        for genome_type, filename in ((neat.DefaultGenome, 'test_configuration'),
+                                      (neat.iznn.IZGenome, 'test_configuration_iznn')):
+            config = load_config(genome_type, filename)
+            p = neat.Population(config)
+            for g in p.population.values():
+                g.mutate(config.genome_config)
+                data = genome_to_bytes(g, config.genome_config)
+                self.assertSameGenome(g, genome_from_bytes(data, genome_type, config.genome_config))
+
+    def test_archive_round_trip(self):
+        config = load_config(neat.DefaultGenome, 'test_configuration')
+        p = neat.Population(config)
+        eval_dummy_genomes(list(p.population.items()), config)
+        genomes = list(p.population.values())
+
+        with GenomeArchiveWriter.from_config(self.filename, config) as writer:
+            for g in genomes[:10]:
+                writer.add(g, generation=0)
+            for g in genomes[10:]:
+                writer.add(g, generation=1)
+
+        with GenomeArchive(self.filename) as archive:
+            self.assertEqual(len(archive), len(genomes))
+            self.assertEqual(archive.config.pop_size, config.pop_size)
+            for i, g in enumerate(genomes):
+                self.assertSameGenome(g, archive.load(i))
+
+            best = archive.best_per_generation()
+            self.assertEqual(best[0].key, max(genomes[:10], key=lambda g: g.fitness).key)
+            self.assertEqual(best[1].key, max(genomes[10:], key=lambda g: g.fitness).key)
+
+    def test_reporter(self):
+        config = load_config(neat.DefaultGenome, 'test_configuration')
+        config.pop_size = 20
+        config.fitness_threshold = 1e9
+        p = neat.Population(config)
+        reporter = ArchiveReporter(self.filename, config)
+        p.add_reporter(reporter)
+        p.run(eval_dummy_genomes, 3)
+        reporter.close()
+
+        with GenomeArchive(self.filename, config) as archive:
+            self.assertEqual(sorted(archive.best_per_generation()), [0, 1, 2])
+
+    def test_bad_files(self):
+        with open(self.filename, 'wb') as f:
+            f.write(b'not an archive at all, definitely not' * 2)
+        with self.assertRaises(ArchiveFormatError):
+            GenomeArchive(self.filename)
+
+        config = load_config(neat.DefaultGenome, 'test_configuration')
+        writer = GenomeArchiveWriter.from_config(self.filename, config)
+        writer.f.flush()
+        with self.assertRaises(ArchiveFormatError):
+            GenomeArchive(self.filename)
+        writer.close()
+
+        iz_config = load_config(neat.iznn.IZGenome, 'test_configuration_iznn')
+        with self.assertRaises(ArchiveFormatError):
+            GenomeArchive(self.filename, iz_config)
+
+
+if __name__ == '__main__':
+    unittest.main()
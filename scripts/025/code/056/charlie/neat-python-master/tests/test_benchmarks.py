@@ -0,0 +1,50 @@
+import os
+import unittest
+
+import neat
+from benchmarks import run_benchmarks
+from benchmarks.harness import compare_reports
+from benchmarks.synthetic import load_config, make_genome
+from neat.graphs import creates_cycle
+
+
+class SyntheticGenomeTests(unittest.TestCase):
+    def setUp(self):
+        local_dir = os.path.dirname(__file__)
+        config_path = os.path.join(local_dir, 'test_configuration')
+        self.config = load_config(neat.DefaultGenome, config_path, num_inputs=3, num_outputs=2)
+
+    def test_sizes(self):
+        g = make_genome(self.config, 1, 10, 40)
+        self.assertEqual(len(g.nodes), 12)
+        self.assertEqual(len(g.connections), 40)
+
+    def test_feed_forward_is_acyclic(self):
+        g = make_genome(self.config, 1, 10, 1000)
+        connections = []
+        for key in g.connections:
+            self.assertFalse(creates_cycle(connections, key))
+            connections.append(key)
+
+    def test_recurrent_is_capped(self):
+        g = make_genome(self.config, 1, 1, 1000, recurrent=True)
+        # 3 inputs + 1 hidden + 2 outputs may feed 1 hidden + 2 outputs.
+        self.assertEqual(len(g.connections), 6 * 3)
+
+
+class HarnessTests(unittest.TestCase):
+    def test_compare_reports(self):
+        baseline = {'results': {'a': {'median': 1.0}, 'b': {'median': 1.0}, 'c': {'median': 1.0}}}
+        current = {'results': {'a': {'median': 1.5}, 'b': {'median': 0.5}, 'c': {'median': 1.05},
+                               'd': {'median': 1.0}}}
+        rows = compare_reports(baseline, current, threshold=0.1)
+        self.assertEqual([(r[0], r[-1]) for r in rows], [('a', 'slower'), ('b', 'faster'), ('c', 'same')])
+
+    def test_run_all(self):
+        status = run_benchmarks.main(['--repeat', '1', '--inner', '1', '--pop-size', '10',
+                                      '--nodes', '5', '--connections', '10'])
+        self.assertEqual(status, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
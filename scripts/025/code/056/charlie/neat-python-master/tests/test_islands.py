@@ -0,0 +1,67 @@
+import os
+import unittest
+
+import neat
+from neat.islands import migration_targets
+
+
+def eval_dummy_genomes(genomes, config):
+    for genome_id, genome in genomes:
+        genome.fitness = 1.0 / (1.0 + len(genome.connections))
+
+
+class IslandModelTests(unittest.TestCase):
+    def setUp(self):
+        local_dir = os.path.dirname(__file__)
+        config_path = os.path.join(local_dir, 'test_configuration')
+        self.config = neat.Config(neat.DefaultGenome, neat.DefaultReproduction,
+                                  neat.DefaultSpeciesSet, neat.DefaultStagnation,
+                                  config_path)
+        self.config.pop_size = 30
+        self.config.fitness_threshold = 2.0
+
+    def test_migration_targets(self):
+        self.assertEqual(migration_targets('ring', 3), {0: [1], 1: [2], 2: [0]})
+        self.assertEqual(migration_targets('complete', 3), {0: [1, 2], 1: [0, 2], 2: [0, 1]})
+        self.assertEqual(migration_targets({0: [1]}, 2), {0: [1], 1: []})
+        with self.assertRaises(RuntimeError):
+            migration_targets({0: [0]}, 2)
+        with self.assertRaises(RuntimeError):
+            migration_targets('star', 2)
+
+    def test_run_keeps_keys_unique(self):
+        model = neat.IslandModel(self.config, 3, migration_interval=2, num_migrants=2,
+                                 topology='complete', seed=1)
+        try:
+            best = model.run(eval_dummy_genomes, 5)
+            populations = model.get_populations()
+        finally:
+            model.stop()
+
+        self.assertIsNotNone(best)
+        self.assertEqual(len(populations), 3)
+        all_keys = [gid for population in populations for gid in population]
+        self.assertEqual(len(all_keys), len(set(all_keys)))
+        for population in populations:
+            for gid, g in population.items():
+                self.assertEqual(gid, g.key)
+
+    def test_parallel_reproduction_in_islands(self):
+        # Fitness stays below the threshold, so every generation reproduces
+        # through a pool of workers started by the island process.
+        self.config.reproduction_config.num_workers = 2
+        model = neat.IslandModel(self.config, 2, migration_interval=1, seed=1)
+        try:
+            best = model.run(eval_dummy_genomes, 2)
+            populations = model.get_populations()
+        finally:
+            model.stop()
+
+        self.assertIsNotNone(best)
+        self.assertLess(best.fitness, self.config.fitness_threshold)
+        all_keys = [gid for population in populations for gid in population]
+        self.assertEqual(len(all_keys), len(set(all_keys)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,9 @@
+import os
+import random
 import unittest
+from itertools import count
 
+import neat
 from neat.reproduction import DefaultReproduction
 
 
@@ -53,5 +57,57 @@ class TestSpawnComputation(unittest.TestCase):
         self.assertEqual(spawn, [20, 20])
 
 
+class TestParallelReproduction(unittest.TestCase):
+    def reproduce(self, num_workers, node_indexer=None):
+        local_dir = os.path.dirname(__file__)
+        config_path = os.path.join(local_dir, 'test_configuration')
+        config = neat.Config(neat.DefaultGenome, neat.DefaultReproduction,
+                             neat.DefaultSpeciesSet, neat.DefaultStagnation,
+                             config_path)
+        config.reproduction_config.num_workers = num_workers
+
+        random.seed(42)
+        p = neat.Population(config)
+        for genome in p.population.values():
+            genome.fitness = random.random()
+        if node_indexer is not None:
+            config.genome_config.node_indexer = node_indexer
+        self.genome_config = config.genome_config
+        new_population = p.reproduction.reproduce(config, p.species, config.pop_size, p.generation)
+        return new_population, random.random()
+
+    def test_reproducible_across_worker_counts(self):
+        serial, serial_next = self.reproduce(1)
+        parallel, parallel_next = self.reproduce(2)
+
+        self.assertEqual(sorted(serial), sorted(parallel))
+        for gid, genome in serial.items():
+            self.assertEqual(str(genome), str(parallel[gid]))
+        self.assertEqual(serial_next, parallel_next)
+
+    def test_unique_node_keys(self):
+        new_population, ignored = self.reproduce(2)
+        # The initial genomes have no hidden nodes, so every hidden node was
+        # added by a mutation and its key must not be shared with another child.
+        hidden_keys = [k for g in new_population.values() for k in g.nodes if k > 0]
+        self.assertTrue(hidden_keys)
+        self.assertEqual(len(hidden_keys), len(set(hidden_keys)))
+        for gid, genome in new_population.items():
+            self.assertEqual(gid, genome.key)
+
+    def test_keeps_node_key_stride(self):
+        # An island's indexer (see neat.islands) must keep its start and step.
+        new_population, ignored = self.reproduce(2, count(101, 3))
+        hidden_keys = [k for g in new_population.values() for k in g.nodes if k > 0]
+        self.assertTrue(hidden_keys)
+        for key in hidden_keys:
+            self.assertGreaterEqual(key, 101)
+            self.assertEqual(key % 3, 101 % 3)
+        next_key = next(self.genome_config.node_indexer)
+        self.assertGreater(next_key, max(hidden_keys))
+        self.assertEqual(next_key % 3, 101 % 3)
+        self.assertEqual(next(self.genome_config.node_indexer), next_key + 3)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,61 @@
+import os
+import random
+import unittest
+
+import neat
+from neat.species import GenomeDistanceCache, RepresentativeIndex
+
+
+class Point(object):
+    """A stand-in genome whose distance is a true metric (distance on the plane)."""
+
+    def __init__(self, key, x, y):
+        self.key = key
+        self.x = x
+        self.y = y
+
+    def distance(self, other, config):
+        return ((self.x - other.x) ** 2 + (self.y - other.y) ** 2) ** 0.5
+
+
+class RepresentativeIndexTests(unittest.TestCase):
+    def test_matches_linear_scan(self):
+        rng = random.Random(3)
+        reps = [Point(i, rng.uniform(0, 100), rng.uniform(0, 100)) for i in range(200)]
+        queries = [Point(1000 + i, rng.uniform(0, 100), rng.uniform(0, 100)) for i in range(100)]
+        threshold = 5.0
+
+        distances = GenomeDistanceCache(None)
+        index = RepresentativeIndex(distances, 4)
+        for r in reps:
+            index.add(r.key, r)
+        setup_calls = distances.misses
+
+        for q in queries:
+            candidates = [(r.distance(q, None), r.key) for r in reps if r.distance(q, None) < threshold]
+            expected = min(candidates, key=lambda x: x[0]) if candidates else None
+            self.assertEqual(index.nearest(q, threshold), expected)
+
+        self.assertLess(distances.misses - setup_calls, len(reps) * len(queries) / 4)
+
+    def test_speciate_with_index(self):
+        local_dir = os.path.dirname(__file__)
+        config_path = os.path.join(local_dir, 'test_configuration')
+        config = neat.Config(neat.DefaultGenome, neat.DefaultReproduction,
+                             neat.DefaultSpeciesSet, neat.DefaultStagnation,
+                             config_path)
+        config.species_set_config.representative_pivots = 3
+        config.species_set_config.compatibility_threshold = 1.0
+
+        p = neat.Population(config)
+        members = [gid for s in p.species.species.values() for gid in s.members]
+        self.assertEqual(sorted(members), sorted(p.population))
+
+        for gid, sid in p.species.genome_to_species.items():
+            s = p.species.species[sid]
+            d = s.representative.distance(p.population[gid], config.genome_config)
+            self.assertLess(d, config.species_set_config.compatibility_threshold)
+
+
+if __name__ == '__main__':
+    unittest.main()